@@ -0,0 +1,99 @@
+"""Autocomplete: the in-memory prefix index against the database, per keystroke.
+
+Usage (from the project root):
+    python -m benchmarks.autocomplete_benchmark [customers] [vehicles]
+
+Loads `customers` synthetic customers and `vehicles` vehicles (default
+100,000 each), builds the index and prints:
+- build time, keys, the index's own byte estimate and the memory traced
+  while building it (a second, untimed build), overall and per 100,000
+  customers
+- lookup latency (median and 99th percentile) for every prefix of a
+  sample of real names and makes, through the index and through the
+  database: the lower(column) prefix lookups and the ILIKE-style search
+  behind the listing's ?search=
+
+It fails if a prefix found in the database is missing from the index.
+Uses BENCH_DATABASE_URL if set, otherwise a throwaway SQLite file; the
+target database is dropped and recreated.
+"""
+import random
+import sys
+import time
+import tracemalloc
+from benchmarks.common import make_app
+from database.autocomplete import build_index, database_suggestions
+from database.index import db
+from database.search import search_vehicles
+from database.seed.synthetic import load_synthetic
+from models import Customer, Vehicle
+
+SAMPLE = 200
+LIMIT = 10
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+
+def timed(prefixes, lookup):
+    samples = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        lookup(prefix)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def main(customers=100000, vehicles=100000):
+    app = make_app('autocomplete_bench', config={'PAGE_CACHE_BACKEND': 'none'})
+    rng = random.Random(3)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        load_synthetic(vehicles=vehicles, customers=customers, salespeople=1, sales=0)
+        print(f'{customers:,} customers, {vehicles:,} vehicles on {db.engine.dialect.name}')
+
+        started = time.perf_counter()
+        build_index(max_bytes=2 ** 40)
+        elapsed = time.perf_counter() - started
+        # A second build under tracemalloc, which slows allocation too much to time the first
+        tracemalloc.start()
+        index = build_index(max_bytes=2 ** 40)
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        customer_bytes = sum(sys.getsizeof(key) + 8 for key in index.keys['customer'])
+        print(f'build {elapsed:.2f} s, {len(index):,} keys, estimate {index.bytes / 2 ** 20:.1f} MiB, '
+              f'traced {traced / 2 ** 20:.1f} MiB')
+        print(f'per 100,000 customers: {customer_bytes / customers * 100000 / 2 ** 20:.1f} MiB '
+              f'({len(index.keys["customer"]) / customers:.0f} keys each)')
+
+        names = [f'{first} {last}' for first, last in db.session.query(Customer.first_name, Customer.last_name)
+                 .order_by(Customer.id).limit(5000)]
+        makes = [make for make, in db.session.query(Vehicle.make).distinct()]
+        words = rng.sample(names, min(SAMPLE, len(names))) + makes
+        prefixes = sorted({word[:n] for word in words for n in range(1, min(len(word), 8) + 1)})
+        print(f'{len(prefixes):,} prefixes (every keystroke of {len(words)} names and makes)')
+
+        for prefix in prefixes:
+            found = database_suggestions(prefix, ('make', 'customer'), LIMIT)
+            for kind in ('make', 'customer'):
+                if found[kind] and not index.search(kind, prefix.lower(), LIMIT):
+                    raise AssertionError(f'{kind} {prefix!r}: database has matches, index has none')
+
+        rows = [
+            ('index (make, model, customer)',
+             lambda p: [index.search(kind, p.lower(), LIMIT) for kind in ('make', 'model', 'customer')]),
+            ('database prefix lookups', lambda p: database_suggestions(p, ('make', 'model', 'customer'), LIMIT)),
+            ('listing search (?search=)',
+             lambda p: search_vehicles(Vehicle.query, Vehicle, p, ranked=False).limit(LIMIT).all()),
+        ]
+        print(f'{"lookup":<32} {"p50 ms":>8} {"p99 ms":>8}')
+        for label, lookup in rows:
+            p50, p99 = timed(prefixes, lookup)
+            print(f'{label:<32} {p50:>8.3f} {p99:>8.3f}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,129 @@
+"""Deleting a vehicle with many sales: ORM cascade against the database's ON DELETE CASCADE.
+
+Usage (from the project root):
+    python -m benchmarks.cascade_delete_benchmark [sales_per_vehicle]
+
+Gives a few vehicles `sales_per_vehicle` sales each (default 10,000), then
+deletes them:
+- the old way, with the sales collection loaded first, so the ORM deletes
+  every sale itself (what `cascade='all, delete-orphan'` without
+  passive_deletes did on every delete)
+- with db.session.delete(vehicle) and passive_deletes, leaving the sales
+  to ON DELETE CASCADE
+- all vehicles of one year through database.rollups.delete_vehicles
+
+and prints the time, SQL statements and Sale objects loaded for each, then
+checks the rollups against a full rebuild. Uses BENCH_DATABASE_URL if set,
+otherwise a throwaway SQLite file; the target database is dropped and
+recreated.
+"""
+import random
+import sys
+import time
+from datetime import date
+from sqlalchemy import event
+from benchmarks.common import make_app
+from database.index import db
+from database.rollups import apply_sale_rollups, delete_vehicles, rebuild_rollups
+from database.seed.synthetic import load_synthetic
+from models import Vehicle, Sale
+from models.rollups import DailySales, RowCount, SalespersonSales, VehicleSales
+
+VEHICLES, CUSTOMERS, SALESPEOPLE = 50, 200, 20
+BULK_YEAR = 1990
+
+
+def add_sales(vehicle_id, count, rng):
+    rows = [{
+        'vehicle_id': vehicle_id,
+        'customer_id': rng.randint(1, CUSTOMERS),
+        'salesperson_id': rng.randint(1, SALESPEOPLE),
+        'sale_date': date(2024, rng.randint(1, 12), rng.randint(1, 28)),
+        'sale_price': f'{rng.uniform(5000, 80000):.2f}',
+    } for _ in range(count)]
+    connection = db.session.connection()
+    connection.execute(Sale.__table__.insert(), rows)
+    apply_sale_rollups(connection, rows)
+
+
+def new_vehicle(year=2024):
+    vehicle = Vehicle(make='Bench', model='Cascade', year=year, price=20000, type='sedan')
+    db.session.add(vehicle)
+    db.session.flush()
+    return vehicle.id
+
+
+class Tally:
+    """Statements executed and Sale objects loaded while active"""
+
+    def __init__(self, engine):
+        self.statements = self.loaded = 0
+        event.listen(engine, 'before_cursor_execute', self._statement)
+        event.listen(Sale, 'load', self._load)
+
+    def _statement(self, *args):
+        self.statements += 1
+
+    def _load(self, target, context):
+        self.loaded += 1
+
+    def reset(self):
+        self.statements = self.loaded = 0
+
+
+def run(tally, label, delete, sales):
+    tally.reset()
+    started = time.perf_counter()
+    delete()
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+    print(f'{label:<44} {sales:>8,} {elapsed * 1000:>10.1f} {tally.statements:>11,} {tally.loaded:>8,}')
+
+
+def snapshot():
+    # Counters that dropped to zero stay behind as rows; a rebuild does not create them
+    return [sorted(tuple(row) for row in db.session.execute(db.select(*model.__table__.c).where(column != 0)))
+            for model, column in ((RowCount, RowCount.row_count), (DailySales, DailySales.sale_count),
+                                  (VehicleSales, VehicleSales.sale_count),
+                                  (SalespersonSales, SalespersonSales.sale_count))]
+
+
+def main(per_vehicle=10000):
+    app = make_app('cascade_delete_bench', config={'PAGE_CACHE_BACKEND': 'none'})
+    rng = random.Random(7)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        load_synthetic(vehicles=VEHICLES, customers=CUSTOMERS, salespeople=SALESPEOPLE, sales=0)
+        old_way, new_way = new_vehicle(), new_vehicle()
+        bulk = [new_vehicle(BULK_YEAR) for _ in range(5)]
+        for vehicle_id in (old_way, new_way, *bulk):
+            add_sales(vehicle_id, per_vehicle, rng)
+        db.session.commit()
+        db.session.expunge_all()
+        print(f'{per_vehicle:,} sales per vehicle on {db.engine.dialect.name}')
+
+        tally = Tally(db.engine)
+        print(f'{"delete":<44} {"sales":>8} {"ms":>10} {"statements":>11} {"loaded":>8}')
+
+        def orm_cascade():
+            vehicle = db.session.get(Vehicle, old_way)
+            list(vehicle.sales)
+            db.session.delete(vehicle)
+
+        def passive():
+            db.session.delete(db.session.get(Vehicle, new_way))
+
+        run(tally, 'ORM cascade (sales loaded)', orm_cascade, per_vehicle)
+        run(tally, 'passive_deletes + ON DELETE CASCADE', passive, per_vehicle)
+        run(tally, f'delete_vehicles(year == {BULK_YEAR}), 5 vehicles',
+            lambda: delete_vehicles(db.session.connection(), Vehicle.year == BULK_YEAR), per_vehicle * 5)
+
+        live = snapshot()
+        rebuild_rollups()
+        assert live == snapshot(), 'rollups drifted from the sales table'
+        print('rollups match a full rebuild')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
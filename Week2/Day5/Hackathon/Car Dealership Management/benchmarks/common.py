@@ -0,0 +1,9 @@
+import os
+import tempfile
+from index import create_app
+
+
+def make_app(name, url=None, config=None):
+    """The dealership app bound to BENCH_DATABASE_URL, or to a throwaway SQLite file"""
+    url = url or os.getenv('BENCH_DATABASE_URL') or 'sqlite:///' + os.path.join(tempfile.gettempdir(), f'{name}.db')
+    return create_app({'SQLALCHEMY_DATABASE_URI': url, 'QUERY_COUNT_MODE': 'off', **(config or {})})
@@ -0,0 +1,83 @@
+"""Listing totals: database.counts.count_rows against an exact COUNT(*), one run per branch.
+
+Usage (from the project root):
+    python -m benchmarks.count_benchmark [vehicles]
+
+Loads `vehicles` synthetic vehicles (default 200,000) and counts the
+whole table, a search and a year filter, forcing each way count_rows can
+answer:
+- counter: the whole table, from the row count rollup
+- exact: a threshold above the match count, so the capped count finishes
+- planner (PostgreSQL) or sample (elsewhere): a threshold of 1,000, or half
+  the matches when there are fewer, so the total is estimated; a query that
+  matches nothing cannot be estimated and only runs the exact branch
+
+For each it prints the method, the total, its error against COUNT(*) and
+both timings, and fails if a branch was not taken or an exact total is
+wrong. Uses BENCH_DATABASE_URL if set, otherwise a throwaway SQLite file;
+the target database is dropped and recreated.
+
+The SQLite sample makes three queries, so on small tables it is slower
+than the COUNT(*) it replaces. Measured with the default
+COUNT_EXACT_THRESHOLD (10,000): a plain filter walked in id order
+('year >= 2020', about 45% of rows) is estimated faster than counted from
+about 100,000 vehicles (4.8 ms against 7.2 ms), and slower below that
+(7.0 ms against 3.9 ms at 50,000). A search has to collect and sort all
+of its trigram matches before the first ones in id order are known, so
+its estimate stayed slower than COUNT(*) at every size tried, up to
+1,000,000 vehicles (74 ms against 55 ms).
+"""
+import sys
+import time
+from benchmarks.common import make_app
+from database.counts import count_rows
+from database.index import db
+from database.rollups import rebuild_rollups
+from database.search import search_vehicles
+from database.seed.synthetic import load_synthetic
+from models import Vehicle
+
+LOW_THRESHOLD = 1000
+REPEAT = 5
+
+
+def timed(count):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = count()
+    return result, (time.perf_counter() - started) / REPEAT * 1000
+
+
+def main(vehicles=200000):
+    app = make_app('count_bench', config={'PAGE_CACHE_BACKEND': 'none'})
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        load_synthetic(vehicles=vehicles, customers=1, salespeople=1, sales=0)
+        rebuild_rollups()
+        estimated = 'planner' if db.engine.dialect.name == 'postgresql' else 'sample'
+        print(f'{vehicles:,} vehicles on {db.engine.dialect.name}')
+
+        queries = {
+            'all vehicles': (Vehicle.query, True),
+            "search 'toy'": (search_vehicles(Vehicle.query, Vehicle, 'toy', ranked=False), False),
+            'year >= 2020': (Vehicle.query.filter(Vehicle.year >= 2020), False),
+        }
+        print(f'{"query":<16} {"method":<8} {"total":>10} {"error":>7} {"ms":>8} {"COUNT(*) ms":>12}')
+        for label, (query, whole_table) in queries.items():
+            exact, exact_ms = timed(lambda: query.order_by(None).count())
+            if whole_table:
+                cases = [('counter', None)]
+            else:
+                # Below LOW_THRESHOLD matches only a lower threshold makes count_rows estimate
+                cases = [('exact', exact + 1)] + ([(estimated, min(LOW_THRESHOLD, exact // 2))] if exact else [])
+            for expected, threshold in cases:
+                total, ms = timed(lambda: count_rows(query, Vehicle, whole_table, threshold))
+                assert total.method == expected, f'{label}: expected {expected}, counted by {total.method}'
+                assert not total.exact or total == exact, f'{label}: {total} != {exact}'
+                error = (total - exact) / exact * 100 if exact else 0
+                print(f'{label:<16} {total.method:<8} {total:>10,} {error:>6.1f}% {ms:>8.2f} {exact_ms:>12.2f}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
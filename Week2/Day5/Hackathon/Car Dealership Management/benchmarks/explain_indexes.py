@@ -0,0 +1,70 @@
+"""Capture EXPLAIN output for the sales join/group queries before and after the secondary indexes.
+
+Usage (from the project root):
+    python -m benchmarks.explain_indexes [sales]
+
+Builds the schema without the indexes from migration 0001, loads synthetic
+data, prints the plans, applies the migrations and prints the plans again.
+Uses BENCH_DATABASE_URL if set, otherwise a throwaway SQLite file; the
+target database is dropped and recreated.
+
+tests/test_indexes.py asserts the SQLite plans for these queries use their
+indexes; this script is for reading the plans, e.g. on PostgreSQL.
+"""
+import sys
+from benchmarks.common import make_app
+from database.index import db
+from database.migrations.index import run_migrations
+from database.seed.synthetic import load_synthetic
+
+INDEXES = ('ix_sales_vehicle_id', 'ix_sales_customer_id', 'ix_sales_salesperson_id',
+           'ix_sales_sale_date', 'ix_vehicles_type')
+
+QUERIES = {
+    'sales of one vehicle': "SELECT id, sale_price FROM sales WHERE vehicle_id = 42",
+    'sales of one customer': "SELECT id, sale_price FROM sales WHERE customer_id = 42",
+    'sales per salesperson': "SELECT salesperson_id, COUNT(id) FROM sales GROUP BY salesperson_id",
+    'sales in a date range': "SELECT COUNT(id) FROM sales WHERE sale_date BETWEEN '2024-01-01' AND '2024-03-31'",
+    'vehicles of one type': "SELECT id FROM vehicles WHERE type = 'coupe'",
+}
+
+
+def explain(statement):
+    if db.engine.dialect.name == 'postgresql':
+        rows = db.session.execute(db.text('EXPLAIN ' + statement)).all()
+        return [row[0] for row in rows]
+    rows = db.session.execute(db.text('EXPLAIN QUERY PLAN ' + statement)).all()
+    return [row[-1] for row in rows]
+
+
+def print_plans(title):
+    print(f'=== {title}')
+    for name, statement in QUERIES.items():
+        print(f'-- {name}: {statement}')
+        for line in explain(statement):
+            print(f'   {line}')
+
+
+def run(sales):
+    app = make_app('explain_bench')
+    with app.app_context():
+        db.drop_all()
+        db.session.execute(db.text('DROP TABLE IF EXISTS schema_migrations'))
+        db.session.commit()
+        db.create_all()
+        for index in INDEXES:
+            db.session.execute(db.text(f'DROP INDEX IF EXISTS {index}'))
+        db.session.commit()
+        load_synthetic(vehicles=max(sales // 10, 1), customers=max(sales // 10, 1), salespeople=50, sales=sales)
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+
+        print_plans('before migrations')
+        db.session.remove()
+        run_migrations(db.engine)
+        print_plans('after migrations')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
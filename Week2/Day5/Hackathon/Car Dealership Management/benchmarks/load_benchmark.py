@@ -0,0 +1,239 @@
+"""Route-level load benchmark: throughput and latency percentiles per route.
+
+Usage (from the project root):
+    python -m benchmarks.load_benchmark [--scale 1k|100k|1m] [--clients N] [--requests N]
+                                        [--mode client|server] [--page-cache] [--no-seed]
+                                        [--output FILE] [--compare FILE]
+
+Seeds a synthetic dataset at the chosen scale (number of sales), then
+runs each route in turn with N concurrent clients, each issuing a fixed
+number of requests. --mode client calls the app in-process through
+Flask's test client; --mode server starts a threaded local WSGI server
+and goes over real HTTP. The page cache is off unless --page-cache is
+given, so the numbers reflect the query and render path.
+
+Results are written as JSON (default benchmarks/results/<database>-<scale>.json)
+and --compare prints the change against an earlier run, e.g. the baseline
+shipped as benchmarks/results/baseline-*.json. Uses BENCH_DATABASE_URL if set, otherwise a
+throwaway SQLite file; the target database is dropped and recreated unless
+--no-seed is given.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from werkzeug.serving import WSGIRequestHandler, make_server
+from benchmarks.common import make_app
+from database.index import db
+from database.seed.synthetic import load_synthetic
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Dataset sizes by number of sales
+SCALES = {
+    '1k': {'vehicles': 200, 'customers': 200, 'salespeople': 10, 'sales': 1000},
+    '100k': {'vehicles': 5000, 'customers': 10000, 'salespeople': 50, 'sales': 100000},
+    '1m': {'vehicles': 20000, 'customers': 50000, 'salespeople': 200, 'sales': 1000000},
+}
+
+# name -> (method, function building the path and form data from an RNG and the scale)
+ROUTES = {
+    'GET /': ('GET', lambda rng, scale: (f'/?page={rng.randint(1, 20)}', None)),
+    'GET /stats': ('GET', lambda rng, scale: ('/stats', None)),
+    'GET /api/vehicles': ('GET', lambda rng, scale: (f'/api/vehicles?limit=100&after={rng.randrange(scale["vehicles"])}',
+                                                    None)),
+    'GET /vehicle/<id>': ('GET', lambda rng, scale: (f'/vehicle/{rng.randint(1, scale["vehicles"])}', None)),
+    'POST /sale/create': ('POST', lambda rng, scale: ('/sale/create', {
+        'vehicle_id': rng.randint(1, scale['vehicles']),
+        'customer_id': rng.randint(1, scale['customers']),
+        'salesperson_id': rng.randint(1, scale['salespeople']),
+        'sale_date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        'sale_price': f'{rng.uniform(5000, 80000):.2f}',
+    })),
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def test_client_sender(app):
+    def sender():
+        http = app.test_client()
+
+        def send(method, path, data):
+            response = http.open(path, method=method, data=data)
+            return response.status_code
+        return send
+    return sender
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def http_sender(base_url):
+    def sender():
+        def send(method, path, data):
+            body = urllib.parse.urlencode(data).encode() if data else None
+            request = urllib.request.Request(base_url + path, data=body, method=method)
+            try:
+                # Redirects are not followed: the POST is measured on its own
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return send
+    return sender
+
+
+def run_route(name, make_sender, scale, clients, requests, seed):
+    method, build = ROUTES[name]
+    latencies, errors = [], []
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        send = make_sender()
+        for _ in range(requests):
+            path, data = build(rng, scale)
+            start = time.perf_counter()
+            status = send(method, path, data)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, previous=None):
+    print(f'{"route":<20} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>6}')
+    for name, row in results['routes'].items():
+        line = (f'{name:<20} {row["throughput_rps"]:>8.1f} {row["p50_ms"]:>8.2f} {row["p95_ms"]:>8.2f} '
+                f'{row["p99_ms"]:>8.2f} {row["errors"]:>6}')
+        before = (previous or {}).get('routes', {}).get(name)
+        if before:
+            change = lambda key: (row[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            line += f'   vs baseline: req/s {change("throughput_rps"):+.0f}%, p99 {change("p99_ms"):+.0f}%'
+        print(line)
+
+
+def run(args):
+    scale = SCALES[args.scale]
+    app = make_app('load_bench', config={
+        'WTF_CSRF_ENABLED': False,
+        'PAGE_CACHE_BACKEND': 'memory' if args.page_cache else 'none',
+        'SLOW_REQUEST_MS': 10 ** 9,
+    })
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if not args.no_seed:
+            db.drop_all()
+            db.create_all()
+            load_synthetic(seed=args.seed, **scale)
+        db.session.remove()
+
+    server = None
+    if args.mode == 'server':
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urllib.request.install_opener(urllib.request.build_opener(NoRedirect))
+        make_sender = http_sender(f'http://127.0.0.1:{server.server_port}')
+    else:
+        make_sender = test_client_sender(app)
+
+    routes = args.routes or list(ROUTES)
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'database': dialect,
+        'scale': args.scale,
+        'dataset': scale,
+        'mode': args.mode,
+        'clients': args.clients,
+        'requests_per_client': args.requests,
+        'page_cache': args.page_cache,
+        'routes': {},
+    }
+    try:
+        for name in routes:
+            # One untimed request per route warms templates and connections
+            run_route(name, make_sender, scale, 1, 1, args.seed)
+            results['routes'][name] = run_route(name, make_sender, scale, args.clients, args.requests, args.seed)
+    finally:
+        if server:
+            server.shutdown()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print(f'{dialect}, {args.scale} sales, {args.clients} clients x {args.requests} requests, {args.mode} mode')
+    print_results(results, previous)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{dialect}-{args.scale}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+    print(f'Results written to {output}')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='1k')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50, help='requests per client per route')
+    parser.add_argument('--mode', choices=('client', 'server'), default='client')
+    parser.add_argument('--routes', nargs='*', choices=ROUTES, help='limit the run to these routes')
+    parser.add_argument('--page-cache', action='store_true', help='keep the rendered page cache on')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the data already in the database')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='where to write the JSON results')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    run(parse_args())
@@ -0,0 +1,76 @@
+"""Drive the app with more concurrent clients than the pool has connections.
+
+Usage (from the project root):
+    python -m benchmarks.pool_benchmark [pool_size] [requests_per_client]
+
+Runs the same mixed workload (listing API, dashboard, vehicle detail) at
+half, one, two and four times the pool limit, with no overflow, and prints
+latency percentiles next to the pool metrics for each level. Past the
+limit, extra clients queue for a connection: the wait shows up in the
+checkout wait columns, and p99 should grow with the queue length, not
+explode or fail with pool timeouts. Uses BENCH_DATABASE_URL if set,
+otherwise a throwaway SQLite file; the target database is dropped and
+recreated.
+"""
+import sys
+import threading
+import time
+from benchmarks.common import make_app
+from database.index import db
+from database.pool import metrics
+from database.seed.synthetic import load_synthetic
+
+ROUTES = ['/api/vehicles?limit=100', '/stats', '/vehicle/{id}', '/']
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def client(app, index, requests, latencies, errors):
+    http = app.test_client()
+    for i in range(requests):
+        path = ROUTES[(index + i) % len(ROUTES)].format(id=1 + (index * requests + i) % 500)
+        start = time.perf_counter()
+        response = http.get(path)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+def run_level(app, clients, requests):
+    metrics.reset()
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(app, i, requests, latencies, errors)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    wait_avg = metrics.wait_sum / metrics.wait_count if metrics.wait_count else 0
+    print(f'{clients:>7} {len(latencies) / elapsed:>8.0f} '
+          f'{percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} '
+          f'{percentile(latencies, 0.99) * 1000:>8.1f} {wait_avg * 1000:>9.2f} {metrics.wait_max * 1000:>9.1f} '
+          f'{metrics.peak_in_use:>5} {metrics.timeouts:>8} {len(errors):>6}')
+
+
+def run(pool_size, requests):
+    app = make_app('pool_bench', config={'DB_POOL_SIZE': pool_size, 'DB_MAX_OVERFLOW': 0, 'DB_POOL_TIMEOUT': 30})
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        load_synthetic(vehicles=500, customers=500, salespeople=20, sales=20000)
+        db.session.remove()
+    print(f'pool_size={pool_size} max_overflow=0, {requests} requests per client')
+    print(f'{"clients":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+          f'{"wait avg":>9} {"wait max":>9} {"peak":>5} {"timeouts":>8} {"errors":>6}')
+    for clients in (max(1, pool_size // 2), pool_size, pool_size * 2, pool_size * 4):
+        run_level(app, clients, requests)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 4, int(sys.argv[2]) if len(sys.argv) > 2 else 50)
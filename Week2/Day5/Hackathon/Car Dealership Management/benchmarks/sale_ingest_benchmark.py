@@ -0,0 +1,108 @@
+"""Sales ingested per second: the per-row form route against POST /api/sales/batch.
+
+Usage (from the project root):
+    python -m benchmarks.sale_ingest_benchmark [sales] [clients]
+
+Posts the same number of generated sales (default 5000) through:
+- POST /sale/create, one form submission and one commit per sale
+- POST /api/sales/batch with batches of 10, 100 and 1000 sales
+- many clients (default 16) each posting batches of 10, first with every
+  batch committing on its own, then with SALES_GROUP_COMMIT_MS=5 so
+  concurrent batches share commits
+
+and prints sales/s, request latency and commits for each. Uses
+BENCH_DATABASE_URL if set, otherwise a throwaway SQLite file; the target
+database is dropped and recreated.
+"""
+import random
+import sys
+import threading
+import time
+from benchmarks.common import make_app
+from database.index import db
+from database.seed.synthetic import load_synthetic
+from models import Sale
+
+VEHICLES, CUSTOMERS, SALESPEOPLE = 500, 500, 20
+
+
+def generate_sales(count, seed):
+    rng = random.Random(seed)
+    return [{
+        'vehicle_id': rng.randint(1, VEHICLES),
+        'customer_id': rng.randint(1, CUSTOMERS),
+        'salesperson_id': rng.randint(1, SALESPEOPLE),
+        'sale_date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        'sale_price': f'{rng.uniform(5000, 80000):.2f}',
+    } for _ in range(count)]
+
+
+def post_form(http, sales):
+    for sale in sales:
+        response = http.post('/sale/create', data=sale)
+        assert response.status_code == 302, response.status_code
+    return len(sales)
+
+
+def post_batches(size):
+    def post(http, sales):
+        for start in range(0, len(sales), size):
+            response = http.post('/api/sales/batch', json=sales[start:start + size])
+            assert response.status_code == 201, response.get_json()
+        return (len(sales) + size - 1) // size
+    return post
+
+
+def run(app, label, post, sales, clients=1):
+    """Split `sales` across `clients` threads, each posting its share with `post`"""
+    with app.app_context():
+        before = db.session.query(db.func.count(Sale.id)).scalar()
+        db.session.remove()
+    shares = [sales[i::clients] for i in range(clients)]
+    requests, latencies = [0] * clients, []
+
+    def client(index):
+        http = app.test_client()
+        started = time.perf_counter()
+        requests[index] = post(http, shares[index])
+        latencies.append((time.perf_counter() - started) / max(1, requests[index]))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        inserted = db.session.query(db.func.count(Sale.id)).scalar() - before
+        db.session.remove()
+    committer = app.extensions.get('sale_group_commit')
+    commits = committer.commits if committer else sum(requests)
+    print(f'{label:<34} {inserted / elapsed:>9.0f} {sum(requests):>8} {commits:>8} '
+          f'{sum(latencies) / len(latencies) * 1000:>13.1f}')
+    assert inserted == len(sales), f'{inserted} of {len(sales)} sales inserted'
+
+
+def main(count=5000, clients=16):
+    config = {'WTF_CSRF_ENABLED': False, 'PAGE_CACHE_BACKEND': 'none', 'SLOW_REQUEST_MS': 10 ** 9}
+    app = make_app('sale_ingest_bench', config=config)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        load_synthetic(vehicles=VEHICLES, customers=CUSTOMERS, salespeople=SALESPEOPLE, sales=0)
+        print(f'{count} sales on {db.engine.dialect.name}')
+        db.session.remove()
+    grouped = make_app('sale_ingest_bench', config={**config, 'SALES_GROUP_COMMIT_MS': 5})
+
+    print(f'{"path":<34} {"sales/s":>9} {"requests":>8} {"commits":>8} {"ms/request":>13}')
+    run(app, 'form, 1 sale per request', post_form, generate_sales(count, 1))
+    for size in (10, 100, 1000):
+        run(app, f'batch API, {size} per request', post_batches(size), generate_sales(count, size))
+    run(app, f'batch API, 10 x {clients} clients', post_batches(10), generate_sales(count, 2), clients)
+    run(grouped, f'  + group commit (5 ms window)', post_batches(10), generate_sales(count, 3), clients)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,71 @@
+"""Compare indexed vehicle search against the old ILIKE filter.
+
+Usage (from the project root):
+    python -m benchmarks.search_benchmark [rows ...]
+
+Defaults to 10k, 100k and 1M vehicles. Uses BENCH_DATABASE_URL if set,
+otherwise a throwaway SQLite file. The target database is dropped and
+recreated for every size, so never point it at real data.
+"""
+import random
+import sys
+import time
+from benchmarks.common import make_app
+from database.index import db
+from database.search import search_vehicles, ilike_filter
+from models import Vehicle
+
+MAKES = ['Toyota', 'Honda', 'Ford', 'Tesla', 'Chevrolet', 'BMW', 'Mercedes-Benz', 'Audi',
+         'Nissan', 'Hyundai', 'Jeep', 'Subaru', 'Lexus', 'Mazda', 'Volkswagen', 'Kia']
+MODELS = ['Camry', 'CR-V', 'F-150', 'Model 3', 'Silverado', 'X5', 'C-Class', 'Q7', 'Rogue',
+          'Elantra', 'Wrangler', 'Outback', 'RX', 'CX-5', 'Tiguan', 'Sorento']
+TERMS = ['toy', 'wrangler', 'cx-5', 'zzz']
+REPEAT = 5
+
+
+def load_vehicles(rows, rng):
+    batch = []
+    for i in range(rows):
+        batch.append({
+            'make': rng.choice(MAKES),
+            'model': f'{rng.choice(MODELS)} {rng.randint(1, 9999)}',
+            'year': rng.randint(2000, 2024),
+            'price': rng.randint(5000, 90000),
+            'type': 'sedan',
+        })
+        if len(batch) == 10000:
+            db.session.execute(Vehicle.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Vehicle.__table__.insert(), batch)
+    db.session.commit()
+
+
+def time_query(build):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        build().limit(6).all()
+        build().order_by(None).count()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def run(sizes):
+    app = make_app('search_bench')
+    rng = random.Random(42)
+    print(f'{"rows":>9} {"term":>10} {"ilike ms":>10} {"search ms":>10} {"speedup":>8}')
+    with app.app_context():
+        for rows in sizes:
+            db.drop_all()
+            db.create_all()
+            load_vehicles(rows, rng)
+            for term in TERMS:
+                old = time_query(lambda: Vehicle.query.filter(ilike_filter(Vehicle, term)))
+                new = time_query(lambda: search_vehicles(Vehicle.query, Vehicle, term))
+                print(f'{rows:>9} {term:>10} {old:>10.2f} {new:>10.2f} {old / new:>7.1f}x')
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
@@ -0,0 +1,49 @@
+"""Measure cold worker start-up: importing the app module with -X importtime.
+
+Usage (from the project root):
+    python -m benchmarks.startup_benchmark [runs]
+
+Each run starts a fresh interpreter, so nothing is cached in-process. Reports
+the best wall-clock boot time, the cumulative import time of `index`, and the
+heaviest top-level imports. Nothing here touches the database: creating the
+app must not need one.
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def boot_once():
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import index'],
+                            cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            # Indentation is 1 + 2 * nesting depth; keep the deepest-first order's last entry
+            imports[match.group(4)] = (int(match.group(2)), (len(match.group(3)) - 1) // 2)
+    return elapsed, imports
+
+
+def run(runs):
+    results = [boot_once() for _ in range(runs)]
+    elapsed, imports = min(results, key=lambda result: result[0])
+    print(f"best boot of {runs}: {elapsed * 1000:.0f} ms wall clock")
+    print(f"import index (cumulative): {imports.get('index', (0, 0))[0] / 1000:.0f} ms")
+    print("heaviest imports made by index:")
+    direct = {name: micros for name, (micros, depth) in imports.items() if depth == 1}
+    for name, micros in sorted(direct.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+    print(f"wtforms imported at boot: {'yes' if any(name.startswith('wtforms') for name in imports) else 'no'}")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
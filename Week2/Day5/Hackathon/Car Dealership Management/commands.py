@@ -0,0 +1,146 @@
+import csv
+import sys
+import click
+from flask.cli import with_appcontext
+from models import db, Vehicle, RowCount
+from database.seed.index import seed_database
+from database.seed.synthetic import load_synthetic
+from database.csv_io import (EXPORT_COLUMNS, IMPORT_BATCH_SIZE, ImportReport, decode_lines, export_rows,
+                             import_vehicles, stream_csv)
+from database.migrations.index import run_migrations
+from database.rollups import rebuild_rollups, delete_vehicles
+from database.reports import run_report_worker
+
+
+def init_database():
+    """Create missing tables, seed an empty database and fill the rollup tables once"""
+    db.create_all()
+    # Check if database is empty and seed it if needed
+    if db.session.query(Vehicle.id).first() is None:
+        seed_database()
+    # Databases created before the rollup tables existed need one full rebuild
+    if RowCount.query.first() is None:
+        rebuild_rollups()
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the tables and seed sample data if the database is empty"""
+    init_database()
+    print("Database ready.")
+
+
+@click.command('rebuild-rollups')
+@with_appcontext
+def rebuild_rollups_command():
+    """Recompute the dashboard rollup tables from the sales data"""
+    rebuild_rollups()
+    print("Rollup tables rebuilt.")
+
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """Apply pending schema migrations from database/migrations"""
+    applied = run_migrations(db.engine)
+    print(f"{len(applied)} migration(s) applied.")
+
+
+@click.command('seed-synthetic')
+@click.option('--vehicles', default=1000, show_default=True)
+@click.option('--customers', default=1000, show_default=True)
+@click.option('--salespeople', default=50, show_default=True)
+@click.option('--sales', default=10000, show_default=True)
+@click.option('--seed', default=42, show_default=True, help='RNG seed; the same seed gives the same data')
+@click.option('--batch-size', default=10000, show_default=True)
+@with_appcontext
+def seed_synthetic_command(vehicles, customers, salespeople, sales, seed, batch_size):
+    """Bulk-load a deterministic synthetic dataset"""
+    load_synthetic(vehicles=vehicles, customers=customers, salespeople=salespeople, sales=sales,
+                   seed=seed, batch_size=batch_size)
+
+
+@click.command('import-vehicles')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False, writable=True),
+              help='Write every rejected row (line, field, message) to this CSV file')
+@with_appcontext
+def import_vehicles_command(path, batch_size, errors_path):
+    """Import vehicles from a CSV file ('-' for stdin), validated like the vehicle form"""
+    error_file = open(errors_path, 'w', newline='') if errors_path else None
+    try:
+        on_reject = None
+        if error_file:
+            error_writer = csv.writer(error_file)
+            error_writer.writerow(('line', 'field', 'message'))
+
+            def on_reject(line, errors):
+                error_writer.writerows((line, field, message)
+                                       for field, messages in errors.items() for message in messages)
+        report = ImportReport(max_errors=10, on_reject=on_reject)
+        source = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        with source:
+            try:
+                import_vehicles(decode_lines(source), batch_size=batch_size, report=report)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+    finally:
+        if error_file:
+            error_file.close()
+    print(f"{report.imported} vehicle(s) imported, {report.rejected} row(s) rejected.")
+    for error in report.errors:
+        print(f"  line {error['line']}: {error['errors']}")
+    if report.truncated:
+        print(f"  ... and {report.rejected - len(report.errors)} more" + (f" (see {errors_path})" if errors_path else ""))
+
+
+@click.command('export-csv')
+@click.argument('table', type=click.Choice(sorted(EXPORT_COLUMNS)))
+@click.argument('path', type=click.Path(dir_okay=False, writable=True, allow_dash=True))
+@with_appcontext
+def export_csv_command(table, path):
+    """Export the vehicles or sales table to a CSV file ('-' for stdout)"""
+    columns, query = export_rows(table)
+    target = sys.stdout if path == '-' else open(path, 'w', newline='')
+    try:
+        for chunk in stream_csv(query, columns):
+            target.write(chunk)
+    finally:
+        if target is not sys.stdout:
+            target.close()
+
+
+@click.command('delete-vehicles')
+@click.option('--year', type=int, help='Only vehicles of this model year')
+@click.option('--make', help='Only vehicles of this make')
+@click.option('--type', 'vehicle_type', help='Only vehicles of this type')
+@with_appcontext
+def delete_vehicles_command(year, make, vehicle_type):
+    """Delete the matching vehicles, and their sales, with a single DELETE"""
+    criteria = [column == value for column, value in
+                ((Vehicle.year, year), (Vehicle.make, make), (Vehicle.type, vehicle_type)) if value is not None]
+    if not criteria:
+        raise click.UsageError('Give at least one of --year, --make or --type.')
+    try:
+        deleted = delete_vehicles(db.session.connection(), *criteria)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    print(f"{deleted} vehicle(s) deleted.")
+
+
+@click.command('report-worker')
+@click.option('--workers', type=int, help='Job threads (default REPORT_WORKERS, at least 1)')
+@with_appcontext
+def report_worker_command(workers):
+    """Run queued report jobs in the foreground until interrupted"""
+    print("Running report jobs; Ctrl+C to stop.")
+    run_report_worker(workers)
+
+
+COMMANDS = [init_db_command, rebuild_rollups_command, migrate_command, seed_synthetic_command,
+            import_vehicles_command, export_csv_command, delete_vehicles_command,
+            report_worker_command]
@@ -0,0 +1,393 @@
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from database.index import db
+from database.lookups import lookup, prefix_filter, DEFAULT_LOOKUP_LIMIT, MAX_LOOKUP_LIMIT
+from database.routing import RoutingSession
+from database.versions import read_versions
+from models.your_model import Vehicle, Customer
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('make', 'model', 'customer')
+TABLES = (Vehicle.__tablename__, Customer.__tablename__)
+
+# Separates the lowercased search key from the suggestion it stands for; sorts before any character
+SEP = '\0'
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def vehicle_keys(make, model):
+    """Keys for one vehicle: its make, and its model both on its own and after the make"""
+    return {
+        'make': [f'{normalize(make)}{SEP}{make}'],
+        'model': [f'{normalize(model)}{SEP}{make}{SEP}{model}', f'{normalize(make + " " + model)}{SEP}{make}{SEP}{model}'],
+    }
+
+
+def customer_keys(customer_id, first_name, last_name):
+    """Keys for one customer, so typing either the first or the last name finds them"""
+    label = f'{first_name} {last_name}'
+    keys = {f'{normalize(label)}{SEP}{customer_id}{SEP}{label}',
+            f'{normalize(last_name + " " + first_name)}{SEP}{customer_id}{SEP}{label}'}
+    return {'customer': sorted(keys)}
+
+
+def suggestion(kind, key):
+    parts = key.split(SEP)
+    if kind == 'make':
+        return {'label': parts[1]}
+    if kind == 'model':
+        return {'label': f'{parts[1]} {parts[2]}', 'make': parts[1], 'model': parts[2]}
+    return {'id': int(parts[1]), 'label': parts[2]}
+
+
+def key_bytes(key):
+    # The string plus its slot in the sorted list
+    return sys.getsizeof(key) + 8
+
+
+class TooLarge(Exception):
+    """The index would pass its byte limit; carries the data versions it was built from"""
+
+    def __init__(self, versions, max_bytes):
+        super().__init__(f'autocomplete index passed AUTOCOMPLETE_MAX_BYTES ({max_bytes:,} bytes)')
+        self.versions = versions
+
+
+class PrefixIndex:
+    """Sorted key lists, one per kind, searched by prefix with bisect.
+
+    Each key is the lowercased text to match followed by the suggestion
+    it stands for, so a list of plain strings is the whole index: no
+    per-entry objects, and a prefix search is one bisect plus a scan of
+    at most a few keys per suggestion returned. Make and model keys are
+    shared by many vehicles and reference-counted; a customer key is
+    unique to its customer.
+    """
+
+    def __init__(self, versions, max_bytes):
+        self.versions = dict(versions)
+        self.max_bytes = max_bytes
+        self.keys = {kind: [] for kind in KINDS}
+        self.counts = Counter()
+        self.bytes = 0
+
+    def __len__(self):
+        return sum(len(keys) for keys in self.keys.values())
+
+    def _grow(self, key):
+        self.bytes += key_bytes(key)
+        if self.bytes > self.max_bytes:
+            raise TooLarge(self.versions, self.max_bytes)
+
+    def load(self, kind, keys, counts=None):
+        """Add many distinct keys at once and sort them a single time"""
+        target = self.keys[kind]
+        for key in keys:
+            self._grow(key)
+            target.append(key)
+        target.sort()
+        if counts:
+            self.counts.update(counts)
+
+    def add(self, keys):
+        for kind, kind_keys in keys.items():
+            for key in kind_keys:
+                if kind != 'customer':
+                    self.counts[key] += 1
+                    if self.counts[key] > 1:
+                        continue
+                self._grow(key)
+                insort(self.keys[kind], key)
+
+    def remove(self, keys):
+        for kind, kind_keys in keys.items():
+            for key in kind_keys:
+                if kind != 'customer':
+                    self.counts[key] -= 1
+                    if self.counts[key] > 0:
+                        continue
+                    del self.counts[key]
+                target = self.keys[kind]
+                i = bisect_left(target, key)
+                if i < len(target) and target[i] == key:
+                    del target[i]
+                    self.bytes -= key_bytes(key)
+
+    def search(self, kind, prefix, limit):
+        keys = self.keys[kind]
+        results, seen = [], set()
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and len(results) < limit and keys[i].startswith(prefix):
+            # A customer can match through both of their keys; show them once
+            value = keys[i].split(SEP, 1)[1]
+            if value not in seen:
+                seen.add(value)
+                results.append(suggestion(kind, keys[i]))
+            i += 1
+        return results
+
+
+def build_index(max_bytes):
+    """Read makes, models and customer names into a new PrefixIndex, or raise TooLarge.
+
+    The data versions are read first: a change committed while the rows
+    are being read leaves the index behind its versions, so the next
+    check rebuilds it rather than missing the change.
+    """
+    index = PrefixIndex(read_versions(TABLES)[0], max_bytes)
+    counts = {'make': Counter(), 'model': Counter()}
+    rows = db.session.query(Vehicle.make, Vehicle.model, db.func.count()).group_by(Vehicle.make, Vehicle.model)
+    for make, model, count in rows:
+        for kind, keys in vehicle_keys(make, model).items():
+            for key in keys:
+                counts[kind][key] += count
+    for kind, kind_counts in counts.items():
+        index.load(kind, kind_counts, kind_counts)
+
+    def customers():
+        query = db.session.query(Customer.id, Customer.first_name, Customer.last_name) \
+            .execution_options(stream_results=True).yield_per(10000)
+        for customer_id, first_name, last_name in query:
+            yield from customer_keys(customer_id, first_name, last_name)['customer']
+    index.load('customer', customers())
+    return index
+
+
+class Autocomplete:
+    """The per-process prefix index behind /api/autocomplete, loaded and refreshed in the background.
+
+    Nothing is read until the first lookup, which starts the load and is
+    answered from the database's prefix indexes until the load finishes.
+    Creates, edits and deletes made through this process's ORM sessions
+    are applied as they commit. At most once every `check_seconds` a
+    lookup compares the data versions with what the index accounts for;
+    any other change (another worker, a bulk import or delete) triggers
+    a background rebuild, served from the old index meanwhile. An index
+    that would exceed `max_bytes` is dropped and lookups go to the
+    database until the data changes again.
+    """
+
+    def __init__(self, max_bytes, check_seconds):
+        self.max_bytes = max_bytes
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self.index = None
+        self._loading = False
+        self._too_large_at = None  # versions at which the last load did not fit
+        self._checked_at = 0.0
+        self.lookups = Counter()
+        self.loads = 0
+
+    def search(self, term, kinds=KINDS, limit=DEFAULT_LOOKUP_LIMIT):
+        """{kind: [suggestion]} for everything starting with `term`"""
+        prefix = normalize(term or '').replace(SEP, '')
+        limit = max(1, min(limit, MAX_LOOKUP_LIMIT))
+        if not prefix:
+            return {kind: [] for kind in kinds}
+        self._maybe_refresh()
+        with self._lock:
+            index = self.index
+            if index is not None:
+                self.lookups['memory'] += 1
+                return {kind: index.search(kind, prefix, limit) for kind in kinds}
+            self.lookups['database'] += 1
+        return database_suggestions(term.strip(), kinds, limit)
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._loading or now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now
+        versions = read_versions(TABLES)[0]
+        with self._lock:
+            current = self.index.versions if self.index is not None else self._too_large_at
+            if versions == current or self._loading:
+                return
+            self._loading = True
+        app = current_app._get_current_object()
+        threading.Thread(target=self._load, args=(app,), name='autocomplete-load', daemon=True).start()
+
+    def _load(self, app):
+        try:
+            with app.app_context():
+                index = build_index(self.max_bytes)
+            with self._lock:
+                self.index, self._too_large_at = index, None
+                self.loads += 1
+        except TooLarge as e:
+            logger.warning('%s; autocomplete reads the database instead', e)
+            with self._lock:
+                self.index, self._too_large_at = None, e.versions
+        except Exception:
+            logger.exception('Loading the autocomplete index failed')
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def apply(self, changes, bumps):
+        """Apply committed ORM changes, [(table, keys removed, keys added)], and their version bumps per table"""
+        with self._lock:
+            index = self.index
+            if index is None:
+                return
+            try:
+                for table, removed, added in changes:
+                    if removed is None and added is None:
+                        # A rename whose old value was never loaded: leave it to the next check's rebuild
+                        index.versions[table] = -1
+                        continue
+                    if removed:
+                        index.remove(removed)
+                    if added:
+                        index.add(added)
+            except TooLarge as e:
+                # Retried at the next check, which gives up until the data changes if it still does not fit
+                logger.warning('%s; autocomplete reads the database instead', e)
+                self.index = None
+                return
+            for table, count in bumps.items():
+                if index.versions[table] >= 0:
+                    index.versions[table] += count
+
+    def render_metrics(self):
+        index = self.index
+        lines = [
+            '# HELP autocomplete_lookups_total Autocomplete lookups, by where they were answered.',
+            '# TYPE autocomplete_lookups_total counter',
+        ]
+        lines += [f'autocomplete_lookups_total{{source="{source}"}} {self.lookups[source]}'
+                  for source in ('memory', 'database')]
+        lines += [
+            '# HELP autocomplete_loads_total Autocomplete index loads and rebuilds.',
+            '# TYPE autocomplete_loads_total counter',
+            f'autocomplete_loads_total {self.loads}',
+            '# HELP autocomplete_keys Keys held by the autocomplete index.',
+            '# TYPE autocomplete_keys gauge',
+            f'autocomplete_keys {len(index) if index is not None else 0}',
+            '# HELP autocomplete_bytes Approximate memory held by the autocomplete index.',
+            '# TYPE autocomplete_bytes gauge',
+            f'autocomplete_bytes {index.bytes if index is not None else 0}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+def database_suggestions(term, kinds, limit):
+    """The same suggestions from the lower(column) prefix indexes, while the index is not loaded"""
+    results = {}
+    if 'make' in kinds:
+        rows = db.session.query(Vehicle.make).filter(prefix_filter(Vehicle.make, term)) \
+            .distinct().order_by(Vehicle.make).limit(limit)
+        results['make'] = [{'label': make} for make, in rows]
+    if 'model' in kinds:
+        rows = db.session.query(Vehicle.make, Vehicle.model).filter(prefix_filter(Vehicle.model, term)) \
+            .distinct().order_by(Vehicle.model, Vehicle.make).limit(limit)
+        results['model'] = [{'label': f'{make} {model}', 'make': make, 'model': model} for make, model in rows]
+    if 'customer' in kinds:
+        results['customer'] = lookup(Customer, term, ('first_name', 'last_name'), limit)
+    return results
+
+
+def autocomplete():
+    return current_app.extensions['autocomplete']
+
+
+# ORM hooks: record each change against the flushing session and apply it to the index only
+# once that session commits, so a rolled-back change never shows up in suggestions. Every
+# one of these events also bumps the table's data version (database.versions), which is
+# how the index tells its own changes from everyone else's.
+
+def _pending(target):
+    return object_session(target).info.setdefault('autocomplete', ([], Counter()))
+
+
+def _keys(target):
+    if isinstance(target, Vehicle):
+        return vehicle_keys(target.make, target.model)
+    return customer_keys(target.id, target.first_name, target.last_name)
+
+
+def _old_keys(target, names):
+    """Keys for the values before this flush; None if a changed value was never loaded"""
+    state = db.inspect(target)
+    old = {}
+    for name in names:
+        history = state.attrs[name].history
+        if history.has_changes():
+            if not history.deleted:
+                return None
+            old[name] = history.deleted[0]
+        else:
+            old[name] = getattr(target, name)
+    if isinstance(target, Vehicle):
+        return vehicle_keys(old['make'], old['model'])
+    return customer_keys(target.id, old['first_name'], old['last_name'])
+
+
+def _after_insert(mapper, connection, target):
+    table = mapper.local_table.name
+    changes, bumps = _pending(target)
+    changes.append((table, None, _keys(target)))
+    bumps[table] += 1
+
+
+def _after_update(mapper, connection, target):
+    table = mapper.local_table.name
+    changes, bumps = _pending(target)
+    bumps[table] += 1
+    names = ('make', 'model') if isinstance(target, Vehicle) else ('first_name', 'last_name')
+    if not any(db.inspect(target).attrs[name].history.has_changes() for name in names):
+        return
+    old = _old_keys(target, names)
+    changes.append((table, old, _keys(target)) if old is not None else (table, None, None))
+
+
+def _before_delete(mapper, connection, target):
+    # Read the values while the row still exists; the version is bumped by the delete that follows
+    table = mapper.local_table.name
+    changes, bumps = _pending(target)
+    changes.append((table, _keys(target), None))
+    bumps[table] += 1
+
+
+def _after_commit(session):
+    changes, bumps = session.info.pop('autocomplete', ([], None))
+    if bumps and has_app_context() and 'autocomplete' in current_app.extensions:
+        autocomplete().apply(changes, bumps)
+
+
+def _after_rollback(session):
+    session.info.pop('autocomplete', None)
+
+
+def register_autocomplete_events():
+    for model in (Vehicle, Customer):
+        if not event.contains(model, 'after_insert', _after_insert):
+            event.listen(model, 'after_insert', _after_insert)
+            event.listen(model, 'after_update', _after_update)
+            event.listen(model, 'before_delete', _before_delete)
+    if not event.contains(RoutingSession, 'after_commit', _after_commit):
+        event.listen(RoutingSession, 'after_commit', _after_commit)
+        event.listen(RoutingSession, 'after_rollback', _after_rollback)
+
+
+register_autocomplete_events()
+
+
+def init_autocomplete(app):
+    """Set up the autocomplete index from AUTOCOMPLETE_MAX_BYTES and AUTOCOMPLETE_CHECK_SECONDS"""
+    app.config.setdefault('AUTOCOMPLETE_MAX_BYTES', 64 * 1024 * 1024)
+    app.config.setdefault('AUTOCOMPLETE_CHECK_SECONDS', 5.0)
+    app.extensions['autocomplete'] = Autocomplete(app.config['AUTOCOMPLETE_MAX_BYTES'],
+                                                  app.config['AUTOCOMPLETE_CHECK_SECONDS'])
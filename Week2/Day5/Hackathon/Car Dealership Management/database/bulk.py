@@ -0,0 +1,55 @@
+import csv
+import io
+from database.index import db
+
+
+def timestamp_text(value):
+    # Same text layout SQLAlchemy uses, so SQLite string comparisons stay consistent
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class BulkWriter:
+    """Write row tuples in batches: COPY FROM STDIN on Postgres, executemany elsewhere.
+
+    Rows go through the session's connection, so they commit or roll back
+    with the session. Nothing here fires ORM events: callers update the
+    rollups and data versions themselves.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        connection = db.session.connection()
+        self.dialect = connection.dialect.name
+        self.cursor = connection.connection.cursor()
+
+    def insert(self, table, columns, rows):
+        """Insert one batch of rows"""
+        if self.dialect == 'postgresql':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            self.cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            placeholders = ', '.join('?' if self.dialect == 'sqlite' else '%s' for _ in columns)
+            self.cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+    def write(self, table, columns, rows, progress=None):
+        """Insert any iterable of rows batch_size at a time, calling progress(n) after each batch"""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                self.insert(table, columns, batch)
+                if progress:
+                    progress(len(batch))
+                batch = []
+        if batch:
+            self.insert(table, columns, batch)
+            if progress:
+                progress(len(batch))
+
+    def reset_sequence(self, table):
+        if self.dialect == 'postgresql':
+            self.cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+            )
@@ -0,0 +1,49 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from database.index import db
+
+
+def increment(connection, model, keys, column, amount, extra=None):
+    """Add `amount` to `column` of the row identified by `keys`, creating it if needed.
+
+    `extra` holds further column values written on both insert and update.
+    """
+    if not amount:
+        return
+    table = model.__table__
+    counter = table.c[column]
+    extra = extra or {}
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table).values(**keys, **extra, **{column: amount}).on_conflict_do_update(
+            index_elements=list(keys), set_={column: counter + amount, **extra}
+        )
+        connection.execute(stmt)
+        return
+    where = db.and_(*(table.c[name] == value for name, value in keys.items()))
+    result = connection.execute(table.update().where(where).values({column: counter + amount, **extra}))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(**keys, **extra, **{column: amount}))
+
+
+def increment_many(connection, model, key_names, column, amounts):
+    """Apply {key tuple: amount} to `column` of many counter rows at once.
+
+    On PostgreSQL and SQLite this is a single executemany upsert per call,
+    instead of one statement per row; other databases fall back to increment().
+    """
+    amounts = {keys: amount for keys, amount in amounts.items() if amount}
+    if not amounts:
+        return
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        table = model.__table__
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_names), set_={column: table.c[column] + stmt.excluded[column]}
+        )
+        connection.execute(stmt, [{**dict(zip(key_names, keys)), column: amount} for keys, amount in amounts.items()])
+        return
+    for keys, amount in amounts.items():
+        increment(connection, model, dict(zip(key_names, keys)), column, amount)
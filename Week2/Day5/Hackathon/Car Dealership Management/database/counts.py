@@ -0,0 +1,71 @@
+from flask import current_app
+from database.index import db
+from models.rollups import RowCount
+
+
+class Total(int):
+    """A row count that knows whether it is exact, and how it was obtained.
+
+    `method` is 'counter' (the row count rollup), 'exact' (a capped COUNT
+    that stayed under the threshold), 'planner' (PostgreSQL's EXPLAIN row
+    estimate) or 'sample' (extrapolated from the first matches in id order).
+    """
+
+    def __new__(cls, value, exact=True, method='exact'):
+        total = super().__new__(cls, max(0, int(value)))
+        total.exact = exact
+        total.method = method
+        return total
+
+    def __repr__(self):
+        return f'<Total {int(self)} {self.method}>'
+
+
+def table_total(model):
+    """Exact row count of a whole table, read from the rollup counter the writes keep current"""
+    count = db.session.query(RowCount.row_count).filter(RowCount.table_name == model.__tablename__).scalar()
+    return Total(count or 0, method='counter')
+
+
+def rounded(value):
+    # An estimate is only good to a couple of digits; don't pretend otherwise
+    digits = len(str(int(value)))
+    return int(round(value, 2 - digits)) if digits > 2 else int(value)
+
+
+def planner_estimate(query):
+    """The row count PostgreSQL's planner expects `query` to return, from EXPLAIN"""
+    connection = db.session.connection()
+    compiled = query.statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params).scalar()
+    return plan[0]['Plan']['Plan Rows']
+
+
+def count_rows(query, model, whole_table=False, threshold=None):
+    """Count the rows of `query`, exactly while that is cheap and approximately beyond it.
+
+    A whole table is read from the row count rollup. Otherwise the count
+    stops after `threshold` + 1 matches (COUNT_EXACT_THRESHOLD by default),
+    so it never reads more than that many rows to learn the total is large.
+    Past the threshold the total is an estimate: the planner's row estimate
+    on PostgreSQL, elsewhere the table size scaled by how many rows the
+    first matches in id order were spread over.
+    """
+    if whole_table:
+        return table_total(model)
+    threshold = current_app.config['COUNT_EXACT_THRESHOLD'] if threshold is None else threshold
+
+    query = query.order_by(None)
+    capped = query.with_entities(model.id).limit(threshold + 1).subquery()
+    matched = db.session.query(db.func.count()).select_from(capped).scalar()
+    if matched <= threshold:
+        return Total(matched)
+
+    if db.get_engine().dialect.name == 'postgresql':
+        return Total(rounded(max(planner_estimate(query), matched)), exact=False, method='planner')
+    # SQLite keeps no row estimates: see how far into the table the first matches reach
+    first = query.with_entities(model.id.label('id')).order_by(model.id).limit(threshold + 1).subquery()
+    reach = db.session.query(db.func.max(first.c.id)).scalar()
+    spanned = db.session.query(db.func.count(model.id)).filter(model.id <= reach).scalar()
+    estimate = table_total(model) * matched / max(spanned, 1)
+    return Total(rounded(max(estimate, matched)), exact=False, method='sample')
@@ -0,0 +1,147 @@
+import codecs
+import csv
+import io
+from collections import Counter
+from datetime import datetime
+from werkzeug.datastructures import MultiDict
+from database.bulk import BulkWriter, timestamp_text
+from database.index import db
+from database.rollups import apply_row_count, apply_vehicle_types
+from database.streaming import STREAM_BATCH_SIZE, VEHICLE_FIELDS
+from database.versions import bump_version
+from models.your_model import Vehicle, Sale
+
+# Columns read from an imported vehicle CSV; any others (such as the id in an export) are ignored
+IMPORT_FIELDS = ('make', 'model', 'year', 'price', 'type', 'description', 'image_url')
+REQUIRED_IMPORT_FIELDS = ('make', 'model', 'year', 'price', 'type')
+IMPORT_COLUMNS = IMPORT_FIELDS + ('created_at',)
+
+# Columns written by the CSV exports, in file order
+EXPORT_COLUMNS = {
+    'vehicles': (Vehicle, VEHICLE_FIELDS),
+    'sales': (Sale, ('id', 'vehicle_id', 'customer_id', 'salesperson_id', 'sale_date', 'sale_price')),
+}
+
+# Rows inserted per COPY / executemany round-trip
+IMPORT_BATCH_SIZE = 1000
+
+# Export output is yielded in chunks of about this many bytes
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+class ImportReport:
+    """Rows imported and rejected, with each rejected row's line number and field errors.
+
+    Only the first `max_errors` rejections are kept (all of them when None);
+    `on_reject(line, errors)` sees every one, e.g. to write a full error file.
+    """
+
+    def __init__(self, max_errors=1000, on_reject=None):
+        self.max_errors = max_errors
+        self.on_reject = on_reject
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, errors):
+        self.rejected += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+        if self.on_reject:
+            self.on_reject(line, errors)
+
+    @property
+    def truncated(self):
+        return len(self.errors) < self.rejected
+
+    def to_dict(self):
+        return {'imported': self.imported, 'rejected': self.rejected, 'errors': self.errors,
+                'errors_truncated': self.truncated}
+
+
+def decode_lines(stream, encoding='utf-8-sig'):
+    """Text lines from a binary stream (an upload or request body), read incrementally"""
+    return codecs.iterdecode(stream, encoding)
+
+
+def _row_form():
+    # The create/edit form, so an import accepts exactly what the form accepts.
+    # One instance is re-processed for every row; CSRF does not apply to files.
+    from forms import VehicleForm
+    return VehicleForm(formdata=None, meta={'csrf': False})
+
+
+def import_vehicles(lines, batch_size=IMPORT_BATCH_SIZE, report=None):
+    """Validate and insert vehicles from CSV text lines, streaming; return an ImportReport.
+
+    The header names the columns (case-insensitive, any order). Each row is
+    checked with the VehicleForm validators; invalid rows are reported by
+    line number and skipped, valid ones are written batch_size at a time
+    with COPY on PostgreSQL. Everything commits in one transaction, along
+    with the vehicle counters and type rollup. Raises ValueError if the
+    header lacks a required column or the file is not valid text.
+    """
+    report = report or ImportReport()
+    reader = csv.reader(lines)
+    try:
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [name for name in REQUIRED_IMPORT_FIELDS if name not in header]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+        positions = {name: header.index(name) for name in IMPORT_FIELDS if name in header}
+
+        form = _row_form()
+        types = Counter()
+        created_at = timestamp_text(datetime.utcnow())
+
+        def valid_rows():
+            for row in reader:
+                if not any(value.strip() for value in row):
+                    continue
+                values = MultiDict({name: row[i].strip() if i < len(row) else ''
+                                    for name, i in positions.items()})
+                if 'type' in values:
+                    values['type'] = values['type'].lower()
+                form.process(values)
+                if not form.validate():
+                    report.reject(reader.line_num, form.errors)
+                    continue
+                report.imported += 1
+                types[form.type.data] += 1
+                # Text rather than Decimal: sqlite3 cannot bind Decimals and COPY reads text anyway
+                yield (form.make.data, form.model.data, form.year.data, str(form.price.data), form.type.data,
+                       form.description.data or None, form.image_url.data or None, created_at)
+
+        BulkWriter(batch_size).write(Vehicle.__tablename__, IMPORT_COLUMNS, valid_rows())
+        connection = db.session.connection()
+        apply_row_count(connection, Vehicle.__tablename__, report.imported)
+        apply_vehicle_types(connection, types)
+        bump_version(connection, Vehicle.__tablename__)
+        db.session.commit()
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        raise ValueError(f"Could not read the CSV file: {e}")
+    except Exception:
+        db.session.rollback()
+        raise
+    return report
+
+
+def export_rows(table):
+    """(columns, query) for a CSV export of `table`, in id order"""
+    model, columns = EXPORT_COLUMNS[table]
+    return columns, db.session.query(*(getattr(model, name) for name in columns)).order_by(model.id)
+
+
+def stream_csv(query, columns, chunk_bytes=EXPORT_CHUNK_BYTES):
+    """Yield the rows as CSV text in chunks, reading the cursor in batches"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE):
+        writer.writerow(row)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
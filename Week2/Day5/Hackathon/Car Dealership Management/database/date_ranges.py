@@ -0,0 +1,240 @@
+from datetime import date, timedelta
+from database.index import db
+from models.your_model import Vehicle, Salesperson, Sale
+from models.rollups import (RowCount, DailySales, DailySalespersonSales, MonthlySalespersonSales, DailyVehicleSales,
+                            MonthlyVehicleSales, YearlyVehicleSales, VehicleSales)
+
+BUCKETS = ('day', 'week', 'month', 'year')
+
+# Named ranges offered on the dashboard: preset -> first day, given today
+PRESETS = {
+    '30d': lambda today: today - timedelta(days=29),
+    '90d': lambda today: today - timedelta(days=89),
+    'ytd': lambda today: date(today.year, 1, 1),
+    '12m': lambda today: next_bucket(date(today.year - 1, today.month, 1), 'month'),
+    'all': lambda today: None,
+}
+DEFAULT_PRESET = 'all'
+
+
+class DateRange:
+    """An inclusive [start, end] range of sale dates and the bucket used to chart it"""
+
+    def __init__(self, start, end, bucket, preset=None):
+        self.start = start
+        self.end = end
+        self.bucket = bucket
+        self.preset = preset
+
+    def __repr__(self):
+        return f'<DateRange {self.start}..{self.end} by {self.bucket}>'
+
+
+def default_bucket(start, end):
+    days = (end - start).days + 1
+    if days <= 62:
+        return 'day'
+    if days <= 366:
+        return 'week' if days <= 120 else 'month'
+    return 'month' if days <= 3 * 366 else 'year'
+
+
+def parse_range(args, today=None):
+    """Build a DateRange from ?range=<preset> or ?from=YYYY-MM-DD&to=YYYY-MM-DD, plus ?bucket=.
+
+    Raises ValueError for malformed dates, an unknown preset or bucket, or
+    a range that ends before it starts.
+    """
+    today = today or date.today()
+    preset = args.get('range') or (None if args.get('from') or args.get('to') else DEFAULT_PRESET)
+    if preset is not None and preset not in PRESETS:
+        raise ValueError(f"Unknown range '{preset}'")
+    if preset is not None:
+        start, end = PRESETS[preset](today), today
+    else:
+        start = date.fromisoformat(args['from']) if args.get('from') else None
+        end = date.fromisoformat(args['to']) if args.get('to') else today
+
+    if start is None or preset == 'all':
+        # Open-ended: span the days that actually have sales
+        first, last = db.session.query(db.func.min(DailySales.sale_date), db.func.max(DailySales.sale_date)).one()
+        start = start or first or end
+        if preset == 'all' and last:
+            end = last
+    if end < start:
+        raise ValueError("The range ends before it starts")
+
+    bucket = args.get('bucket') or default_bucket(start, end)
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'")
+    return DateRange(start, end, bucket, preset)
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(day, bucket):
+    if bucket == 'week':
+        return day + timedelta(days=7)
+    if bucket == 'month':
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    if bucket == 'year':
+        return date(day.year + 1, 1, 1)
+    return day + timedelta(days=1)
+
+
+def bucket_label(day, bucket):
+    if bucket == 'month':
+        return day.strftime('%Y-%m')
+    if bucket == 'year':
+        return str(day.year)
+    return day.isoformat()
+
+
+def sales_series(date_range):
+    """[(label, count)] for every bucket in the range, zero-filled, from the per-day rollup.
+
+    The per-day rows are read with one primary-key range scan and summed
+    into weeks, months or years in Python: at most ~1,800 rows for five
+    years, whatever the number of sales.
+    """
+    counts = {}
+    rows = db.session.query(DailySales.sale_date, DailySales.sale_count) \
+        .filter(DailySales.sale_date.between(date_range.start, date_range.end), DailySales.sale_count != 0)
+    for sale_date, count in rows:
+        key = bucket_start(sale_date, date_range.bucket)
+        counts[key] = counts.get(key, 0) + count
+
+    series = []
+    day = bucket_start(date_range.start, date_range.bucket)
+    while day <= date_range.end:
+        series.append((bucket_label(day, date_range.bucket), counts.get(day, 0)))
+        day = next_bucket(day, date_range.bucket)
+    return series
+
+
+def bucket_selects(start, end, key, levels, sign=1):
+    """SELECTs of (key, sale_count) summing to the sales in [start, end], from the coarsest rollups that fit.
+
+    `levels` is [(bucket, rollup model)] from coarsest to 'day'. Each end
+    of the range is rounded to the nearer boundary of the first level:
+    a partial bucket mostly outside the range is read from the finer
+    levels, one mostly inside it is read whole and the days outside are
+    subtracted (sign=-1). So no finer level reads more than half a
+    bucket at either end.
+    """
+    (bucket, model), finer = levels[0], levels[1:]
+    if bucket == 'day':
+        count = model.sale_count if sign > 0 else -model.sale_count
+        return [db.select(getattr(model, key), count.label('sale_count'))
+                .where(model.sale_date.between(start, end))]
+
+    def whole(first, last):
+        if bucket == 'year':
+            within = model.year.between(first.year, last.year)
+        else:
+            # A row-value range, which the (year, month, ...) primary key can seek
+            month = db.tuple_(model.year, model.month)
+            within = db.and_(month >= db.tuple_(first.year, first.month), month <= db.tuple_(last.year, last.month))
+        count = model.sale_count if sign > 0 else -model.sale_count
+        return db.select(getattr(model, key), count.label('sale_count')).where(within)
+
+    def part(first, last, part_sign):
+        return bucket_selects(first, last, key, finer, part_sign) if first <= last else []
+
+    one_day = timedelta(days=1)
+    first, last = bucket_start(start, bucket), bucket_start(end, bucket)
+    if first == last:
+        # Inside one bucket: the bucket less both overhangs, or the range itself, whichever is shorter
+        stop = next_bucket(first, bucket)
+        if ((start - first) + (stop - end - one_day)) < (end - start + one_day):
+            return [whole(first, first)] + part(first, start - one_day, -sign) \
+                + part(end + one_day, stop - one_day, -sign)
+        return part(start, end, sign)
+
+    selects = []
+    if start - first < next_bucket(first, bucket) - start:
+        selects += part(first, start - one_day, -sign)
+    else:
+        first = next_bucket(first, bucket)
+        selects += part(start, first - one_day, sign)
+    stop = next_bucket(last, bucket)
+    if stop - end - one_day < end - last + one_day:
+        selects += part(end + one_day, stop - one_day, -sign)
+    else:
+        stop = last
+        selects += part(last, end, sign)
+    if first < stop:
+        selects.append(whole(first, bucket_start(stop - one_day, bucket)))
+    return selects
+
+
+def split_counts(date_range, key, levels):
+    """(key, sale_count) rows covering the range, as a subquery; several rows may share a key.
+
+    Five years of per-month buckets are ~60 rows per key rather than
+    ~1,800 per-day ones; whole years bring that down to ~5.
+    """
+    return db.union_all(*bucket_selects(date_range.start, date_range.end, key, levels)).subquery()
+
+
+def salesperson_counts(date_range):
+    """Per-salesperson sale counts for the range, as a (salesperson_id, sale_count) subquery"""
+    return split_counts(date_range, 'salesperson_id',
+                        [('month', MonthlySalespersonSales), ('day', DailySalespersonSales)])
+
+
+def top_vehicles_in_range(date_range, range_total, total_sales, limit=5):
+    """The `limit` best-selling vehicles within the range.
+
+    A range spanning every sale reads the all-time vehicle rollup alone;
+    any other range sums the per-year, per-month and per-day vehicle
+    rollups (see bucket_selects), so the sales table is never read.
+    """
+    if range_total == total_sales:
+        counts = db.select(VehicleSales.vehicle_id, VehicleSales.sale_count.label('sales_count')).subquery()
+    else:
+        buckets = split_counts(date_range, 'vehicle_id', [('year', YearlyVehicleSales), ('month', MonthlyVehicleSales),
+                                                          ('day', DailyVehicleSales)])
+        counts = db.select(buckets.c.vehicle_id, db.func.sum(buckets.c.sale_count).label('sales_count')) \
+            .group_by(buckets.c.vehicle_id).order_by(db.desc('sales_count')).limit(limit).subquery()
+
+    return db.session.query(Vehicle.make, Vehicle.model, counts.c.sales_count) \
+        .join(counts, counts.c.vehicle_id == Vehicle.id).filter(counts.c.sales_count > 0) \
+        .order_by(counts.c.sales_count.desc()).limit(limit).all()
+
+
+def range_stats(date_range):
+    """Everything the dashboard charts for a date range.
+
+    The sale counts, the per-salesperson split and the top vehicles all
+    come from the per-day and per-month rollups.
+    """
+    series = sales_series(date_range)
+    range_total = sum(count for label, count in series)
+    total_sales = db.session.query(RowCount.row_count).filter(RowCount.table_name == Sale.__tablename__).scalar() or 0
+
+    counts = salesperson_counts(date_range)
+    sales_by_person = db.session.query(
+        Salesperson.first_name,
+        Salesperson.last_name,
+        db.func.sum(counts.c.sale_count).label('sales_count')
+    ).join(counts, counts.c.salesperson_id == Salesperson.id) \
+        .group_by(Salesperson.id, Salesperson.first_name, Salesperson.last_name) \
+        .having(db.func.sum(counts.c.sale_count) > 0) \
+        .order_by(db.desc('sales_count')).all()
+
+    return {
+        'range': date_range,
+        'range_total': range_total,
+        'sales_series': series,
+        'top_vehicles': top_vehicles_in_range(date_range, range_total, total_sales),
+        'sales_by_person': sales_by_person,
+    }
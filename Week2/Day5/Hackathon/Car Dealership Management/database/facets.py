@@ -0,0 +1,185 @@
+import threading
+from decimal import Decimal, InvalidOperation
+from database.index import db
+from database.versions import read_versions
+
+FACETS = ('type', 'make', 'year', 'price')
+
+# Price facet buckets as [low, high) ranges; None leaves a side open
+PRICE_BUCKETS = ((None, 10000), (10000, 20000), (20000, 30000), (30000, 50000), (50000, 75000), (75000, None))
+
+
+class VehicleFilters:
+    """The facet selection from the query string.
+
+    ?type= and ?make= may repeat (any of the values matches); year_min and
+    year_max are inclusive (?year= sets both), price_min <= price < price_max
+    like the price buckets. Malformed numbers are ignored.
+    """
+
+    def __init__(self, types=(), makes=(), year_min=None, year_max=None, price_min=None, price_max=None):
+        self.types = list(types)
+        self.makes = list(makes)
+        self.year_min = year_min
+        self.year_max = year_max
+        self.price_min = price_min
+        self.price_max = price_max
+
+    @classmethod
+    def from_args(cls, args):
+        def number(name, kind):
+            try:
+                return kind(args[name]) if args.get(name) else None
+            except (ValueError, InvalidOperation):
+                return None
+        year = number('year', int)
+        return cls(
+            types=[value for value in args.getlist('type') if value],
+            makes=[value for value in args.getlist('make') if value],
+            year_min=number('year_min', int) if year is None else year,
+            year_max=number('year_max', int) if year is None else year,
+            price_min=number('price_min', Decimal), price_max=number('price_max', Decimal),
+        )
+
+    def __bool__(self):
+        return any(value not in (None, []) for value in vars(self).values())
+
+    def to_args(self):
+        """Query-string arguments for url_for, so paging links keep the filters"""
+        args = {'type': self.types, 'make': self.makes, 'year_min': self.year_min, 'year_max': self.year_max,
+                'price_min': self.price_min, 'price_max': self.price_max}
+        return {name: value for name, value in args.items() if value not in (None, [])}
+
+    def predicates(self, columns):
+        """{facet: condition} over `columns` (anything with type/make/year/price attributes)"""
+        conditions = {}
+        if self.types:
+            conditions['type'] = columns.type.in_(self.types)
+        if self.makes:
+            conditions['make'] = columns.make.in_(self.makes)
+        years = []
+        if self.year_min is not None:
+            years.append(columns.year >= self.year_min)
+        if self.year_max is not None:
+            years.append(columns.year <= self.year_max)
+        if years:
+            conditions['year'] = db.and_(*years)
+        prices = []
+        if self.price_min is not None:
+            prices.append(columns.price >= self.price_min)
+        if self.price_max is not None:
+            prices.append(columns.price < self.price_max)
+        if prices:
+            conditions['price'] = db.and_(*prices)
+        return conditions
+
+
+def filter_vehicles(query, model, filters):
+    """Restrict a vehicle query to the selected facet values"""
+    conditions = filters.predicates(model)
+    return query.filter(*conditions.values()) if conditions else query
+
+
+def price_bucket(column):
+    """CASE expression numbering the PRICE_BUCKETS a price falls into"""
+    return db.case(*((column < high, index) for index, (low, high) in enumerate(PRICE_BUCKETS) if high is not None),
+                   else_=len(PRICE_BUCKETS) - 1)
+
+
+def bucket_label(index):
+    low, high = PRICE_BUCKETS[index]
+    if low is None:
+        return f'Under ${high:,}'
+    if high is None:
+        return f'${low:,}+'
+    return f'${low:,} - ${high:,}'
+
+
+def _facet_counts(query, model, filters):
+    """{facet: {value: count}} for every facet in one statement.
+
+    A facet's counts apply every filter except its own, so choosing one
+    type still shows how many vehicles the other types would add. Each
+    count is a SUM(CASE ...) over the searched vehicles; PostgreSQL groups
+    by all four facets at once with GROUPING SETS, other databases run a
+    UNION ALL of four GROUP BYs over the same subquery.
+    """
+    # The bucket is computed in the subquery so GROUP BY names a plain column
+    base = query.with_entities(model.type, model.make, model.year, model.price,
+                               price_bucket(model.price).label('price_bucket')).order_by(None).subquery('base')
+    conditions = filters.predicates(base.c)
+    counts = {}
+    for facet in FACETS:
+        others = [condition for name, condition in conditions.items() if name != facet]
+        counts[facet] = db.func.sum(db.case((db.and_(*others), 1), else_=0)) if others else db.func.count()
+    keys = {'type': base.c.type, 'make': base.c.make, 'year': base.c.year, 'price': base.c.price_bucket}
+
+    result = {facet: {} for facet in FACETS}
+    if db.get_engine().dialect.name == 'postgresql':
+        grouped = db.select(
+            *(key.label(facet) for facet, key in keys.items()),
+            *(db.func.grouping(key).label(f'{facet}_grouping') for facet, key in keys.items()),
+            *(count.label(f'{facet}_count') for facet, count in counts.items()),
+        ).group_by(db.func.grouping_sets(*(db.tuple_(key) for key in keys.values())))
+        for row in db.session.execute(grouped).mappings():
+            for facet in FACETS:
+                if row[f'{facet}_grouping'] == 0:
+                    result[facet][row[facet]] = row[f'{facet}_count']
+        return result
+
+    union = db.union_all(*(
+        db.select(db.literal(facet).label('facet'), keys[facet].label('value'), counts[facet].label('count'))
+        .group_by(keys[facet])
+        for facet in FACETS
+    ))
+    for facet, value, count in db.session.execute(union):
+        result[facet][value] = count
+    return result
+
+
+_unfiltered = {}
+_unfiltered_lock = threading.Lock()
+
+
+def _cached_unfiltered_counts(query, model, versions=None):
+    """Facet counts over all vehicles, recomputed only when the vehicles table version changes"""
+    version = (versions or read_versions(('vehicles',))[0])['vehicles']
+    key = db.get_engine().url
+    with _unfiltered_lock:
+        cached = _unfiltered.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    counts = _facet_counts(query, model, VehicleFilters())
+    with _unfiltered_lock:
+        _unfiltered[key] = (version, counts)
+    return counts
+
+
+def vehicle_facets(query, model, filters, searched=False, versions=None):
+    """Facet values with counts for the current filters, ready for a template or JSON.
+
+    `query` is the vehicle query before facet filtering (it may carry a
+    search). With no search and no filters the counts come from an
+    in-process cache keyed on the vehicles data version, so the common
+    unfiltered listing skips the aggregate entirely.
+    """
+    if searched or filters:
+        counts = _facet_counts(query, model, filters)
+    else:
+        counts = _cached_unfiltered_counts(query, model, versions)
+
+    selected_types = set(filters.types)
+    total = sum(count for value, count in counts['type'].items() if not selected_types or value in selected_types)
+    return {
+        'total': total,
+        'type': [{'value': value, 'count': count}
+                 for value, count in sorted(counts['type'].items(), key=lambda item: str(item[0])) if count],
+        'make': [{'value': value, 'count': count}
+                 for value, count in sorted(counts['make'].items(), key=lambda item: (-item[1], str(item[0])))
+                 if count],
+        'year': [{'value': value, 'count': count}
+                 for value, count in sorted(counts['year'].items(), key=lambda item: -(item[0] or 0)) if count],
+        'price': [{'value': index, 'label': bucket_label(index), 'min': PRICE_BUCKETS[index][0],
+                   'max': PRICE_BUCKETS[index][1], 'count': counts['price'].get(index, 0)}
+                  for index in range(len(PRICE_BUCKETS)) if counts['price'].get(index)],
+    }
@@ -1,6 +1,13 @@
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import orm
 from datetime import datetime
+from database.routing import RoutingSession
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    # Sessions can send the reads of replica-enabled views to a replica
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
 
 # Create SQLAlchemy instance
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
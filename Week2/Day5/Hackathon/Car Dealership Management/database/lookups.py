@@ -0,0 +1,59 @@
+from sqlalchemy import DDL, event
+from database.index import db
+
+# Columns searched by the typeahead endpoints: table -> columns matched by prefix
+LOOKUP_COLUMNS = {
+    'vehicles': ('make', 'model'),
+    'customers': ('first_name', 'last_name'),
+    'salespeople': ('first_name', 'last_name'),
+}
+
+DEFAULT_LOOKUP_LIMIT = 10
+MAX_LOOKUP_LIMIT = 50
+
+
+def register_lookup_ddl(model_table):
+    """Create lower(column) indexes for prefix lookups when `model_table` is created.
+
+    Postgres needs varchar_pattern_ops for `LIKE 'abc%'` to use a B-tree
+    index under a non-C collation; SQLite compares expression indexes
+    bytewise, so a plain lower(column) index serves the range scan below.
+    """
+    name = model_table.name
+    for column in LOOKUP_COLUMNS[name]:
+        index = f'ix_{name}_{column}_lower'
+        event.listen(model_table, 'after_create', DDL(
+            f'CREATE INDEX IF NOT EXISTS {index} ON {name} (lower({column}) varchar_pattern_ops)'
+        ).execute_if(dialect='postgresql'))
+        event.listen(model_table, 'after_create', DDL(
+            f'CREATE INDEX IF NOT EXISTS {index} ON {name} (lower({column}))'
+        ).execute_if(dialect='sqlite'))
+
+
+def prefix_filter(column, term):
+    """Case-insensitive `column starts with term`, written so an index on lower(column) applies"""
+    prefix = term.lower()
+    lowered = db.func.lower(column)
+    if db.get_engine().dialect.name == 'postgresql':
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return lowered.like(escaped + '%', escape='\\')
+    # Everything starting with the prefix sorts in [prefix, prefix with its last character bumped)
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return db.and_(lowered >= prefix, lowered < upper)
+
+
+def lookup(model, term, label, limit=DEFAULT_LOOKUP_LIMIT):
+    """Return [{'id': ..., 'label': ...}] for rows whose lookup columns start with `term`.
+
+    Only the id and the columns needed for the label are selected.
+    """
+    term = (term or '').strip()
+    if not term:
+        return []
+    columns = [getattr(model, name) for name in LOOKUP_COLUMNS[model.__tablename__]]
+    label_columns = [getattr(model, name) for name in label]
+    rows = db.session.query(model.id, *label_columns) \
+        .filter(db.or_(*(prefix_filter(column, term) for column in columns))) \
+        .order_by(*label_columns, model.id) \
+        .limit(max(1, min(limit, MAX_LOOKUP_LIMIT))).all()
+    return [{'id': row[0], 'label': ' '.join(str(value) for value in row[1:])} for row in rows]
@@ -0,0 +1,8 @@
+-- migrate: no-transaction
+-- Secondary indexes for the sales joins/groupings and the vehicle type facet.
+-- Built CONCURRENTLY on PostgreSQL so writes to sales keep flowing meanwhile.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sales_vehicle_id ON sales (vehicle_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sales_customer_id ON sales (customer_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sales_salesperson_id ON sales (salesperson_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sales_sale_date ON sales (sale_date);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_vehicles_type ON vehicles (type);
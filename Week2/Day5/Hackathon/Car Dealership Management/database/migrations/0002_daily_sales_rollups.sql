@@ -0,0 +1,38 @@
+-- Per-day and per-salesperson-month sales buckets for the date-range
+-- dashboard, backfilled from sales.
+-- The backfill only runs into empty tables, so databases where the app
+-- already created and filled them are left alone.
+CREATE TABLE IF NOT EXISTS rollup_sales_by_day (
+    sale_date DATE PRIMARY KEY,
+    sale_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_day_salesperson (
+    sale_date DATE NOT NULL,
+    salesperson_id INTEGER NOT NULL REFERENCES salespeople(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, salesperson_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_month_salesperson (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    salesperson_id INTEGER NOT NULL REFERENCES salespeople(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, month, salesperson_id)
+);
+
+INSERT INTO rollup_sales_by_day (sale_date, sale_count)
+SELECT sale_date, COUNT(id) FROM sales
+WHERE NOT EXISTS (SELECT 1 FROM rollup_sales_by_day)
+GROUP BY sale_date;
+
+INSERT INTO rollup_sales_by_day_salesperson (sale_date, salesperson_id, sale_count)
+SELECT sale_date, salesperson_id, COUNT(id) FROM sales
+WHERE NOT EXISTS (SELECT 1 FROM rollup_sales_by_day_salesperson)
+GROUP BY sale_date, salesperson_id;
+
+INSERT INTO rollup_sales_by_month_salesperson (year, month, salesperson_id, sale_count)
+SELECT EXTRACT(YEAR FROM sale_date), EXTRACT(MONTH FROM sale_date), salesperson_id, COUNT(id) FROM sales
+WHERE NOT EXISTS (SELECT 1 FROM rollup_sales_by_month_salesperson)
+GROUP BY EXTRACT(YEAR FROM sale_date), EXTRACT(MONTH FROM sale_date), salesperson_id;
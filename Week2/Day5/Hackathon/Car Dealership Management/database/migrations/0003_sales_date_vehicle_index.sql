@@ -0,0 +1,4 @@
+-- migrate: no-transaction
+-- Covering index for top vehicles over a date range on /stats: the
+-- per-vehicle counts are read from the index alone.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sales_sale_date_vehicle_id ON sales (sale_date, vehicle_id);
@@ -0,0 +1,20 @@
+-- Background report jobs: status and progress, and the position each
+-- one resumes from after its worker stops.
+CREATE TABLE IF NOT EXISTS report_jobs (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(40) NOT NULL,
+    params TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    checkpoint TEXT,
+    result_bytes BIGINT NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    worker VARCHAR(100),
+    created_at TIMESTAMP NOT NULL,
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_report_jobs_status_heartbeat_at ON report_jobs (status, heartbeat_at);
@@ -0,0 +1,40 @@
+-- Per-day, per-month and per-year sales buckets for each vehicle, so top vehicles
+-- over a date range on /stats are summed from rollups instead of sales.
+-- The backfill only runs into empty tables, so databases where the app
+-- already created and filled them are left alone.
+CREATE TABLE IF NOT EXISTS rollup_sales_by_day_vehicle (
+    sale_date DATE NOT NULL,
+    vehicle_id INTEGER NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, vehicle_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_month_vehicle (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    vehicle_id INTEGER NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, month, vehicle_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_year_vehicle (
+    year INTEGER NOT NULL,
+    vehicle_id INTEGER NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, vehicle_id)
+);
+
+INSERT INTO rollup_sales_by_day_vehicle (sale_date, vehicle_id, sale_count)
+SELECT sale_date, vehicle_id, COUNT(id) FROM sales
+WHERE NOT EXISTS (SELECT 1 FROM rollup_sales_by_day_vehicle)
+GROUP BY sale_date, vehicle_id;
+
+INSERT INTO rollup_sales_by_month_vehicle (year, month, vehicle_id, sale_count)
+SELECT EXTRACT(YEAR FROM sale_date), EXTRACT(MONTH FROM sale_date), vehicle_id, COUNT(id) FROM sales
+WHERE NOT EXISTS (SELECT 1 FROM rollup_sales_by_month_vehicle)
+GROUP BY EXTRACT(YEAR FROM sale_date), EXTRACT(MONTH FROM sale_date), vehicle_id;
+
+INSERT INTO rollup_sales_by_year_vehicle (year, vehicle_id, sale_count)
+SELECT EXTRACT(YEAR FROM sale_date), vehicle_id, COUNT(id) FROM sales
+WHERE NOT EXISTS (SELECT 1 FROM rollup_sales_by_year_vehicle)
+GROUP BY EXTRACT(YEAR FROM sale_date), vehicle_id;
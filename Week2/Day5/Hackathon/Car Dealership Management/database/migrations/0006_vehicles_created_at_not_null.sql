@@ -0,0 +1,9 @@
+-- Keyset pagination sorts vehicles by (created_at, id): a NULL created_at
+-- cannot be encoded in a cursor and drops out of the row comparison, so
+-- the column becomes NOT NULL. Vehicles without one are dated with the
+-- oldest known listing, so they sort among the oldest.
+UPDATE vehicles
+SET created_at = (SELECT COALESCE(MIN(created_at), CURRENT_TIMESTAMP) FROM vehicles)
+WHERE created_at IS NULL;
+
+ALTER TABLE vehicles ALTER COLUMN created_at SET NOT NULL;
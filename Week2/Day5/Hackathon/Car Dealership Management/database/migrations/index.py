@@ -0,0 +1,128 @@
+import hashlib
+import os
+import re
+from datetime import datetime
+from sqlalchemy import text
+
+MIGRATIONS_DIR = os.path.dirname(__file__)
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+# First-line marker for migrations that cannot run inside a transaction
+NO_TRANSACTION = '-- migrate: no-transaction'
+# EXTRACT(YEAR|MONTH|DAY FROM column), rewritten with strftime for SQLite
+EXTRACT_FIELD = re.compile(r'EXTRACT\((YEAR|MONTH|DAY) FROM (\w+)\)')
+SQLITE_FIELD_FORMATS = {'YEAR': '%Y', 'MONTH': '%m', 'DAY': '%d'}
+# SQLite only auto-assigns ids to a column declared exactly INTEGER PRIMARY KEY
+SERIAL_KEY = re.compile(r'\bSERIAL PRIMARY KEY\b')
+# SQLite cannot change a column's nullability in place
+SET_NOT_NULL = re.compile(r'^ALTER TABLE \w+ ALTER COLUMN \w+ SET NOT NULL$')
+
+CREATE_HISTORY_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(4) PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    checksum VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP NOT NULL
+)
+"""
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    def __init__(self, path):
+        match = MIGRATION_FILE.match(os.path.basename(path))
+        self.version, self.name = match.group(1), match.group(2)
+        with open(path, 'r') as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+        self.transactional = not self.sql.startswith(NO_TRANSACTION)
+
+    def statements(self, dialect):
+        """Split the file into statements, adapting Postgres-only syntax for other databases"""
+        body = '\n'.join(line for line in self.sql.splitlines() if not line.strip().startswith('--'))
+        for statement in body.split(';'):
+            statement = statement.strip()
+            if not statement:
+                continue
+            if dialect != 'postgresql':
+                statement = statement.replace('CREATE INDEX CONCURRENTLY', 'CREATE INDEX')
+            if dialect == 'sqlite':
+                if SET_NOT_NULL.match(statement):
+                    # The migration's backfill still runs, and the models never write a NULL there
+                    continue
+                statement = EXTRACT_FIELD.sub(
+                    lambda m: f"CAST(strftime('{SQLITE_FIELD_FORMATS[m.group(1)]}', {m.group(2)}) AS INTEGER)", statement)
+                statement = SERIAL_KEY.sub('INTEGER PRIMARY KEY', statement)
+            yield statement
+
+    def __repr__(self):
+        return f'<Migration {self.version}_{self.name}>'
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = [Migration(os.path.join(directory, name))
+                  for name in sorted(os.listdir(directory)) if MIGRATION_FILE.match(name)]
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError("Two migration files share the same version number")
+    return migrations
+
+
+def applied_migrations(engine):
+    with engine.begin() as conn:
+        conn.execute(text(CREATE_HISTORY_TABLE))
+        rows = conn.execute(text("SELECT version, checksum FROM schema_migrations")).all()
+    return dict(rows)
+
+
+def _record(conn, migration):
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, name, checksum, applied_at) "
+             "VALUES (:version, :name, :checksum, :applied_at)"),
+        {'version': migration.version, 'name': migration.name,
+         'checksum': migration.checksum, 'applied_at': datetime.utcnow()}
+    )
+
+
+def apply_migration(engine, migration):
+    dialect = engine.dialect.name
+    if migration.transactional:
+        # Statements and the history row commit together or not at all
+        with engine.begin() as conn:
+            for statement in migration.statements(dialect):
+                conn.execute(text(statement))
+            _record(conn, migration)
+        return
+    # CREATE INDEX CONCURRENTLY refuses to run in a transaction block. Each
+    # statement must be idempotent (IF NOT EXISTS) so a failed run can be
+    # retried; a failed concurrent build leaves an INVALID index to drop first.
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for statement in migration.statements(dialect):
+            conn.execute(text(statement))
+    with engine.begin() as conn:
+        _record(conn, migration)
+
+
+def run_migrations(engine, directory=MIGRATIONS_DIR):
+    """Apply pending migrations in version order; safe to run any number of times.
+
+    Already-applied migrations are checked against their recorded checksum
+    so an edited migration file is reported instead of silently skipped.
+    Returns the list of migrations applied by this call.
+    """
+    applied = applied_migrations(engine)
+    pending = []
+    for migration in load_migrations(directory):
+        recorded = applied.get(migration.version)
+        if recorded is None:
+            pending.append(migration)
+        elif recorded != migration.checksum:
+            raise MigrationError(
+                f"Migration {migration.version}_{migration.name} was changed after it was applied"
+            )
+    for migration in pending:
+        print(f"Applying migration {migration.version}_{migration.name}...")
+        apply_migration(engine, migration)
+    return pending
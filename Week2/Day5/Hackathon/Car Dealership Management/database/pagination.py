@@ -0,0 +1,125 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from flask_sqlalchemy import Pagination
+from database.index import db
+
+# Sort orders available in keyset mode: name -> (column attribute, type, descending)
+KEYSET_SORTS = {
+    'newest': ('created_at', datetime, True),
+    'price': ('price', Decimal, False),
+}
+
+
+def encode_cursor(sort, direction, row):
+    """Build an opaque URL-safe cursor pointing just past `row`"""
+    column = KEYSET_SORTS[sort][0]
+    value = getattr(row, column)
+    payload = {
+        's': sort,
+        'd': direction,
+        'k': value.isoformat() if isinstance(value, datetime) else str(value),
+        'i': row.id
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (sort, direction, key, id) for a cursor, or None if it is not valid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        sort, direction = payload['s'], payload['d']
+        if sort not in KEYSET_SORTS or direction not in ('next', 'prev'):
+            return None
+        kind = KEYSET_SORTS[sort][1]
+        key = datetime.fromisoformat(payload['k']) if kind is datetime else kind(payload['k'])
+        return sort, direction, key, int(payload['i'])
+    except (ValueError, TypeError, KeyError, ArithmeticError):
+        return None
+
+
+class KeysetPage:
+    """One page of a keyset (seek) paginated query"""
+
+    def __init__(self, items, sort, has_next, has_prev, total=None):
+        self.items = items
+        self.sort = sort
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total
+        self.next_cursor = encode_cursor(sort, 'next', items[-1]) if has_next and items else None
+        self.prev_cursor = encode_cursor(sort, 'prev', items[0]) if has_prev and items else None
+
+
+class CountedPage(Pagination):
+    """A numbered page whose total may be an estimate (see database.counts).
+
+    Whether a next page exists comes from fetching one row past the page,
+    not from the total, so Next and the page links stay right when the
+    total is approximate.
+    """
+
+    def __init__(self, query, page, per_page, total, items, has_next):
+        super().__init__(query, page, per_page, total, items)
+        self._has_next = has_next
+
+    @property
+    def pages(self):
+        return max(super().pages, self.page + 1 if self._has_next else self.page)
+
+    @property
+    def has_next(self):
+        return self._has_next
+
+
+def offset_paginate(query, page, per_page, total):
+    """Numbered pagination with the total supplied by the caller instead of a COUNT(*) of `query`"""
+    page = max(page, 1)
+    rows = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    return CountedPage(query, page, per_page, total, rows[:per_page], has_next=len(rows) > per_page)
+
+
+def keyset_paginate(query, model, sort='newest', cursor=None, per_page=6, total=None):
+    """Paginate `query` by seeking past the (sort key, id) pair stored in `cursor`.
+
+    Unlike OFFSET pagination the cost of a page does not grow with its depth:
+    the database walks the (sort key, id) index from the cursor position and
+    stops after per_page + 1 rows. The extra row tells us whether a further
+    page exists, so no COUNT(*) is needed; a `total` for display (see
+    database.counts) may be passed in.
+    """
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded:
+        sort, direction, key, last_id = decoded
+    else:
+        sort = sort if sort in KEYSET_SORTS else 'newest'
+        direction, key, last_id = 'next', None, None
+
+    column_name, _, descending = KEYSET_SORTS[sort]
+    column = getattr(model, column_name)
+    # Walking backwards means flipping both the comparison and the ordering
+    forward = direction == 'next'
+    seek_desc = descending == forward
+
+    paged = query
+    if key is not None:
+        row_key = db.tuple_(column, model.id)
+        bound = db.tuple_(db.literal(key, column.type), db.literal(last_id))
+        paged = paged.filter(row_key < bound if seek_desc else row_key > bound)
+    if seek_desc:
+        paged = paged.order_by(column.desc(), model.id.desc())
+    else:
+        paged = paged.order_by(column.asc(), model.id.asc())
+
+    rows = paged.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    if forward:
+        return KeysetPage(rows, sort, has_next=has_more, has_prev=key is not None, total=total)
+    return KeysetPage(rows, sort, has_next=True, has_prev=has_more, total=total)
@@ -0,0 +1,279 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import Pool, QueuePool
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class PoolMetrics:
+    """Process-wide connection pool counters, fed by the pool hooks below"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.overflow_checkouts = 0
+            self.timeouts = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.wait_count = 0
+            self.wait_sum = 0.0
+            self.wait_max = 0.0
+            self.wait_buckets = [0] * len(WAIT_BUCKETS)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_checkout(self, overflow):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            if overflow:
+                self.overflow_checkouts += 1
+
+    def record_checkin(self):
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(0, self.in_use - 1)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def render(self, pool=None):
+        """Prometheus text exposition of the counters, plus the live state of `pool`"""
+        with self._lock:
+            lines = [
+                '# HELP db_pool_checkouts_total Connections handed out by the pool.',
+                '# TYPE db_pool_checkouts_total counter',
+                f'db_pool_checkouts_total {self.checkouts}',
+                '# HELP db_pool_checkins_total Connections returned to the pool.',
+                '# TYPE db_pool_checkins_total counter',
+                f'db_pool_checkins_total {self.checkins}',
+                '# HELP db_pool_connects_total New DBAPI connections opened.',
+                '# TYPE db_pool_connects_total counter',
+                f'db_pool_connects_total {self.connects}',
+                '# HELP db_pool_invalidations_total Connections discarded as stale or broken.',
+                '# TYPE db_pool_invalidations_total counter',
+                f'db_pool_invalidations_total {self.invalidations}',
+                '# HELP db_pool_overflow_checkouts_total Checkouts served by an overflow connection.',
+                '# TYPE db_pool_overflow_checkouts_total counter',
+                f'db_pool_overflow_checkouts_total {self.overflow_checkouts}',
+                '# HELP db_pool_timeouts_total Checkouts that gave up after DB_POOL_TIMEOUT.',
+                '# TYPE db_pool_timeouts_total counter',
+                f'db_pool_timeouts_total {self.timeouts}',
+                '# HELP db_pool_in_use Connections currently checked out.',
+                '# TYPE db_pool_in_use gauge',
+                f'db_pool_in_use {self.in_use}',
+                '# HELP db_pool_in_use_peak Most connections checked out at once.',
+                '# TYPE db_pool_in_use_peak gauge',
+                f'db_pool_in_use_peak {self.peak_in_use}',
+                '# HELP db_pool_checkout_wait_seconds Time spent waiting for a connection.',
+                '# TYPE db_pool_checkout_wait_seconds histogram',
+            ]
+            cumulative = 0
+            for bound, count in zip(WAIT_BUCKETS, self.wait_buckets):
+                cumulative += count
+                lines.append(f'db_pool_checkout_wait_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines += [
+                f'db_pool_checkout_wait_seconds_bucket{{le="+Inf"}} {self.wait_count}',
+                f'db_pool_checkout_wait_seconds_sum {self.wait_sum:.6f}',
+                f'db_pool_checkout_wait_seconds_count {self.wait_count}',
+                '# HELP db_pool_checkout_wait_seconds_max Longest wait for a connection.',
+                '# TYPE db_pool_checkout_wait_seconds_max gauge',
+                f'db_pool_checkout_wait_seconds_max {self.wait_max:.6f}',
+            ]
+        if isinstance(pool, QueuePool):
+            lines += [
+                '# HELP db_pool_size Configured number of pooled connections.',
+                '# TYPE db_pool_size gauge',
+                f'db_pool_size {pool.size()}',
+                '# HELP db_pool_checked_in Idle connections held by the pool.',
+                '# TYPE db_pool_checked_in gauge',
+                f'db_pool_checked_in {pool.checkedin()}',
+                '# HELP db_pool_overflow Overflow connections currently open.',
+                '# TYPE db_pool_overflow gauge',
+                f'db_pool_overflow {max(0, pool.overflow())}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+metrics = PoolMetrics()
+
+
+class _FifoGate:
+    """Admit threads one at a time, in arrival order.
+
+    QueuePool wakes a waiter when a connection is returned, but a thread
+    that returns a connection and immediately asks again usually gets it
+    first, so under saturation a few unlucky requests wait for seconds.
+    Queueing checkouts here hands connections out first come, first served.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._busy = False
+
+    def enter(self, timeout):
+        with self._lock:
+            if not self._busy and not self._waiters:
+                self._busy = True
+                return True
+            turn = threading.Event()
+            self._waiters.append(turn)
+        if turn.wait(timeout):
+            return True
+        with self._lock:
+            if turn.is_set():
+                return True
+            self._waiters.remove(turn)
+            return False
+
+    def leave(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._busy = False
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool with first-come, first-served checkouts that times every wait for a connection.
+
+    The pool timeout covers the whole checkout: time spent queued at the
+    gate is taken off the wait for a returned connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._gate = _FifoGate()
+        self._checkout_timeout = self._timeout
+
+    def recreate(self):
+        # Built from self._timeout, which a checkout in progress may have shortened
+        pool = super().recreate()
+        pool._timeout = pool._checkout_timeout = self._checkout_timeout
+        return pool
+
+    def _timeout_error(self):
+        return PoolTimeout(
+            f"QueuePool limit of size {self.size()} overflow {self._max_overflow} reached, "
+            f"connection timed out, timeout {self._checkout_timeout:.2f}"
+        )
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            if not self._gate.enter(self._checkout_timeout):
+                raise self._timeout_error()
+            try:
+                remaining = started + self._checkout_timeout - time.perf_counter()
+                if remaining <= 0:
+                    raise self._timeout_error()
+                # The gate admits one thread at a time, so QueuePool's own wait can be
+                # given what is left of the timeout without racing other checkouts
+                self._timeout = remaining
+                try:
+                    return super()._do_get()
+                finally:
+                    self._timeout = self._checkout_timeout
+            finally:
+                self._gate.leave()
+        except PoolTimeout:
+            metrics.record_timeout()
+            raise
+        finally:
+            metrics.record_wait(time.perf_counter() - started)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    metrics.record_connect()
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        # SQLite ignores ON DELETE CASCADE unless foreign keys are switched on per connection
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool = connection_proxy._pool
+    metrics.record_checkout(isinstance(pool, QueuePool) and pool.overflow() > 0)
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    metrics.record_checkin()
+
+
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    metrics.record_invalidation()
+
+
+def register_pool_events():
+    # Listening on the Pool class covers every engine, including ones created later
+    for name, listener in (('connect', _on_connect), ('checkout', _on_checkout),
+                           ('checkin', _on_checkin), ('invalidate', _on_invalidate)):
+        if not event.contains(Pool, name, listener):
+            event.listen(Pool, name, listener)
+
+
+def pool_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_POOL_* settings.
+
+    Every engine gets pre-ping (a cheap liveness check on checkout, so
+    connections killed by a database restart are replaced instead of
+    failing the request) and recycling. Postgres and file-based SQLite use
+    the metered QueuePool; in-memory SQLite keeps Flask-SQLAlchemy's
+    single shared connection.
+    """
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+    )
+    if url.get_backend_name() == 'sqlite':
+        # Pooled SQLite connections are handed to whichever thread checks them out
+        options['connect_args'] = {'check_same_thread': False}
+    return options
+
+
+def init_pool(app):
+    """Configure the engine's pool from app.config and start collecting pool metrics"""
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', pool_options(app.config))
+    register_pool_events()
@@ -0,0 +1,467 @@
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from database.index import db
+from database.counts import count_rows, table_total
+from models.your_model import Vehicle, Customer, Salesperson, Sale
+from models.reports import ReportJob
+
+logger = logging.getLogger(__name__)
+
+# Days a vehicle may have been in stock (or taken to sell) per aging bucket; older ones are '180+'
+AGE_BUCKETS = ((30, '0-30'), (60, '31-60'), (90, '61-90'), (180, '91-180'))
+
+
+class LeaseLost(Exception):
+    """The job was taken over by another worker after this one stopped renewing its lease"""
+
+
+def _optional_id(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    if isinstance(value, bool) or not str(value).isdigit() or int(value) < 1:
+        raise ValueError(f'{name} must be a positive integer id')
+    return int(value)
+
+
+def _optional_date(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        raise ValueError(f'{name} must be a date as YYYY-MM-DD') from None
+
+
+class Report(ABC):
+    """One kind of report: its CSV columns, its parameters and its rows.
+
+    Rows are read in batches in a fixed key order; `state` holds the key of
+    the last row read (plus anything else the report carries from batch to
+    batch) and is what the job table stores to resume from.
+    """
+    name = None
+    columns = ()
+
+    @abstractmethod
+    def parse(self, args):
+        """The normalised parameters for a new job, or ValueError"""
+
+    @abstractmethod
+    def total(self, params):
+        """Rows the report is expected to have, for its progress"""
+
+    @abstractmethod
+    def batch(self, params, state, limit):
+        """The next `limit` rows after `state`, advancing it past them"""
+
+
+class SalespersonSales(Report):
+    """Every sale, grouped by salesperson in date order, with each one's running count and revenue"""
+    name = 'salesperson-sales'
+    columns = ('salesperson_id', 'salesperson', 'sale_id', 'sale_date', 'vehicle_id', 'vehicle',
+               'customer_id', 'customer', 'sale_price', 'salesperson_sale_number', 'salesperson_revenue_to_date')
+
+    def parse(self, args):
+        params = {'salesperson_id': _optional_id(args, 'salesperson_id'), 'vehicle_id': _optional_id(args, 'vehicle_id'),
+                  'start': _optional_date(args, 'start'), 'end': _optional_date(args, 'end')}
+        if params['start'] and params['end'] and params['start'] > params['end']:
+            raise ValueError('start must not be after end')
+        return params
+
+    def _filtered(self, query, params):
+        if params['salesperson_id']:
+            query = query.filter(Sale.salesperson_id == params['salesperson_id'])
+        # Jobs queued before vehicle_id was a parameter do not have it
+        if params.get('vehicle_id'):
+            query = query.filter(Sale.vehicle_id == params['vehicle_id'])
+        if params['start']:
+            query = query.filter(Sale.sale_date >= date.fromisoformat(params['start']))
+        if params['end']:
+            query = query.filter(Sale.sale_date <= date.fromisoformat(params['end']))
+        return query
+
+    def total(self, params):
+        return count_rows(self._filtered(Sale.query, params), Sale, whole_table=not any(params.values()))
+
+    def batch(self, params, state, limit):
+        query = self._filtered(db.session.query(
+            Sale.salesperson_id, Salesperson.first_name, Salesperson.last_name, Sale.id, Sale.sale_date,
+            Sale.vehicle_id, Vehicle.year, Vehicle.make, Vehicle.model,
+            Sale.customer_id, Customer.first_name, Customer.last_name, Sale.sale_price,
+        ).join(Salesperson, Salesperson.id == Sale.salesperson_id)
+         .join(Vehicle, Vehicle.id == Sale.vehicle_id)
+         .join(Customer, Customer.id == Sale.customer_id), params)
+        if state.get('after'):
+            person_id, sale_date, sale_id = state['after']
+            query = query.filter(db.tuple_(Sale.salesperson_id, Sale.sale_date, Sale.id)
+                                 > (person_id, date.fromisoformat(sale_date), sale_id))
+        rows = []
+        for (person_id, first, last, sale_id, sale_date, vehicle_id, year, make, model,
+             customer_id, customer_first, customer_last, price) in query.order_by(
+                Sale.salesperson_id, Sale.sale_date, Sale.id).limit(limit):
+            if person_id != state.get('salesperson_id'):
+                state.update(salesperson_id=person_id, count=0, revenue='0')
+            state['count'] += 1
+            state['revenue'] = str(Decimal(state['revenue']) + price)
+            state['after'] = [person_id, sale_date.isoformat(), sale_id]
+            rows.append((person_id, f'{first} {last}', sale_id, sale_date.isoformat(), vehicle_id,
+                         f'{year} {make} {model}', customer_id, f'{customer_first} {customer_last}', price,
+                         state['count'], state['revenue']))
+        return rows
+
+
+class InventoryAging(Report):
+    """Every vehicle with how long it took to sell, or how long it has been in stock on `as_of`"""
+    name = 'inventory-aging'
+    columns = ('vehicle_id', 'vehicle', 'type', 'price', 'listed_on', 'first_sold_on', 'status',
+               'days', 'age_bucket')
+
+    def parse(self, args):
+        # Fixed when the job is queued, so a resumed run ages every vehicle against the same day
+        return {'as_of': _optional_date(args, 'as_of') or date.today().isoformat()}
+
+    def total(self, params):
+        return table_total(Vehicle)
+
+    def batch(self, params, state, limit):
+        as_of = date.fromisoformat(params['as_of'])
+        first_sale = db.session.query(db.func.min(Sale.sale_date)) \
+            .filter(Sale.vehicle_id == Vehicle.id).scalar_subquery()
+        query = db.session.query(Vehicle.id, Vehicle.year, Vehicle.make, Vehicle.model, Vehicle.type,
+                                 Vehicle.price, Vehicle.created_at, first_sale)
+        if state.get('after'):
+            query = query.filter(Vehicle.id > state['after'])
+        rows = []
+        for vehicle_id, year, make, model, type_, price, created_at, sold_on in query.order_by(Vehicle.id).limit(limit):
+            listed_on = created_at.date() if created_at else None
+            end = sold_on or as_of
+            days = (end - listed_on).days if listed_on else None
+            rows.append((vehicle_id, f'{year} {make} {model}', type_, price, listed_on, sold_on,
+                         'sold' if sold_on else 'in stock', days, age_bucket(days)))
+            state['after'] = vehicle_id
+        return rows
+
+
+def age_bucket(days):
+    if days is None:
+        return ''
+    if days < 0:
+        # Sales imported from before the vehicle was entered into the system
+        return 'sold before listed'
+    for limit, label in AGE_BUCKETS:
+        if days <= limit:
+            return label
+    return '180+'
+
+
+REPORTS = {report.name: report for report in (SalespersonSales(), InventoryAging())}
+
+
+def encode_rows(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+class ReportRunner:
+    """Runs queued report jobs on a pool of background threads.
+
+    A dispatcher thread claims jobs from the job table with a conditional
+    UPDATE, so several processes can share one queue, and renews the lease
+    (heartbeat_at) on the jobs it holds every `poll_seconds`. Each job
+    appends its rows in batches to a .part file, recording progress and
+    its position after every batch; a job whose lease runs out (its
+    process stopped) is claimed again and carries on from that position.
+    A job that fails is retried until it has been attempted
+    `max_attempts` times.
+
+    Nothing runs until start(), so request threads only ever insert a job
+    and wake the dispatcher.
+    """
+
+    def __init__(self, app, directory, workers, poll_seconds, lease_seconds, max_attempts, batch_rows):
+        self.app = app
+        self.directory = directory
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.batch_rows = batch_rows
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}'
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._jobs = queue.Queue()
+        self._active = set()
+        self._started = False
+        self.completed = 0
+        self.failed = 0
+        self.resumed = 0
+        self.rows = 0
+
+    def start(self):
+        """Start the dispatcher and worker threads, once; does nothing with no workers configured"""
+        if self._started or self.workers < 1:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._dispatch, name='report-dispatcher', daemon=True).start()
+        for number in range(self.workers):
+            threading.Thread(target=self._work, name=f'report-worker-{number}', daemon=True).start()
+
+    def wake(self):
+        self._wake.set()
+
+    def result_path(self, job):
+        return os.path.join(self.directory, f'{job.id}-{job.kind}.csv')
+
+    def _claimable(self, expired):
+        return db.or_(ReportJob.status == 'queued',
+                      db.and_(ReportJob.status == 'running', ReportJob.heartbeat_at < expired))
+
+    def _dispatch(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    try:
+                        self._renew()
+                        self._claim()
+                    finally:
+                        db.session.remove()
+            except Exception:
+                logger.exception('Report dispatcher failed')
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _renew(self):
+        with self._lock:
+            held = list(self._active)
+        if held:
+            ReportJob.query.filter(ReportJob.id.in_(held), ReportJob.worker == self.worker_id,
+                                   ReportJob.status == 'running') \
+                .update({'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+
+    def _claim(self):
+        now = datetime.utcnow()
+        expired = now - timedelta(seconds=self.lease_seconds)
+        # Abandoned by their worker as often as they may be attempted
+        ReportJob.query.filter(ReportJob.status == 'running', ReportJob.heartbeat_at < expired,
+                               ReportJob.attempts >= self.max_attempts) \
+            .update({'status': 'failed', 'finished_at': now, 'worker': None,
+                     'error': f'Worker stopped during attempt {self.max_attempts}'}, synchronize_session=False)
+        db.session.commit()
+        with self._lock:
+            free = self.workers - len(self._active)
+        if free < 1:
+            return
+        candidates = [job_id for job_id, in db.session.query(ReportJob.id).filter(self._claimable(expired))
+                      .order_by(ReportJob.id).limit(free)]
+        for job_id in candidates:
+            # Stamped now rather than at the start of the pass, which may predate the job
+            claimed_at = datetime.utcnow()
+            # Only one worker's UPDATE still matches once another has claimed the job
+            claimed = ReportJob.query.filter(ReportJob.id == job_id, self._claimable(expired)).update({
+                'status': 'running', 'worker': self.worker_id, 'heartbeat_at': claimed_at,
+                'started_at': db.func.coalesce(ReportJob.started_at, claimed_at), 'attempts': ReportJob.attempts + 1,
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                with self._lock:
+                    self._active.add(job_id)
+                self._jobs.put(job_id)
+
+    def _work(self):
+        while True:
+            job_id = self._jobs.get()
+            try:
+                with self.app.app_context():
+                    try:
+                        self._run(job_id)
+                    finally:
+                        db.session.remove()
+            except Exception:
+                logger.exception('Report job %s failed', job_id)
+            finally:
+                with self._lock:
+                    self._active.discard(job_id)
+                # A slot is free: look for the next job now rather than at the next poll
+                self._wake.set()
+
+    def _save(self, job_id, **values):
+        """Update the job, provided this worker still holds it; renews the lease"""
+        values['heartbeat_at'] = datetime.utcnow()
+        updated = ReportJob.query.filter(ReportJob.id == job_id, ReportJob.worker == self.worker_id,
+                                         ReportJob.status == 'running').update(values, synchronize_session=False)
+        db.session.commit()
+        if not updated:
+            raise LeaseLost(job_id)
+
+    def _run(self, job_id):
+        job = db.session.get(ReportJob, job_id)
+        try:
+            self._write(job)
+        except LeaseLost:
+            db.session.rollback()
+            logger.warning('Report job %s was taken over by another worker', job_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception('Report job %s failed', job_id)
+            with self._lock:
+                self.failed += 1
+            retry = job.attempts < self.max_attempts
+            ReportJob.query.filter(ReportJob.id == job_id, ReportJob.worker == self.worker_id).update({
+                'status': 'queued' if retry else 'failed', 'worker': None, 'error': str(e) or type(e).__name__,
+                'finished_at': None if retry else datetime.utcnow(),
+            }, synchronize_session=False)
+            db.session.commit()
+
+    def _write(self, job):
+        report = REPORTS.get(job.kind)
+        if report is None:
+            raise ValueError(f'Unknown report {job.kind!r}')
+        params = json.loads(job.params)
+        path = self.result_path(job)
+        part = path + '.part'
+        state = json.loads(job.checkpoint) if job.checkpoint else None
+        # Carry on from the last saved batch if its output is still there (a longer file has rows
+        # written after that save, which are cut off and read again)
+        resume = state is not None and os.path.exists(part) and os.path.getsize(part) >= job.result_bytes
+        if resume:
+            output, progress = open(part, 'r+b'), job.progress
+            output.truncate(job.result_bytes)
+            output.seek(job.result_bytes)
+            with self._lock:
+                self.resumed += 1
+        else:
+            output, progress, state = open(part, 'wb'), 0, {}
+            output.write(encode_rows([report.columns]))
+        job_id = job.id
+        total = job.total if job.total is not None else int(report.total(params))
+        with output:
+            while True:
+                rows = report.batch(params, state, self.batch_rows)
+                # Checks the lease (and ends the read transaction) before touching the file
+                self._save(job_id, total=total)
+                output.write(encode_rows(rows))
+                output.flush()
+                os.fsync(output.fileno())
+                progress += len(rows)
+                with self._lock:
+                    self.rows += len(rows)
+                if len(rows) < self.batch_rows:
+                    break
+                self._save(job_id, progress=progress, checkpoint=json.dumps(state), result_bytes=output.tell())
+            size = output.tell()
+        os.replace(part, path)
+        self._save(job_id, status='done', progress=progress, total=max(total, progress), checkpoint=json.dumps(state),
+                   result_bytes=size, worker=None, error=None, finished_at=datetime.utcnow())
+        with self._lock:
+            self.completed += 1
+
+    def render_metrics(self):
+        return '\n'.join([
+            '# HELP report_jobs_active Report jobs running in this process.',
+            '# TYPE report_jobs_active gauge',
+            f'report_jobs_active {len(self._active)}',
+            '# HELP report_jobs_completed_total Report jobs finished by this process.',
+            '# TYPE report_jobs_completed_total counter',
+            f'report_jobs_completed_total {self.completed}',
+            '# HELP report_jobs_failed_total Report job attempts that failed with an error.',
+            '# TYPE report_jobs_failed_total counter',
+            f'report_jobs_failed_total {self.failed}',
+            '# HELP report_jobs_resumed_total Report jobs continued from a saved position.',
+            '# TYPE report_jobs_resumed_total counter',
+            f'report_jobs_resumed_total {self.resumed}',
+            '# HELP report_rows_written_total Report rows written to result files.',
+            '# TYPE report_rows_written_total counter',
+            f'report_rows_written_total {self.rows}',
+        ]) + '\n'
+
+
+def report_runner():
+    return current_app.extensions['report_runner']
+
+
+def enqueue_report(kind, args):
+    """Queue a `kind` report with the given parameters (ValueError if they are invalid)"""
+    params = REPORTS[kind].parse(args)
+    job = ReportJob(kind=kind, params=json.dumps(params, sort_keys=True))
+    db.session.add(job)
+    db.session.commit()
+    runner = report_runner()
+    runner.start()
+    runner.wake()
+    return job
+
+
+def report_status(job):
+    percent = None
+    if job.status == 'done':
+        percent = 100
+    elif job.total:
+        # Totals past COUNT_EXACT_THRESHOLD are estimates; don't claim 100% before the end
+        percent = min(99, job.progress * 100 // job.total)
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'params': json.loads(job.params),
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'percent': percent,
+        'attempts': job.attempts,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def run_report_worker(workers=None):
+    """Run jobs in the foreground until interrupted, e.g. in a process of its own"""
+    runner = report_runner()
+    runner.workers = workers or max(runner.workers, 1)
+    runner.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        # Jobs in progress are picked up again once their lease runs out
+        pass
+
+
+def init_reports(app):
+    """Set up the report job runner from REPORTS_DIR, REPORT_WORKERS, REPORT_POLL_SECONDS,
+    REPORT_LEASE_SECONDS, REPORT_MAX_ATTEMPTS and REPORT_BATCH_ROWS.
+
+    Its threads start on the first request (or the first job queued), not here, so they
+    begin after a pre-forking server has forked.
+    """
+    app.config.setdefault('REPORTS_DIR', os.path.join(app.instance_path, 'reports'))
+    app.config.setdefault('REPORT_WORKERS', 2)
+    app.config.setdefault('REPORT_POLL_SECONDS', 2.0)
+    app.config.setdefault('REPORT_LEASE_SECONDS', 60.0)
+    app.config.setdefault('REPORT_MAX_ATTEMPTS', 3)
+    app.config.setdefault('REPORT_BATCH_ROWS', 5000)
+    runner = ReportRunner(app, app.config['REPORTS_DIR'], app.config['REPORT_WORKERS'],
+                          app.config['REPORT_POLL_SECONDS'], app.config['REPORT_LEASE_SECONDS'],
+                          app.config['REPORT_MAX_ATTEMPTS'], app.config['REPORT_BATCH_ROWS'])
+    app.extensions['report_runner'] = runner
+    app.before_request(runner.start)
@@ -0,0 +1,255 @@
+from collections import Counter
+from sqlalchemy import event
+from database.counters import increment, increment_many
+from database.index import db
+from database.versions import bump_version
+from models.your_model import Vehicle, Salesperson, Customer, Sale
+from models.rollups import (RowCount, MonthlySales, DailySales, DailySalespersonSales, MonthlySalespersonSales,
+                            DailyVehicleSales, MonthlyVehicleSales, YearlyVehicleSales, VehicleSales, SalespersonSales,
+                            VehicleTypeCount)
+
+# Models whose total row count is shown on the dashboard
+COUNTED_MODELS = (Vehicle, Salesperson, Customer, Sale)
+
+
+def apply_row_count(connection, table_name, amount):
+    increment(connection, RowCount, {'table_name': table_name}, 'row_count', amount)
+
+
+def apply_vehicle_types(connection, type_counts):
+    """Apply a Counter of {vehicle type: delta} with one upsert statement"""
+    increment_many(connection, VehicleTypeCount, ('type',), 'vehicle_count',
+                   Counter({(vehicle_type,): amount for vehicle_type, amount in type_counts.items()}))
+
+
+def apply_sale_rollups(connection, sales, sign=1, count_rows=True):
+    """Apply the effect of inserting (sign=1) or deleting (sign=-1) many sales at once.
+
+    `sales` is an iterable of objects or dicts with vehicle_id, salesperson_id
+    and sale_date; a dict may also carry a sale_count standing for that many
+    sales with the same keys. Bulk paths that bypass the ORM call this inside
+    their own transaction so the rollups stay consistent with the sales table.
+    """
+    months, days, vehicles, people = Counter(), Counter(), Counter(), Counter()
+    people_days, people_months = Counter(), Counter()
+    vehicle_days, vehicle_months, vehicle_years = Counter(), Counter(), Counter()
+    total = 0
+    for sale in sales:
+        if isinstance(sale, dict):
+            get, amount = sale.get, sign * sale.get('sale_count', 1)
+        else:
+            get, amount = lambda name: getattr(sale, name), sign
+        sale_date, vehicle_id, salesperson_id = get('sale_date'), get('vehicle_id'), get('salesperson_id')
+        months[(sale_date.year, sale_date.month)] += amount
+        days[(sale_date,)] += amount
+        vehicles[(vehicle_id,)] += amount
+        people[(salesperson_id,)] += amount
+        people_days[(sale_date, salesperson_id)] += amount
+        people_months[(sale_date.year, sale_date.month, salesperson_id)] += amount
+        vehicle_days[(sale_date, vehicle_id)] += amount
+        vehicle_months[(sale_date.year, sale_date.month, vehicle_id)] += amount
+        vehicle_years[(sale_date.year, vehicle_id)] += amount
+        total += amount
+    # One upsert statement per rollup table, however many sales
+    increment_many(connection, MonthlySales, ('year', 'month'), 'sale_count', months)
+    increment_many(connection, DailySales, ('sale_date',), 'sale_count', days)
+    increment_many(connection, DailySalespersonSales, ('sale_date', 'salesperson_id'), 'sale_count', people_days)
+    increment_many(connection, MonthlySalespersonSales, ('year', 'month', 'salesperson_id'), 'sale_count',
+                   people_months)
+    increment_many(connection, DailyVehicleSales, ('sale_date', 'vehicle_id'), 'sale_count', vehicle_days)
+    increment_many(connection, MonthlyVehicleSales, ('year', 'month', 'vehicle_id'), 'sale_count', vehicle_months)
+    increment_many(connection, YearlyVehicleSales, ('year', 'vehicle_id'), 'sale_count', vehicle_years)
+    increment_many(connection, VehicleSales, ('vehicle_id',), 'sale_count', vehicles)
+    increment_many(connection, SalespersonSales, ('salesperson_id',), 'sale_count', people)
+    if count_rows:
+        apply_row_count(connection, Sale.__tablename__, total)
+
+
+def retract_sales(connection, *criteria):
+    """Take the sales matching `criteria` out of the rollups before the database deletes them.
+
+    For deletes that leave the sales to ON DELETE CASCADE: the sales are
+    counted with one GROUP BY query (one row per vehicle, salesperson and
+    day, however many sales that covers) rather than loaded. Returns the
+    number of sales retracted.
+    """
+    grouped = connection.execute(
+        db.select(Sale.vehicle_id, Sale.salesperson_id, Sale.sale_date, db.func.count().label('sale_count'))
+        .where(*criteria).group_by(Sale.vehicle_id, Sale.salesperson_id, Sale.sale_date)
+    ).mappings().all()
+    if not grouped:
+        return 0
+    apply_sale_rollups(connection, [dict(row) for row in grouped], -1)
+    bump_version(connection, Sale.__tablename__)
+    return sum(row['sale_count'] for row in grouped)
+
+
+def delete_vehicles(connection, *criteria):
+    """Delete every vehicle matching `criteria` with a single DELETE and return how many went.
+
+    Their sales go with them through ON DELETE CASCADE. The rollups are
+    adjusted first from two GROUP BY queries (sales, vehicle types), so the
+    cost in Python does not depend on how many vehicles or sales are removed.
+    """
+    doomed = db.select(Vehicle.id).where(*criteria)
+    retract_sales(connection, Sale.vehicle_id.in_(doomed))
+    types = Counter({vehicle_type: -count for vehicle_type, count in connection.execute(
+        db.select(Vehicle.type, db.func.count()).where(*criteria).group_by(Vehicle.type))})
+    deleted = connection.execute(Vehicle.__table__.delete().where(*criteria)).rowcount
+    if deleted:
+        apply_row_count(connection, Vehicle.__tablename__, -deleted)
+        apply_vehicle_types(connection, types)
+        bump_version(connection, Vehicle.__tablename__)
+    return deleted
+
+
+def _changed(target, name):
+    """Return (old, new) for an attribute changed in this flush, or None"""
+    history = db.inspect(target).attrs[name].history
+    if not history.has_changes() or not history.deleted:
+        return None
+    return history.deleted[0], history.added[0] if history.added else getattr(target, name)
+
+
+# ORM hooks: these run inside the flush, on the flush's connection, so the
+# counters commit or roll back together with the rows that changed them.
+
+def _after_insert(mapper, connection, target):
+    if isinstance(target, Sale):
+        apply_sale_rollups(connection, [target], 1)
+        return
+    apply_row_count(connection, mapper.local_table.name, 1)
+    if isinstance(target, Vehicle):
+        apply_vehicle_types(connection, Counter({target.type: 1}))
+
+
+def _before_delete(mapper, connection, target):
+    # Sales of a deleted vehicle, customer or salesperson are removed by ON DELETE CASCADE
+    # (passive_deletes), so they never reach _after_delete: retract them here. Sales the
+    # session had loaded were already deleted, and counted, earlier in the same flush.
+    column = {Vehicle: Sale.vehicle_id, Customer: Sale.customer_id, Salesperson: Sale.salesperson_id}[mapper.class_]
+    retract_sales(connection, column == target.id)
+
+
+def _after_delete(mapper, connection, target):
+    if isinstance(target, Sale):
+        apply_sale_rollups(connection, [target], -1)
+        return
+    apply_row_count(connection, mapper.local_table.name, -1)
+    if isinstance(target, Vehicle):
+        apply_vehicle_types(connection, Counter({target.type: -1}))
+        for model in (DailyVehicleSales, MonthlyVehicleSales, YearlyVehicleSales, VehicleSales):
+            connection.execute(model.__table__.delete().where(model.vehicle_id == target.id))
+
+
+def _after_update(mapper, connection, target):
+    if isinstance(target, Vehicle):
+        change = _changed(target, 'type')
+        if change:
+            apply_vehicle_types(connection, Counter({change[0]: -1, change[1]: 1}))
+        return
+    old = {name: getattr(target, name) for name in ('vehicle_id', 'salesperson_id', 'sale_date')}
+    new = dict(old)
+    for name in old:
+        change = _changed(target, name)
+        if change:
+            old[name], new[name] = change
+    if old != new:
+        # Sale totals are unchanged: only move the sale between buckets
+        apply_sale_rollups(connection, [old], -1, count_rows=False)
+        apply_sale_rollups(connection, [new], 1, count_rows=False)
+
+
+def register_rollup_events():
+    for model in COUNTED_MODELS:
+        if not event.contains(model, 'after_insert', _after_insert):
+            event.listen(model, 'after_insert', _after_insert)
+            event.listen(model, 'after_delete', _after_delete)
+    for model in (Vehicle, Customer, Salesperson):
+        if not event.contains(model, 'before_delete', _before_delete):
+            event.listen(model, 'before_delete', _before_delete)
+    for model in (Vehicle, Sale):
+        if not event.contains(model, 'after_update', _after_update):
+            event.listen(model, 'after_update', _after_update)
+
+
+register_rollup_events()
+
+
+def rebuild_rollups():
+    """Recompute every rollup table from the base tables in one transaction"""
+    session = db.session
+    for model in (RowCount, MonthlySales, DailySales, DailySalespersonSales, MonthlySalespersonSales,
+                  DailyVehicleSales, MonthlyVehicleSales, YearlyVehicleSales, VehicleSales, SalespersonSales,
+                  VehicleTypeCount):
+        session.execute(model.__table__.delete())
+
+    for model in COUNTED_MODELS:
+        session.execute(RowCount.__table__.insert().from_select(
+            ['table_name', 'row_count'],
+            db.select(db.literal(model.__tablename__), db.func.count()).select_from(model.__table__)
+        ))
+
+    year = db.extract('year', Sale.sale_date)
+    month = db.extract('month', Sale.sale_date)
+    session.execute(MonthlySales.__table__.insert().from_select(
+        ['year', 'month', 'sale_count'],
+        db.select(year, month, db.func.count(Sale.id)).group_by(year, month)
+    ))
+    session.execute(DailySales.__table__.insert().from_select(
+        ['sale_date', 'sale_count'],
+        db.select(Sale.sale_date, db.func.count(Sale.id)).group_by(Sale.sale_date)
+    ))
+    session.execute(DailySalespersonSales.__table__.insert().from_select(
+        ['sale_date', 'salesperson_id', 'sale_count'],
+        db.select(Sale.sale_date, Sale.salesperson_id, db.func.count(Sale.id))
+        .group_by(Sale.sale_date, Sale.salesperson_id)
+    ))
+    session.execute(MonthlySalespersonSales.__table__.insert().from_select(
+        ['year', 'month', 'salesperson_id', 'sale_count'],
+        db.select(year, month, Sale.salesperson_id, db.func.count(Sale.id)).group_by(year, month, Sale.salesperson_id)
+    ))
+    session.execute(DailyVehicleSales.__table__.insert().from_select(
+        ['sale_date', 'vehicle_id', 'sale_count'],
+        db.select(Sale.sale_date, Sale.vehicle_id, db.func.count(Sale.id)).group_by(Sale.sale_date, Sale.vehicle_id)
+    ))
+    session.execute(MonthlyVehicleSales.__table__.insert().from_select(
+        ['year', 'month', 'vehicle_id', 'sale_count'],
+        db.select(year, month, Sale.vehicle_id, db.func.count(Sale.id)).group_by(year, month, Sale.vehicle_id)
+    ))
+    session.execute(YearlyVehicleSales.__table__.insert().from_select(
+        ['year', 'vehicle_id', 'sale_count'],
+        db.select(year, Sale.vehicle_id, db.func.count(Sale.id)).group_by(year, Sale.vehicle_id)
+    ))
+    session.execute(VehicleSales.__table__.insert().from_select(
+        ['vehicle_id', 'sale_count'],
+        db.select(Sale.vehicle_id, db.func.count(Sale.id)).group_by(Sale.vehicle_id)
+    ))
+    session.execute(SalespersonSales.__table__.insert().from_select(
+        ['salesperson_id', 'sale_count'],
+        db.select(Sale.salesperson_id, db.func.count(Sale.id)).group_by(Sale.salesperson_id)
+    ))
+    session.execute(VehicleTypeCount.__table__.insert().from_select(
+        ['type', 'vehicle_count'],
+        db.select(Vehicle.type, db.func.count(Vehicle.id)).group_by(Vehicle.type)
+    ))
+    session.commit()
+
+
+def dashboard_totals():
+    """The dashboard's summary cards and vehicle type split, read from the rollup tables only"""
+    counts = dict(db.session.query(RowCount.table_name, RowCount.row_count).all())
+
+    vehicle_types = db.session.query(
+        VehicleTypeCount.type,
+        VehicleTypeCount.vehicle_count.label('count')
+    ).filter(VehicleTypeCount.vehicle_count > 0).order_by(VehicleTypeCount.type).all()
+
+    return {
+        'total_vehicles': counts.get(Vehicle.__tablename__, 0),
+        'total_sales': counts.get(Sale.__tablename__, 0),
+        'total_customers': counts.get(Customer.__tablename__, 0),
+        'total_salespeople': counts.get(Salesperson.__tablename__, 0),
+        'vehicle_types': vehicle_types,
+    }
+
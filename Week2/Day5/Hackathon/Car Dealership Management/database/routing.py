@@ -0,0 +1,110 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from flask import g, has_app_context
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+# SQLALCHEMY_BINDS keys given to the replica URLs, in configuration order
+REPLICA_BIND_PREFIX = 'replica_'
+
+POSTGRES_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+VERSIONS = text("SELECT table_name, version, updated_at FROM data_versions")
+
+
+def replica_binds(urls):
+    """SQLALCHEMY_BINDS entries for a comma-separated list of replica URLs"""
+    return {f'{REPLICA_BIND_PREFIX}{i}': url.strip()
+            for i, url in enumerate(u for u in urls.split(',') if u.strip())}
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends plain SELECTs to the replica chosen for the current request.
+
+    A view opts in through web.replica.replica_reads, which stores the
+    replica engine in g. Everything else, including any flush or DML
+    statement issued from an opted-in view, goes to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = g.get('db_replica') if has_app_context() else None
+        if replica is not None and not self._flushing and clause is not None and clause.is_select:
+            return replica
+        return super().get_bind(mapper, clause)
+
+
+def _mark_write(session, flush_context):
+    # Read-your-writes: the request hooks in web.replica pin this client to the primary
+    if has_app_context():
+        g.db_wrote = True
+
+
+event.listen(RoutingSession, 'after_flush', _mark_write)
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+class ReplicaMonitor:
+    """Cached replication lag per replica bind, re-measured every `interval` seconds.
+
+    Postgres standbys report how long ago the last replayed transaction
+    committed (zero when replay has caught up with everything received).
+    Other databases, e.g. two SQLite files for local testing, compare the
+    data_versions change counters with the primary: a replica missing a
+    table's latest change is counted as behind since that change.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def _measure(self, db, app, bind):
+        engine = db.get_engine(app, bind=bind)
+        with engine.connect() as conn:
+            if engine.dialect.name == 'postgresql':
+                return float(conn.execute(POSTGRES_LAG).scalar() or 0)
+            replica = {row[0]: row[1] for row in conn.execute(VERSIONS)}
+        with db.get_engine(app).connect() as conn:
+            behind = [_parse_timestamp(updated_at) for name, version, updated_at in conn.execute(VERSIONS)
+                      if replica.get(name) != version]
+        if not behind:
+            return 0.0
+        return max(0.0, (datetime.utcnow() - min(behind)).total_seconds())
+
+    def lag(self, db, app, bind):
+        """Seconds `bind` trails the primary; infinity when it cannot be reached"""
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(bind)
+        if checked is None or now - checked[0] >= self.interval:
+            try:
+                lag = self._measure(db, app, bind)
+            except Exception as e:
+                logger.warning("Replica %s is unavailable: %s", bind, e)
+                lag = float('inf')
+            checked = (now, lag)
+            with self._lock:
+                self._checked[bind] = checked
+        measured_at, lag = checked
+        # A replica that was behind has only fallen further behind since it was measured
+        return lag + (now - measured_at) if lag else lag
+
+    def choose(self, db, app, max_lag):
+        """Engine of a random replica within `max_lag` seconds, or None to use the primary"""
+        binds = [bind for bind in app.config.get('SQLALCHEMY_BINDS') or {}
+                 if bind.startswith(REPLICA_BIND_PREFIX)]
+        random.shuffle(binds)
+        for bind in binds:
+            if self.lag(db, app, bind) <= max_lag:
+                return db.get_engine(app, bind=bind)
+        return None
@@ -0,0 +1,220 @@
+import threading
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from database.index import db
+from database.rollups import apply_sale_rollups
+from database.versions import bump_version
+from models.your_model import Vehicle, Customer, Salesperson, Sale
+
+# Foreign keys of a sale and the table each must exist in
+REFERENCES = {'vehicle_id': Vehicle, 'customer_id': Customer, 'salesperson_id': Salesperson}
+
+
+class SaleBatchError(ValueError):
+    """A rejected batch; `errors` lists [{'index', 'errors': {field: [messages]}}] for per-sale problems"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def _positive_int(value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError
+    number = int(value)
+    if number < 1:
+        raise ValueError
+    return number
+
+
+def _parse_sale(item):
+    """(row, errors) for one JSON sale, checked with the same rules as SaleForm"""
+    if not isinstance(item, dict):
+        return None, {'sale': ['Expected an object.']}
+    row, errors = {}, {}
+    for field in REFERENCES:
+        try:
+            row[field] = _positive_int(item.get(field))
+        except ValueError:
+            errors[field] = ['Must be a positive integer id.']
+    try:
+        row['sale_date'] = date.fromisoformat(item.get('sale_date'))
+    except (TypeError, ValueError):
+        errors['sale_date'] = ['Must be a date as YYYY-MM-DD.']
+    try:
+        price = Decimal(str(item.get('sale_price')))
+        if not price.is_finite() or price <= 0:
+            raise ValueError
+        row['sale_price'] = price
+    except (InvalidOperation, ValueError):
+        errors['sale_price'] = ['Must be a positive amount.']
+    return row, errors
+
+
+def parse_sales(payload, max_size):
+    """Validate a batch, either a JSON list of sales or {"sales": [...]}, into insertable rows.
+
+    Raises SaleBatchError for a malformed or oversized batch, or with the
+    per-sale errors if any sale is invalid: a batch is taken whole or not at all.
+    """
+    items = payload.get('sales') if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        raise SaleBatchError('Expected a non-empty JSON list of sales, or {"sales": [...]}')
+    if len(items) > max_size:
+        raise SaleBatchError(f'At most {max_size} sales per batch')
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        row, row_errors = _parse_sale(item)
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+        rows.append(row)
+    if errors:
+        raise SaleBatchError('Invalid sales', errors)
+    return rows
+
+
+def check_references(rows):
+    """Check every vehicle, customer and salesperson id of the batch with one query.
+
+    One UNION ALL of `id IN (...)` lookups, one branch per referenced table,
+    rather than a primary-key lookup per field per sale as SaleForm does.
+    """
+    wanted = {field: {row[field] for row in rows} for field in REFERENCES}
+    found = db.union_all(*(
+        db.select(db.literal(field).label('field'), model.id.label('id')).where(model.id.in_(wanted[field]))
+        for field, model in REFERENCES.items()
+    ))
+    present = set(db.session.execute(found).all())
+    errors = []
+    for index, row in enumerate(rows):
+        row_errors = {field: [f'{model.__name__} not found.'] for field, model in REFERENCES.items()
+                      if (field, row[field]) not in present}
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+    if errors:
+        raise SaleBatchError('Unknown vehicle, customer or salesperson', errors)
+
+
+def insert_sales(connection, rows):
+    """Insert validated rows with one executemany and apply their rollups and data version"""
+    connection.execute(Sale.__table__.insert(), rows)
+    apply_sale_rollups(connection, rows)
+    bump_version(connection, Sale.__tablename__)
+
+
+class _Pending:
+    def __init__(self, rows):
+        self.rows = rows
+        self.error = None
+        self.done = threading.Event()
+
+
+class GroupCommitter:
+    """Let concurrent batches share one transaction and one commit.
+
+    The first batch to arrive becomes the leader: it waits up to `window`
+    seconds (less if `max_rows` are already waiting) for other requests'
+    batches, inserts all of them in one transaction on its own session and
+    then releases the others. If the shared transaction fails, each batch
+    is retried in a transaction of its own, so one bad batch only fails
+    its own request.
+    """
+
+    def __init__(self, window, max_rows):
+        self.window = window
+        self.max_rows = max_rows
+        self._condition = threading.Condition()
+        self._group = None
+        self._group_rows = 0
+        self.requests = 0
+        self.commits = 0
+        self.rows = 0
+
+    def submit(self, rows):
+        pending = _Pending(rows)
+        with self._condition:
+            self.requests += 1
+            leader = self._group is None
+            if leader:
+                self._group, self._group_rows = [], 0
+            self._group.append(pending)
+            self._group_rows += len(rows)
+            if self._group_rows >= self.max_rows:
+                self._condition.notify_all()
+        if leader:
+            with self._condition:
+                self._condition.wait_for(lambda: self._group_rows >= self.max_rows, timeout=self.window)
+                group, self._group = self._group, None
+            self._commit(group)
+        else:
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+
+    def _commit(self, group):
+        try:
+            self._commit_rows([row for pending in group for row in pending.rows])
+        except SQLAlchemyError as e:
+            if len(group) == 1:
+                group[0].error = e
+            else:
+                for pending in group:
+                    try:
+                        self._commit_rows(pending.rows)
+                    except SQLAlchemyError as e:
+                        pending.error = e
+        except Exception as e:
+            for pending in group:
+                pending.error = e
+        finally:
+            for pending in group:
+                pending.done.set()
+
+    def _commit_rows(self, rows):
+        try:
+            insert_sales(db.session.connection(), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        with self._condition:
+            self.commits += 1
+            self.rows += len(rows)
+
+    def render_metrics(self):
+        return '\n'.join([
+            '# HELP sales_batch_requests_total Batches submitted to the group commit.',
+            '# TYPE sales_batch_requests_total counter',
+            f'sales_batch_requests_total {self.requests}',
+            '# HELP sales_batch_commits_total Transactions committed for those batches.',
+            '# TYPE sales_batch_commits_total counter',
+            f'sales_batch_commits_total {self.commits}',
+            '# HELP sales_batch_rows_total Sales inserted through the group commit.',
+            '# TYPE sales_batch_rows_total counter',
+            f'sales_batch_rows_total {self.rows}',
+        ]) + '\n'
+
+
+def save_sales(rows):
+    """Insert a validated batch in one transaction, sharing the commit when group commit is on"""
+    committer = current_app.extensions.get('sale_group_commit')
+    if committer is not None:
+        committer.submit(rows)
+        return
+    try:
+        insert_sales(db.session.connection(), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def init_sale_batches(app):
+    """Set the batch size limit and, when SALES_GROUP_COMMIT_MS > 0, enable group commit"""
+    app.config.setdefault('SALES_BATCH_MAX_SIZE', 1000)
+    app.config.setdefault('SALES_GROUP_COMMIT_MS', 0)
+    if app.config['SALES_GROUP_COMMIT_MS'] > 0:
+        app.extensions['sale_group_commit'] = GroupCommitter(app.config['SALES_GROUP_COMMIT_MS'] / 1000,
+                                                             app.config['SALES_BATCH_MAX_SIZE'])
@@ -0,0 +1,94 @@
+from sqlalchemy import DDL, event, table, column
+from database.index import db
+
+# Trigram indexes make `ILIKE '%term%'` on make/model an index scan on Postgres
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_vehicles_make_trgm ON vehicles USING gin (make gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_vehicles_model_trgm ON vehicles USING gin (model gin_trgm_ops)",
+]
+
+# SQLite equivalent: an FTS5 trigram table kept in sync with vehicles by triggers
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS vehicles_fts USING fts5(
+        make, model, content='vehicles', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS vehicles_fts_insert AFTER INSERT ON vehicles BEGIN
+        INSERT INTO vehicles_fts(rowid, make, model) VALUES (new.id, new.make, new.model);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS vehicles_fts_delete AFTER DELETE ON vehicles BEGIN
+        INSERT INTO vehicles_fts(vehicles_fts, rowid, make, model) VALUES ('delete', old.id, old.make, old.model);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS vehicles_fts_update AFTER UPDATE OF make, model ON vehicles BEGIN
+        INSERT INTO vehicles_fts(vehicles_fts, rowid, make, model) VALUES ('delete', old.id, old.make, old.model);
+        INSERT INTO vehicles_fts(rowid, make, model) VALUES (new.id, new.make, new.model);
+    END""",
+    "INSERT INTO vehicles_fts(vehicles_fts) VALUES ('rebuild')",
+]
+
+# The trigram tokenizer cannot match terms shorter than one trigram
+MIN_FTS_TERM = 3
+
+vehicles_fts = table('vehicles_fts', column('rowid'), column('rank'))
+
+
+def register_search_ddl(vehicle_table):
+    """Create the search indexes whenever the vehicles table is created"""
+    for statement in POSTGRES_SEARCH_DDL:
+        event.listen(vehicle_table, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+    for statement in SQLITE_SEARCH_DDL:
+        event.listen(vehicle_table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+
+_fts_available = {}
+
+
+def has_sqlite_fts(engine):
+    """Check once per engine whether the FTS5 table exists (older databases may predate it)"""
+    if engine.url not in _fts_available:
+        with engine.connect() as conn:
+            found = conn.execute(db.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vehicles_fts'"
+            )).first()
+        _fts_available[engine.url] = found is not None
+    return _fts_available[engine.url]
+
+
+def ilike_filter(model, term):
+    """The original unindexed substring filter, kept as the fallback path"""
+    pattern = f'%{term}%'
+    return model.make.ilike(pattern) | model.model.ilike(pattern)
+
+
+def search_vehicles(query, model, term, ranked=True):
+    """Filter `query` to vehicles whose make or model contains `term`.
+
+    Matches the same rows as the old ILIKE filter but lets the database use
+    an index: pg_trgm GIN indexes on Postgres, an FTS5 trigram table on SQLite.
+    When `ranked` is true the best matches come first (trigram similarity on
+    Postgres, bm25 on SQLite); callers that impose their own ordering, such
+    as keyset pagination, pass ranked=False.
+    """
+    term = term.strip()
+    if not term:
+        return query
+
+    engine = db.get_engine()
+    dialect = engine.dialect.name
+    if dialect == 'postgresql':
+        query = query.filter(ilike_filter(model, term))
+        if ranked:
+            score = db.func.greatest(db.func.similarity(model.make, term), db.func.similarity(model.model, term))
+            query = query.order_by(score.desc(), model.id)
+        return query
+
+    if dialect == 'sqlite' and len(term) >= MIN_FTS_TERM and has_sqlite_fts(engine):
+        # Quote the term as an FTS5 string so punctuation is matched literally
+        phrase = '"' + term.replace('"', '""') + '"'
+        query = query.join(vehicles_fts, vehicles_fts.c.rowid == model.id).filter(
+            db.literal_column('vehicles_fts').op('MATCH')(phrase)
+        )
+        if ranked:
+            query = query.order_by(vehicles_fts.c.rank, model.id)
+        return query
+
+    return query.filter(ilike_filter(model, term))
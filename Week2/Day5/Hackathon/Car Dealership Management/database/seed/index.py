@@ -6,7 +6,7 @@ from models.your_model import Vehicle, Salesperson, Customer, Sale
 def seed_database():
     """Seed the database with sample data"""
     # Check if database is already populated
-    if Vehicle.query.count() > 0:
+    if db.session.query(Vehicle.id).first() is not None:
         print("Database already has data. Skipping seeding.")
         return
 
@@ -29,9 +29,26 @@ CREATE TABLE IF NOT EXISTS vehicles (
     type VARCHAR(20) NOT NULL,
     description TEXT,
     image_url VARCHAR(255),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Keyset pagination indexes for the vehicle listing
+CREATE INDEX IF NOT EXISTS ix_vehicles_created_at_id ON vehicles (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_vehicles_price_id ON vehicles (price, id);
+
+-- Trigram indexes so make/model substring search can use an index
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_vehicles_make_trgm ON vehicles USING gin (make gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_vehicles_model_trgm ON vehicles USING gin (model gin_trgm_ops);
+
+-- Prefix indexes for the sale form typeahead lookups
+CREATE INDEX IF NOT EXISTS ix_vehicles_make_lower ON vehicles (lower(make) varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS ix_vehicles_model_lower ON vehicles (lower(model) varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS ix_customers_first_name_lower ON customers (lower(first_name) varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS ix_customers_last_name_lower ON customers (lower(last_name) varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS ix_salespeople_first_name_lower ON salespeople (lower(first_name) varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS ix_salespeople_last_name_lower ON salespeople (lower(last_name) varchar_pattern_ops);
+
 CREATE TABLE IF NOT EXISTS sales (
     id SERIAL PRIMARY KEY,
     vehicle_id INTEGER NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
@@ -42,6 +59,114 @@ CREATE TABLE IF NOT EXISTS sales (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Secondary indexes for sales joins/groupings and the vehicle type facet
+-- (existing databases get them from database/migrations/0001_sales_and_vehicle_type_indexes.sql)
+CREATE INDEX IF NOT EXISTS ix_sales_vehicle_id ON sales (vehicle_id);
+CREATE INDEX IF NOT EXISTS ix_sales_customer_id ON sales (customer_id);
+CREATE INDEX IF NOT EXISTS ix_sales_salesperson_id ON sales (salesperson_id);
+CREATE INDEX IF NOT EXISTS ix_sales_sale_date ON sales (sale_date);
+CREATE INDEX IF NOT EXISTS ix_sales_sale_date_vehicle_id ON sales (sale_date, vehicle_id);
+CREATE INDEX IF NOT EXISTS ix_vehicles_type ON vehicles (type);
+
+-- Dashboard rollup tables (maintained by the app on every write, see database/rollups.py)
+CREATE TABLE IF NOT EXISTS rollup_row_counts (
+    table_name VARCHAR(50) PRIMARY KEY,
+    row_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_month (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, month)
+);
+
+-- Per-day buckets behind the date-range dashboard (rolled up to weeks/months/years on read)
+CREATE TABLE IF NOT EXISTS rollup_sales_by_day (
+    sale_date DATE PRIMARY KEY,
+    sale_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_day_salesperson (
+    sale_date DATE NOT NULL,
+    salesperson_id INTEGER NOT NULL REFERENCES salespeople(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, salesperson_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_month_salesperson (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    salesperson_id INTEGER NOT NULL REFERENCES salespeople(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, month, salesperson_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_day_vehicle (
+    sale_date DATE NOT NULL,
+    vehicle_id INTEGER NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, vehicle_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_month_vehicle (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    vehicle_id INTEGER NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, month, vehicle_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_year_vehicle (
+    year INTEGER NOT NULL,
+    vehicle_id INTEGER NOT NULL REFERENCES vehicles(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, vehicle_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_vehicle (
+    vehicle_id INTEGER PRIMARY KEY REFERENCES vehicles(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_rollup_sales_by_vehicle_sale_count ON rollup_sales_by_vehicle (sale_count);
+
+CREATE TABLE IF NOT EXISTS rollup_sales_by_salesperson (
+    salesperson_id INTEGER PRIMARY KEY REFERENCES salespeople(id) ON DELETE CASCADE,
+    sale_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rollup_vehicle_types (
+    type VARCHAR(20) PRIMARY KEY,
+    vehicle_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Per-table change counters behind the ETag/Last-Modified headers
+CREATE TABLE IF NOT EXISTS data_versions (
+    table_name VARCHAR(50) PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL
+);
+
+-- Background report jobs (see database/reports.py)
+CREATE TABLE IF NOT EXISTS report_jobs (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(40) NOT NULL,
+    params TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    checkpoint TEXT,
+    result_bytes BIGINT NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    worker VARCHAR(100),
+    created_at TIMESTAMP NOT NULL,
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_report_jobs_status_heartbeat_at ON report_jobs (status, heartbeat_at);
+
 -- Insert sample data
 INSERT INTO salespeople (first_name, last_name, email, phone, hire_date) VALUES
 ('John', 'Doe', 'john.doe@dealership.com', '555-0101', '2020-01-15'),
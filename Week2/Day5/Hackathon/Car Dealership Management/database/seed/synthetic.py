@@ -0,0 +1,119 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+from database.bulk import BulkWriter, timestamp_text
+from database.index import db
+from database.rollups import rebuild_rollups
+from database.versions import bump_version
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William',
+               'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Charles', 'Karen', 'Yahya', 'Amina', 'Omar', 'Fatima', 'Lucas', 'Emma', 'Noah', 'Olivia']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson',
+              'Martin', 'Lee', 'Benali', 'Alaoui', 'Dubois', 'Rossi', 'Schmidt', 'Nguyen', 'Kim', 'Clark']
+STREETS = ['Main St', 'Oak Ave', 'Pine Rd', 'Elm St', 'Maple Dr', 'Cedar Ln', 'Birch Blvd', 'Spruce Way']
+CATALOG = [
+    ('Toyota', 'Camry', 'sedan', 25000), ('Toyota', 'RAV4', 'suv', 29000), ('Toyota', 'Tacoma', 'truck', 31000),
+    ('Honda', 'Civic', 'sedan', 23000), ('Honda', 'CR-V', 'suv', 28000), ('Honda', 'Fit', 'hatchback', 17000),
+    ('Ford', 'F-150', 'truck', 36000), ('Ford', 'Mustang', 'coupe', 30000), ('Ford', 'Explorer', 'suv', 35000),
+    ('Tesla', 'Model 3', 'sedan', 39000), ('Tesla', 'Model Y', 'suv', 44000), ('BMW', 'X5', 'suv', 62000),
+    ('BMW', '4 Series', 'convertible', 55000), ('Mercedes-Benz', 'C-Class', 'sedan', 43000),
+    ('Audi', 'Q7', 'suv', 56000), ('Audi', 'A3', 'sedan', 34000), ('Volkswagen', 'Golf', 'hatchback', 24000),
+    ('Chevrolet', 'Silverado', 'truck', 37000), ('Chevrolet', 'Camaro', 'coupe', 29000),
+    ('Mazda', 'MX-5', 'convertible', 28000), ('Hyundai', 'Elantra', 'sedan', 21000), ('Kia', 'Sportage', 'suv', 27000),
+]
+
+# Columns written by the bulk loader, in file/tuple order
+COLUMNS = {
+    'salespeople': ('id', 'first_name', 'last_name', 'email', 'phone', 'hire_date', 'created_at'),
+    'customers': ('id', 'first_name', 'last_name', 'email', 'phone', 'address', 'created_at'),
+    'vehicles': ('id', 'make', 'model', 'year', 'price', 'type', 'description', 'image_url', 'created_at'),
+    'sales': ('id', 'vehicle_id', 'customer_id', 'salesperson_id', 'sale_date', 'sale_price', 'created_at'),
+}
+
+
+class Progress:
+    """Print rows written and throughput for one table"""
+
+    def __init__(self, table, total):
+        self.table = table
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+
+    def advance(self, rows):
+        self.done += rows
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0
+        print(f"  {self.table}: {self.done:,}/{self.total:,} rows ({rate:,.0f} rows/s)", flush=True)
+
+
+def next_id(table):
+    return (db.session.execute(db.text(f'SELECT MAX(id) FROM {table}')).scalar() or 0) + 1
+
+
+def load_synthetic(vehicles=1000, customers=1000, salespeople=50, sales=10000, seed=42,
+                   batch_size=10000, end_date=date(2024, 12, 31), years=5):
+    """Generate and bulk-load a deterministic synthetic dataset.
+
+    The same seed and counts always produce the same rows. New rows get
+    explicit ids after the current maximum, so the loader can run against a
+    database that already has data, and sales can reference the generated
+    vehicles, customers and salespeople without reading them back.
+    Everything is written in one transaction; the rollup tables are
+    rebuilt at the end.
+    """
+    rng = random.Random(seed)
+    writer = BulkWriter(batch_size)
+    stamp = datetime.combine(end_date, datetime.min.time())
+    first_day = end_date - timedelta(days=365 * years)
+    span = (end_date - first_day).days
+    started = time.perf_counter()
+    print(f"Loading synthetic data (seed={seed}) through {writer.dialect}...")
+
+    first_salesperson = next_id('salespeople')
+    writer.write('salespeople', COLUMNS['salespeople'], (
+        (first_salesperson + i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+         f'staff{first_salesperson + i}@dealership.example', f'555-{rng.randint(0, 9999):04d}',
+         (first_day - timedelta(days=rng.randint(0, 3650))).isoformat(), timestamp_text(stamp))
+        for i in range(salespeople)
+    ), Progress('salespeople', salespeople).advance)
+
+    first_customer = next_id('customers')
+    writer.write('customers', COLUMNS['customers'], (
+        (first_customer + i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+         f'customer{first_customer + i}@mail.example', f'555-{rng.randint(0, 9999):04d}',
+         f'{rng.randint(1, 9999)} {rng.choice(STREETS)}, Anytown, USA', timestamp_text(stamp))
+        for i in range(customers)
+    ), Progress('customers', customers).advance)
+
+    first_vehicle = next_id('vehicles')
+
+    def vehicle_rows():
+        for i in range(vehicles):
+            make, model, vehicle_type, base_price = rng.choice(CATALOG)
+            year = rng.randint(end_date.year - 10, end_date.year)
+            price = round(base_price * rng.uniform(0.6, 1.2), 2)
+            created = stamp - timedelta(seconds=rng.randint(0, span * 86400))
+            yield (first_vehicle + i, make, model, year, price, vehicle_type,
+                   f'{year} {make} {model} in good condition.', None, timestamp_text(created))
+    writer.write('vehicles', COLUMNS['vehicles'], vehicle_rows(), Progress('vehicles', vehicles).advance)
+
+    first_sale = next_id('sales')
+
+    def sale_rows():
+        for i in range(sales):
+            sale_date = first_day + timedelta(days=rng.randint(0, span))
+            yield (first_sale + i, first_vehicle + rng.randrange(vehicles), first_customer + rng.randrange(customers),
+                   first_salesperson + rng.randrange(salespeople), sale_date.isoformat(),
+                   round(rng.uniform(5000, 80000), 2), timestamp_text(stamp))
+    if sales and vehicles and customers and salespeople:
+        writer.write('sales', COLUMNS['sales'], sale_rows(), Progress('sales', sales).advance)
+
+    for table in COLUMNS:
+        writer.reset_sequence(table)
+        bump_version(db.session.connection(), table)
+    db.session.commit()
+    rebuild_rollups()
+    print(f"Synthetic data loaded in {time.perf_counter() - started:.1f}s")
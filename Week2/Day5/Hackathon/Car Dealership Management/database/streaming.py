@@ -0,0 +1,53 @@
+import json
+from database.index import db
+from database.facets import filter_vehicles
+from models.your_model import Vehicle
+
+# Columns exposed by /api/vehicles, in their default order
+VEHICLE_FIELDS = ('id', 'make', 'model', 'year', 'price', 'type', 'description', 'image_url')
+
+# Rows fetched from the database cursor per round-trip while streaming
+STREAM_BATCH_SIZE = 1000
+
+
+def parse_fields(raw):
+    """Turn '?fields=id,make' into a tuple of column names, or raise ValueError"""
+    if not raw:
+        return VEHICLE_FIELDS
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in VEHICLE_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown) or '(none)'}")
+    # The id is always included so clients can page with ?after=
+    return fields if 'id' in fields else ('id',) + fields
+
+
+def vehicle_rows_query(fields, after=None, limit=None, filters=None):
+    """Select only the requested columns, ordered by id for stable cursors.
+
+    Selecting columns instead of the Vehicle entity returns lightweight rows
+    and skips building ORM objects, which matters for large exports.
+    `filters` (VehicleFilters) are applied before the limit.
+    """
+    query = db.session.query(*(getattr(Vehicle, name) for name in fields)).order_by(Vehicle.id)
+    if after is not None:
+        query = query.filter(Vehicle.id > after)
+    if filters:
+        query = filter_vehicles(query, Vehicle, filters)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def row_to_dict(row, fields):
+    data = dict(zip(fields, row))
+    if data.get('price') is not None:
+        data['price'] = float(data['price'])
+    return data
+
+
+def stream_ndjson(query, fields):
+    """Yield one JSON document per line, reading the cursor in batches"""
+    streamed = query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+    for row in streamed:
+        yield json.dumps(row_to_dict(row, fields)) + '\n'
@@ -0,0 +1,44 @@
+from datetime import datetime
+from sqlalchemy import event
+from database.index import db
+from database.counters import increment
+from models.your_model import Vehicle, Salesperson, Customer, Sale
+from models.versions import DataVersion
+
+VERSIONED_MODELS = (Vehicle, Salesperson, Customer, Sale)
+
+
+def bump_version(connection, table_name):
+    """Mark `table_name` as changed; call once per bulk write that bypasses the ORM"""
+    # HTTP dates only carry whole seconds
+    now = datetime.utcnow().replace(microsecond=0)
+    increment(connection, DataVersion, {'table_name': table_name}, 'version', 1, extra={'updated_at': now})
+
+
+def read_versions(table_names):
+    """Return ({table: version}, latest updated_at) with a single primary-key lookup"""
+    table = DataVersion.__table__
+    rows = db.session.execute(
+        db.select(table.c.table_name, table.c.version, table.c.updated_at)
+        .where(table.c.table_name.in_(table_names))
+    ).all()
+    versions = {name: 0 for name in table_names}
+    latest = None
+    for name, version, updated_at in rows:
+        versions[name] = version
+        latest = updated_at if latest is None else max(latest, updated_at)
+    return versions, latest
+
+
+def _after_change(mapper, connection, target):
+    bump_version(connection, mapper.local_table.name)
+
+
+def register_version_events():
+    for model in VERSIONED_MODELS:
+        if not event.contains(model, 'after_insert', _after_change):
+            for name in ('after_insert', 'after_update', 'after_delete'):
+                event.listen(model, name, _after_change)
+
+
+register_version_events()
@@ -0,0 +1,64 @@
+from datetime import datetime
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired
+from wtforms import StringField, IntegerField, DecimalField, SelectField, TextAreaField, SubmitField
+from wtforms.validators import DataRequired, NumberRange, Length, ValidationError
+from models import db, Vehicle, Salesperson, Customer
+
+class VehicleForm(FlaskForm):
+    make = StringField('Make', validators=[DataRequired(), Length(max=50)])
+    model = StringField('Model', validators=[DataRequired(), Length(max=50)])
+    year = IntegerField('Year', validators=[DataRequired(), NumberRange(min=1900, max=datetime.now().year)])
+    price = DecimalField('Price', validators=[DataRequired(), NumberRange(min=0)])
+    type = SelectField('Type', choices=[
+        ('sedan', 'Sedan'),
+        ('suv', 'SUV'),
+        ('truck', 'Truck'),
+        ('coupe', 'Coupe'),
+        ('convertible', 'Convertible'),
+        ('hatchback', 'Hatchback')
+    ])
+    description = TextAreaField('Description', validators=[Length(max=500)])
+    image_url = StringField('Image URL', validators=[Length(max=255)])
+    submit = SubmitField('Save Vehicle')
+
+class VehicleImportForm(FlaskForm):
+    file = FileField('CSV File', validators=[FileRequired()])
+    submit = SubmitField('Import Vehicles')
+
+class SalespersonForm(FlaskForm):
+    first_name = StringField('First Name', validators=[DataRequired(), Length(max=50)])
+    last_name = StringField('Last Name', validators=[DataRequired(), Length(max=50)])
+    email = StringField('Email', validators=[DataRequired(), Length(max=120)])
+    phone = StringField('Phone', validators=[DataRequired(), Length(max=20)])
+    hire_date = StringField('Hire Date', validators=[DataRequired()])
+    submit = SubmitField('Save Salesperson')
+
+class CustomerForm(FlaskForm):
+    first_name = StringField('First Name', validators=[DataRequired(), Length(max=50)])
+    last_name = StringField('Last Name', validators=[DataRequired(), Length(max=50)])
+    email = StringField('Email', validators=[DataRequired(), Length(max=120)])
+    phone = StringField('Phone', validators=[DataRequired(), Length(max=20)])
+    address = StringField('Address', validators=[DataRequired(), Length(max=200)])
+    submit = SubmitField('Save Customer')
+
+class RecordExists:
+    """Validate that an id field refers to an existing row, with a single primary-key lookup"""
+    def __init__(self, model, message=None):
+        self.model = model
+        self.message = message or f'{model.__name__} not found.'
+
+    def __call__(self, form, field):
+        if field.data is None:
+            return
+        if db.session.query(self.model.id).filter(self.model.id == field.data).first() is None:
+            raise ValidationError(self.message)
+
+class SaleForm(FlaskForm):
+    # Ids are picked through the /api/lookup typeahead endpoints instead of preloaded dropdowns
+    vehicle_id = IntegerField('Vehicle', validators=[DataRequired(), RecordExists(Vehicle)])
+    customer_id = IntegerField('Customer', validators=[DataRequired(), RecordExists(Customer)])
+    salesperson_id = IntegerField('Salesperson', validators=[DataRequired(), RecordExists(Salesperson)])
+    sale_date = StringField('Sale Date', validators=[DataRequired()])
+    sale_price = DecimalField('Sale Price', validators=[DataRequired(), NumberRange(min=0)])
+    submit = SubmitField('Save Sale')
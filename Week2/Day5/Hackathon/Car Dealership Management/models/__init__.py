@@ -1,5 +1,19 @@
 # Models package
 
 from .your_model import db, Vehicle, Salesperson, Customer, Sale
+from .rollups import (RowCount, MonthlySales, DailySales, DailySalespersonSales, MonthlySalespersonSales,
+                      DailyVehicleSales, MonthlyVehicleSales, YearlyVehicleSales, VehicleSales, SalespersonSales,
+                      VehicleTypeCount)
+from .versions import DataVersion
+from .reports import ReportJob
 
-__all__ = ['db', 'Vehicle', 'Salesperson', 'Customer', 'Sale']
\ No newline at end of file
+# Importing these registers the ORM hooks that keep the dashboard rollup tables
+# and the per-table change counters in step with every insert/update/delete
+import database.rollups
+import database.versions
+
+__all__ = ['db', 'Vehicle', 'Salesperson', 'Customer', 'Sale',
+           'RowCount', 'MonthlySales', 'DailySales', 'DailySalespersonSales', 'MonthlySalespersonSales',
+           'DailyVehicleSales', 'MonthlyVehicleSales', 'YearlyVehicleSales', 'VehicleSales', 'SalespersonSales',
+           'VehicleTypeCount',
+           'DataVersion', 'ReportJob']
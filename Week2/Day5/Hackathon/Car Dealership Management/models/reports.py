@@ -0,0 +1,32 @@
+from datetime import datetime
+from database.index import db
+
+class ReportJob(db.Model):
+    """A report run in the background: its status, progress, and where to resume it.
+
+    `checkpoint` (JSON) is the report's position after the last rows saved
+    to the .part file, and `result_bytes` the size of that file at the
+    time, so a job taken over from a dead worker continues from there.
+    """
+    __tablename__ = 'report_jobs'
+    # The runner looks for queued jobs, and running ones whose worker stopped renewing its lease
+    __table_args__ = (db.Index('ix_report_jobs_status_heartbeat_at', 'status', 'heartbeat_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    checkpoint = db.Column(db.Text)
+    result_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ReportJob {self.id} {self.kind} {self.status}>'
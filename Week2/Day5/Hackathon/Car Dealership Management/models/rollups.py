@@ -0,0 +1,111 @@
+from database.index import db
+
+# Summary tables read by the /stats dashboard. They are kept up to date by
+# database/rollups.py in the same transaction as the rows they count.
+
+class RowCount(db.Model):
+    __tablename__ = 'rollup_row_counts'
+
+    table_name = db.Column(db.String(50), primary_key=True)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<RowCount {self.table_name}={self.row_count}>'
+
+class MonthlySales(db.Model):
+    __tablename__ = 'rollup_sales_by_month'
+
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<MonthlySales {self.year}-{self.month:02d}={self.sale_count}>'
+
+class DailySales(db.Model):
+    __tablename__ = 'rollup_sales_by_day'
+
+    sale_date = db.Column(db.Date, primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailySales {self.sale_date}={self.sale_count}>'
+
+class DailySalespersonSales(db.Model):
+    __tablename__ = 'rollup_sales_by_day_salesperson'
+
+    sale_date = db.Column(db.Date, primary_key=True)
+    salesperson_id = db.Column(db.Integer, db.ForeignKey('salespeople.id', ondelete='CASCADE'), primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailySalespersonSales {self.sale_date} #{self.salesperson_id}={self.sale_count}>'
+
+class MonthlySalespersonSales(db.Model):
+    __tablename__ = 'rollup_sales_by_month_salesperson'
+
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    salesperson_id = db.Column(db.Integer, db.ForeignKey('salespeople.id', ondelete='CASCADE'), primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<MonthlySalespersonSales {self.year}-{self.month:02d} #{self.salesperson_id}={self.sale_count}>'
+
+class DailyVehicleSales(db.Model):
+    __tablename__ = 'rollup_sales_by_day_vehicle'
+
+    sale_date = db.Column(db.Date, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id', ondelete='CASCADE'), primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyVehicleSales {self.sale_date} #{self.vehicle_id}={self.sale_count}>'
+
+class MonthlyVehicleSales(db.Model):
+    __tablename__ = 'rollup_sales_by_month_vehicle'
+
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id', ondelete='CASCADE'), primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<MonthlyVehicleSales {self.year}-{self.month:02d} #{self.vehicle_id}={self.sale_count}>'
+
+class YearlyVehicleSales(db.Model):
+    __tablename__ = 'rollup_sales_by_year_vehicle'
+
+    year = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id', ondelete='CASCADE'), primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<YearlyVehicleSales {self.year} #{self.vehicle_id}={self.sale_count}>'
+
+class VehicleSales(db.Model):
+    __tablename__ = 'rollup_sales_by_vehicle'
+
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id', ondelete='CASCADE'), primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+
+    def __repr__(self):
+        return f'<VehicleSales {self.vehicle_id}={self.sale_count}>'
+
+class SalespersonSales(db.Model):
+    __tablename__ = 'rollup_sales_by_salesperson'
+
+    salesperson_id = db.Column(db.Integer, db.ForeignKey('salespeople.id', ondelete='CASCADE'), primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SalespersonSales {self.salesperson_id}={self.sale_count}>'
+
+class VehicleTypeCount(db.Model):
+    __tablename__ = 'rollup_vehicle_types'
+
+    type = db.Column(db.String(20), primary_key=True)
+    vehicle_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<VehicleTypeCount {self.type}={self.vehicle_count}>'
@@ -0,0 +1,12 @@
+from database.index import db
+
+class DataVersion(db.Model):
+    """Change counter per table, used to build ETag/Last-Modified headers cheaply"""
+    __tablename__ = 'data_versions'
+
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<DataVersion {self.table_name} v{self.version}>'
@@ -1,26 +1,38 @@
 
 from datetime import datetime, date
 from database.index import db
+from database.search import register_search_ddl
+from database.lookups import register_lookup_ddl
 
 class Vehicle(db.Model):
     __tablename__ = 'vehicles'
+    # Composite indexes backing keyset pagination on (created_at, id) and (price, id)
+    __table_args__ = (
+        db.Index('ix_vehicles_created_at_id', 'created_at', 'id'),
+        db.Index('ix_vehicles_price_id', 'price', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     make = db.Column(db.String(50), nullable=False)
     model = db.Column(db.String(50), nullable=False)
     year = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Numeric(10, 2), nullable=False)
-    type = db.Column(db.String(20), nullable=False)
+    type = db.Column(db.String(20), nullable=False, index=True)
     description = db.Column(db.Text)
     image_url = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Part of the keyset pagination key, so it must never be NULL
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
-    # Relationships
-    sales = db.relationship('Sale', backref='vehicle', cascade='all, delete-orphan')
+    # Relationships; deleting leaves the sales to the database's ON DELETE CASCADE instead of loading them
+    sales = db.relationship('Sale', backref='vehicle', cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<Vehicle {self.year} {self.make} {self.model}>'
 
+# Trigram (Postgres) / FTS5 (SQLite) search indexes on make and model
+register_search_ddl(Vehicle.__table__)
+register_lookup_ddl(Vehicle.__table__)
+
 class Salesperson(db.Model):
     __tablename__ = 'salespeople'
 
@@ -32,12 +44,14 @@ class Salesperson(db.Model):
     hire_date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # Relationships
-    sales = db.relationship('Sale', backref='salesperson', cascade='all, delete-orphan')
+    # Relationships; deleting leaves the sales to the database's ON DELETE CASCADE instead of loading them
+    sales = db.relationship('Sale', backref='salesperson', cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<Salesperson {self.first_name} {self.last_name}>'
 
+register_lookup_ddl(Salesperson.__table__)
+
 class Customer(db.Model):
     __tablename__ = 'customers'
 
@@ -49,20 +63,26 @@ class Customer(db.Model):
     address = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # Relationships
-    sales = db.relationship('Sale', backref='customer', cascade='all, delete-orphan')
+    # Relationships; deleting leaves the sales to the database's ON DELETE CASCADE instead of loading them
+    sales = db.relationship('Sale', backref='customer', cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<Customer {self.first_name} {self.last_name}>'
 
+register_lookup_ddl(Customer.__table__)
+
 class Sale(db.Model):
     __tablename__ = 'sales'
+    # Covers per-vehicle counts over a sale_date range without touching the table
+    __table_args__ = (
+        db.Index('ix_sales_sale_date_vehicle_id', 'sale_date', 'vehicle_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id', ondelete='CASCADE'), nullable=False)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
-    salesperson_id = db.Column(db.Integer, db.ForeignKey('salespeople.id', ondelete='CASCADE'), nullable=False)
-    sale_date = db.Column(db.Date, nullable=False)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id', ondelete='CASCADE'), nullable=False, index=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE'), nullable=False, index=True)
+    salesperson_id = db.Column(db.Integer, db.ForeignKey('salespeople.id', ondelete='CASCADE'), nullable=False, index=True)
+    sale_date = db.Column(db.Date, nullable=False, index=True)
     sale_price = db.Column(db.Numeric(10, 2), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
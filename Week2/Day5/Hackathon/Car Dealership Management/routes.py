@@ -0,0 +1,443 @@
+import os
+from flask import Blueprint, Response, abort, current_app, g, render_template, request, redirect, url_for, flash, jsonify, send_file, stream_with_context
+from datetime import date, datetime
+from sqlalchemy.exc import IntegrityError
+from models import db, Vehicle, Salesperson, Customer, Sale, ReportJob, VehicleSales
+from database.pagination import keyset_paginate, offset_paginate
+from database.counts import count_rows
+from database.search import search_vehicles
+from database.facets import VehicleFilters, filter_vehicles, vehicle_facets
+from database.rollups import dashboard_totals, delete_vehicles
+from database.date_ranges import PRESETS, BUCKETS, parse_range, range_stats
+from database.streaming import parse_fields, vehicle_rows_query, row_to_dict, stream_ndjson
+from database.sale_batch import SaleBatchError, check_references, parse_sales, save_sales
+from database.csv_io import EXPORT_COLUMNS, ImportReport, decode_lines, export_rows, import_vehicles, stream_csv
+from database.lookups import lookup, DEFAULT_LOOKUP_LIMIT
+from database.autocomplete import KINDS as AUTOCOMPLETE_KINDS, autocomplete
+from database.reports import REPORTS, enqueue_report, report_runner, report_status
+from database.pool import metrics as pool_metrics
+from web.conditional import conditional
+from web.replica import replica_reads
+from web.page_cache import cached_page, invalidate_pages, page_cache
+from web.result_cache import result_cache, shared_result
+from web.live import DASHBOARD_TABLES, dashboard_state, live_feed, publish_resync, publish_sale
+from web.instrumentation import metrics as request_metrics
+
+# All dealership pages and API endpoints. Views that render forms import them
+# on first use (see forms.py) so wtforms stays out of worker start-up.
+bp = Blueprint('main', __name__)
+
+# Sales listed on a vehicle's page, newest first
+SALES_HISTORY_ROWS = 10
+
+@bp.route('/')
+@conditional('vehicles')
+@cached_page('vehicles')
+def index():
+    page = request.args.get('page', 1, type=int)
+    search = request.args.get('search', '')
+
+    cursor = request.args.get('cursor')
+    sort = request.args.get('sort')
+    keyset = bool(cursor or sort or current_app.config['PAGINATION_MODE'] == 'keyset')
+
+    query = Vehicle.query
+    if search:
+        # Keyset pages impose their own ordering, so only rank in page-number mode
+        query = search_vehicles(query, Vehicle, search, ranked=not keyset)
+
+    # ?type=&make=&year_min=&year_max=&price_min=&price_max= narrow the list; the
+    # facet counts are computed from the searched query before those filters
+    filters = VehicleFilters.from_args(request.args)
+    facets = vehicle_facets(query, Vehicle, filters, searched=bool(search), versions=g.get('data_versions'))
+    query = filter_vehicles(query, Vehicle, filters)
+    context = dict(search=search, filters=filters, filter_args=filters.to_args(), facets=facets, now=datetime.now())
+
+    # Exact below COUNT_EXACT_THRESHOLD, an estimate ("about N") above it
+    whole_table = not search and not filters
+    if keyset:
+        total = count_rows(query, Vehicle, whole_table) if current_app.config['PAGINATION_COUNT'] else None
+        vehicles = keyset_paginate(query, Vehicle, sort=sort or 'newest', cursor=cursor, per_page=6, total=total)
+        return render_template('index.html', vehicles=vehicles, keyset=True, **context)
+
+    vehicles = offset_paginate(query, page, 6, count_rows(query, Vehicle, whole_table))
+    return render_template('index.html', vehicles=vehicles, keyset=False, **context)
+
+@bp.route('/vehicle/<int:id>')
+@conditional('vehicles', 'sales', 'customers', 'salespeople')
+@cached_page('vehicles', 'sales', 'customers', 'salespeople')
+def vehicle_detail(id):
+    vehicle = Vehicle.query.get_or_404(id)
+    # Only the latest sales, each with its customer and salesperson joined in rather than
+    # loaded once per row; the full history is the salesperson-sales report for the vehicle
+    recent_sales = Sale.query.options(db.joinedload(Sale.customer), db.joinedload(Sale.salesperson)) \
+        .filter(Sale.vehicle_id == id).order_by(Sale.sale_date.desc(), Sale.id.desc()) \
+        .limit(SALES_HISTORY_ROWS).all()
+    sale_count = db.session.query(VehicleSales.sale_count).filter(VehicleSales.vehicle_id == id).scalar() or 0
+    return render_template('details.html', vehicle=vehicle, recent_sales=recent_sales, sale_count=sale_count,
+                           now=datetime.now())
+
+@bp.route('/vehicle/create', methods=['GET', 'POST'])
+def create_vehicle():
+    from forms import VehicleForm
+    form = VehicleForm()
+    if form.validate_on_submit():
+        vehicle = Vehicle(
+            make=form.make.data,
+            model=form.model.data,
+            year=form.year.data,
+            price=form.price.data,
+            type=form.type.data,
+            description=form.description.data,
+            image_url=form.image_url.data or None
+        )
+        db.session.add(vehicle)
+        db.session.commit()
+        invalidate_pages('vehicles')
+        publish_resync()
+        flash('Vehicle created successfully!', 'success')
+        return redirect(url_for('main.index'))
+    return render_template('create.html', form=form, title='Add Vehicle', now=datetime.now())
+
+@bp.route('/vehicle/edit/<int:id>', methods=['GET', 'POST'])
+def edit_vehicle(id):
+    from forms import VehicleForm
+    vehicle = Vehicle.query.get_or_404(id)
+    form = VehicleForm(obj=vehicle)
+    if form.validate_on_submit():
+        vehicle.make = form.make.data
+        vehicle.model = form.model.data
+        vehicle.year = form.year.data
+        vehicle.price = form.price.data
+        vehicle.type = form.type.data
+        vehicle.description = form.description.data
+        vehicle.image_url = form.image_url.data or None
+        db.session.commit()
+        invalidate_pages('vehicles')
+        publish_resync()
+        flash('Vehicle updated successfully!', 'success')
+        return redirect(url_for('main.vehicle_detail', id=vehicle.id))
+    return render_template('edit.html', form=form, vehicle=vehicle, title='Edit Vehicle', now=datetime.now())
+
+@bp.route('/vehicle/delete/<int:id>', methods=['POST'])
+def delete_vehicle(id):
+    vehicle = Vehicle.query.get_or_404(id)
+    db.session.delete(vehicle)
+    db.session.commit()
+    invalidate_pages('vehicles', 'sales')
+    publish_resync()
+    flash('Vehicle deleted successfully!', 'success')
+    return redirect(url_for('main.index'))
+
+@bp.route('/vehicle/import', methods=['GET', 'POST'])
+def import_vehicles_page():
+    from forms import VehicleImportForm
+    form = VehicleImportForm()
+    if form.validate_on_submit():
+        try:
+            report = import_vehicles(decode_lines(form.file.data.stream))
+        except ValueError as e:
+            form.file.errors.append(str(e))
+        else:
+            invalidate_pages('vehicles')
+            publish_resync()
+            flash(f'Imported {report.imported} vehicles ({report.rejected} rows rejected).',
+                  'success' if not report.rejected else 'error')
+            return render_template('import_report.html', report=report, now=datetime.now())
+    return render_template('create.html', form=form, title='Import Vehicles', now=datetime.now())
+
+@bp.route('/api/vehicles/import', methods=['POST'])
+def api_import_vehicles():
+    # A multipart upload in the 'file' field, or the CSV itself as a text/csv body
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    try:
+        report = import_vehicles(decode_lines(stream), report=ImportReport(
+            max_errors=current_app.config['CSV_IMPORT_MAX_ERRORS']))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    invalidate_pages('vehicles')
+    publish_resync()
+    return jsonify(report.to_dict())
+
+@bp.route('/export/<table>.csv')
+@replica_reads
+def export_csv(table):
+    if table not in EXPORT_COLUMNS:
+        abort(404)
+    # Streamed in chunks from a server-side cursor: the table is never held in memory
+    columns, query = export_rows(table)
+    response = Response(stream_with_context(stream_csv(query, columns)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename={table}.csv'
+    return response
+
+@bp.route('/api/reports/<kind>', methods=['POST'])
+def api_enqueue_report(kind):
+    if kind not in REPORTS:
+        abort(404)
+    # Parameters as a JSON object, or as form fields / query arguments
+    args = request.get_json(silent=True)
+    if args is None:
+        args = request.values.to_dict()
+    if not isinstance(args, dict):
+        return jsonify({'error': 'Expected a JSON object of report parameters'}), 400
+    try:
+        job = enqueue_report(kind, args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    status_url = url_for('.api_report_status', job_id=job.id)
+    return jsonify(dict(report_status(job), status_url=status_url)), 202, {'Location': status_url}
+
+@bp.route('/api/reports/<int:job_id>')
+def api_report_status(job_id):
+    job = db.session.get(ReportJob, job_id) or abort(404)
+    status = report_status(job)
+    if job.status == 'done':
+        status['download_url'] = url_for('.download_report', job_id=job.id)
+    return jsonify(status)
+
+@bp.route('/api/reports/<int:job_id>/download')
+def download_report(job_id):
+    job = db.session.get(ReportJob, job_id) or abort(404)
+    if job.status != 'done':
+        return jsonify({'error': f'The report is {job.status}', 'status_url': url_for('.api_report_status', job_id=job.id)}), 409
+    path = report_runner().result_path(job)
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype='text/csv', as_attachment=True, download_name=f'{job.kind}-{job.id}.csv')
+
+@bp.route('/salesperson/create', methods=['GET', 'POST'])
+def create_salesperson():
+    from forms import SalespersonForm
+    form = SalespersonForm()
+    if form.validate_on_submit():
+        salesperson = Salesperson(
+            first_name=form.first_name.data,
+            last_name=form.last_name.data,
+            email=form.email.data,
+            phone=form.phone.data,
+            hire_date=datetime.strptime(form.hire_date.data, '%Y-%m-%d').date()
+        )
+        db.session.add(salesperson)
+        db.session.commit()
+        publish_resync()
+        flash('Salesperson created successfully!', 'success')
+        return redirect(url_for('main.stats'))
+    return render_template('create.html', form=form, title='Add Salesperson', now=datetime.now())
+
+@bp.route('/customer/create', methods=['GET', 'POST'])
+def create_customer():
+    from forms import CustomerForm
+    form = CustomerForm()
+    if form.validate_on_submit():
+        customer = Customer(
+            first_name=form.first_name.data,
+            last_name=form.last_name.data,
+            email=form.email.data,
+            phone=form.phone.data,
+            address=form.address.data
+        )
+        db.session.add(customer)
+        db.session.commit()
+        publish_resync()
+        flash('Customer created successfully!', 'success')
+        return redirect(url_for('main.stats'))
+    return render_template('create.html', form=form, title='Add Customer', now=datetime.now())
+
+@bp.route('/sale/create', methods=['GET', 'POST'])
+def create_sale():
+    from forms import SaleForm
+    form = SaleForm()
+    # Default the sale date to today on a new form, without overriding a submitted date
+    if not form.is_submitted():
+        form.sale_date.data = datetime.now().strftime('%Y-%m-%d')
+
+    # Hook the id inputs up to their typeahead endpoints
+    form.vehicle_id.render_kw = {'data-lookup': url_for('main.lookup_vehicles')}
+    form.customer_id.render_kw = {'data-lookup': url_for('main.lookup_customers')}
+    form.salesperson_id.render_kw = {'data-lookup': url_for('main.lookup_salespeople')}
+
+    if form.validate_on_submit():
+        sale = Sale(
+            vehicle_id=form.vehicle_id.data,
+            customer_id=form.customer_id.data,
+            salesperson_id=form.salesperson_id.data,
+            sale_date=datetime.strptime(form.sale_date.data, '%Y-%m-%d').date(),
+            sale_price=form.sale_price.data
+        )
+        db.session.add(sale)
+        db.session.commit()
+        invalidate_pages('sales')
+        publish_sale(sale)
+        flash('Sale created successfully!', 'success')
+        return redirect(url_for('main.stats'))
+    return render_template('create.html', form=form, title='Add Sale', now=datetime.now())
+
+@bp.route('/api/sales/batch', methods=['POST'])
+def api_sales_batch():
+    # [{vehicle_id, customer_id, salesperson_id, sale_date, sale_price}, ...] or {"sales": [...]}:
+    # validated as a whole, foreign keys checked in one query, inserted in one transaction
+    try:
+        rows = parse_sales(request.get_json(silent=True), current_app.config['SALES_BATCH_MAX_SIZE'])
+        check_references(rows)
+        save_sales(rows)
+    except SaleBatchError as e:
+        return jsonify({'error': str(e), 'errors': e.errors}), 422 if e.errors else 400
+    except IntegrityError:
+        # A referenced row was deleted between the check and the insert
+        return jsonify({'error': 'The batch conflicts with a concurrent change; retry it'}), 409
+    g.db_wrote = True
+    invalidate_pages('sales')
+    publish_resync()
+    return jsonify({'inserted': len(rows)}), 201
+
+def dashboard_data(date_range, allow_stale=True):
+    # Dashboard numbers come from the rollup tables kept in sync on every write. Concurrent
+    # requests for the same range share one computation and recent results are reused; the
+    # key is the query string as of today, since the presets count back from today. The live
+    # cursor is taken first, so the page receives every sale event its numbers may have missed
+    key = ('stats', date.today(), tuple(sorted(request.args.items(multi=True))))
+    return shared_result(key, DASHBOARD_TABLES,
+                         lambda: {'live_cursor': live_feed().cursor(), **dashboard_totals(), **range_stats(date_range)},
+                         allow_stale=allow_stale)
+
+@bp.route('/stats')
+@replica_reads
+def stats():
+    # ?range=30d|90d|ytd|12m|all or ?from=YYYY-MM-DD&to=YYYY-MM-DD, with an optional ?bucket=day|week|month|year
+    try:
+        date_range = parse_range(request.args)
+    except ValueError as e:
+        flash(f'Invalid date range: {e}', 'error')
+        date_range = parse_range({})
+    data = dashboard_data(date_range)
+    return render_template('stats.html', now=datetime.now(), presets=PRESETS, buckets=BUCKETS,
+                           dashboard=dashboard_state(data), **data)
+
+@bp.route('/api/stats')
+@replica_reads
+def api_stats():
+    # The dashboard numbers as JSON, never stale: what an open dashboard reloads on `resync`
+    try:
+        date_range = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date range: {e}'}), 400
+    return jsonify(dashboard_state(dashboard_data(date_range, allow_stale=False)))
+
+@bp.route('/api/stats/events')
+def stats_events():
+    # Server-sent events for open dashboards: `sale` for each sale added through the form,
+    # `resync` when the numbers changed in a way only a reload describes. Browsers reconnect
+    # with Last-Event-ID and are replayed what they missed
+    feed = live_feed()
+    if feed.full():
+        return jsonify({'error': 'Too many open dashboards; retry later'}), 503, {'Retry-After': '30'}
+    after = request.headers.get('Last-Event-ID') or request.args.get('after')
+    response = Response(stream_with_context(feed.stream(after)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/api/vehicles')
+@replica_reads
+@conditional('vehicles')
+def api_vehicles():
+    # ?fields=id,make,model selects only those columns
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # ?after=<id>&limit=<n> pages through the vehicles in id order
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, current_app.config['API_MAX_LIMIT']))
+    # Same facet filters as the inventory page
+    filters = VehicleFilters.from_args(request.args)
+    query = vehicle_rows_query(fields, after=after, limit=limit, filters=filters)
+
+    # ?format=ndjson streams one vehicle per line instead of building the whole list
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        return Response(stream_with_context(stream_ndjson(query, fields)), mimetype='application/x-ndjson')
+
+    vehicles = [row_to_dict(row, fields) for row in query.all()]
+    response = jsonify(vehicles)
+    if limit is not None and len(vehicles) == limit:
+        next_url = url_for('main.api_vehicles', after=vehicles[-1]['id'], limit=limit,
+                           fields=request.args.get('fields'), _external=True, **filters.to_args())
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+# Bulk delete, e.g. DELETE /api/vehicles?year=2012: one DELETE for every vehicle matching the
+# /api/vehicles filters, with their sales removed by the database's ON DELETE CASCADE
+@bp.route('/api/vehicles', methods=['DELETE'])
+def api_delete_vehicles():
+    filters = VehicleFilters.from_args(request.args)
+    if not filters:
+        return jsonify({'error': 'Give at least one filter (type, make, year, year_min, year_max, '
+                                 'price_min, price_max); refusing to delete every vehicle'}), 400
+    try:
+        deleted = delete_vehicles(db.session.connection(), *filters.predicates(Vehicle).values())
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    g.db_wrote = True
+    invalidate_pages('vehicles', 'sales')
+    publish_resync()
+    return jsonify({'deleted': deleted})
+
+# Facet counts for the inventory filters: ?search= plus the /api/vehicles filters.
+# Each facet is counted with every other filter applied, in one query.
+@bp.route('/api/vehicles/facets')
+@replica_reads
+@conditional('vehicles')
+def api_vehicle_facets():
+    search = request.args.get('search', '')
+    query = search_vehicles(Vehicle.query, Vehicle, search, ranked=False) if search else Vehicle.query
+    filters = VehicleFilters.from_args(request.args)
+    return jsonify(vehicle_facets(query, Vehicle, filters, searched=bool(search), versions=g.get('data_versions')))
+
+# Typeahead lookups for the sale form: ?q=<prefix>&limit=<n> -> [{id, label}]
+@bp.route('/api/lookup/vehicles')
+def lookup_vehicles():
+    return jsonify(lookup(Vehicle, request.args.get('q'), ('year', 'make', 'model'),
+                          request.args.get('limit', DEFAULT_LOOKUP_LIMIT, type=int)))
+
+@bp.route('/api/lookup/customers')
+def lookup_customers():
+    # Served by the in-memory autocomplete index once it is loaded
+    return jsonify(autocomplete().search(request.args.get('q'), ('customer',),
+                                         request.args.get('limit', DEFAULT_LOOKUP_LIMIT, type=int))['customer'])
+
+@bp.route('/api/lookup/salespeople')
+def lookup_salespeople():
+    return jsonify(lookup(Salesperson, request.args.get('q'), ('first_name', 'last_name'),
+                          request.args.get('limit', DEFAULT_LOOKUP_LIMIT, type=int)))
+
+# Suggestions while typing: ?q=<prefix> with optional repeated ?kind=make|model|customer and
+# ?limit=<n> per kind. Answered from the per-worker prefix index (see database/autocomplete.py)
+@bp.route('/api/autocomplete')
+def api_autocomplete():
+    kinds = request.args.getlist('kind') or AUTOCOMPLETE_KINDS
+    unknown = [kind for kind in kinds if kind not in AUTOCOMPLETE_KINDS]
+    if unknown:
+        return jsonify({'error': f"Unknown kind '{unknown[0]}'; use {', '.join(AUTOCOMPLETE_KINDS)}"}), 400
+    return jsonify(autocomplete().search(request.args.get('q'), tuple(kinds),
+                                         request.args.get('limit', DEFAULT_LOOKUP_LIMIT, type=int)))
+
+# Prometheus scrape target: per-route latency and SQL totals, connection pool counters,
+# checkout wait times, page cache hits, sale batch group commits, /stats result sharing,
+# open dashboard event streams and autocomplete lookups
+@bp.route('/metrics')
+def metrics():
+    body = request_metrics.render() + pool_metrics.render(db.engine.pool)
+    if page_cache() is not None:
+        body += page_cache().render_metrics()
+    if 'sale_group_commit' in current_app.extensions:
+        body += current_app.extensions['sale_group_commit'].render_metrics()
+    body += result_cache().render_metrics() + live_feed().render_metrics() + autocomplete().render_metrics()
+    body += report_runner().render_metrics()
+    return Response(body, mimetype='text/plain; version=0.0.4')
@@ -2,6 +2,8 @@
 import os
 import psycopg2
 from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from database.migrations.index import run_migrations
 
 def setup_database():
     """Create the PostgreSQL database and tables if they don't exist"""
@@ -52,6 +54,7 @@ def setup_database():
 
         # Execute the SQL commands
         cursor.execute(sql)
+        conn.commit()
         print("Database tables created successfully!")
 
         # Close the connection
@@ -60,6 +63,13 @@ def setup_database():
 
     except Exception as e:
         print(f"Error setting up database: {e}")
+        return
+
+    # Bring an existing schema up to date (indexes added after index.sql was first run)
+    engine = create_engine(db_url)
+    applied = run_migrations(engine)
+    print(f"{len(applied)} migration(s) applied.")
+    engine.dispose()
 
 if __name__ == '__main__':
     setup_database()
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from commands import init_database
+from index import create_app
+from models import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The app on a seeded SQLite file, failing any request that goes over the SQL statement budget"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'WTF_CSRF_ENABLED': False,
+        'QUERY_COUNT_MODE': 'raise',
+        'PAGE_CACHE_BACKEND': 'none',
+        'REPORT_WORKERS': 0,
+        'REPORTS_DIR': str(tmp_path / 'reports'),
+    })
+    with app.app_context():
+        init_database()
+        db.session.remove()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def statements(app):
+    """statements() collects the SQL run inside its block: `with statements() as seen: ...`"""
+    @contextmanager
+    def capture():
+        seen = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            seen.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield seen
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+    return capture
@@ -0,0 +1,44 @@
+import json
+import re
+from urllib.parse import urlsplit
+from models import db, Vehicle
+
+
+def next_link(response):
+    match = re.match(r'<([^>]+)>; rel="next"', response.headers.get('Link', ''))
+    if match is None:
+        return None
+    url = urlsplit(match.group(1))
+    return f'{url.path}?{url.query}'
+
+
+def test_filtered_limited_pages_follow_the_next_cursor(app, client):
+    with app.app_context():
+        expected = [id for id, in db.session.query(Vehicle.id).filter(Vehicle.type == 'suv').order_by(Vehicle.id)]
+    assert len(expected) > 2
+
+    first = client.get('/api/vehicles?limit=2&type=suv&fields=id,type')
+    assert first.status_code == 200
+    page = first.get_json()
+    assert len(page) == 2
+    assert {row['type'] for row in page} == {'suv'}
+    url = next_link(first)
+    assert 'type=suv' in url and 'limit=2' in url and f'after={page[-1]["id"]}' in url
+
+    seen = [row['id'] for row in page]
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        rows = response.get_json()
+        assert {row['type'] for row in rows} <= {'suv'}
+        seen += [row['id'] for row in rows]
+        url = next_link(response)
+    assert seen == expected
+
+
+def test_filtered_limited_ndjson(app, client):
+    response = client.get('/api/vehicles?limit=3&type=sedan&format=ndjson')
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert len(rows) == 3
+    assert {row['type'] for row in rows} == {'sedan'}
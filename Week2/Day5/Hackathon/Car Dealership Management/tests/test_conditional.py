@@ -0,0 +1,40 @@
+import pytest
+
+
+@pytest.mark.parametrize('url', ['/', '/vehicle/1', '/api/vehicles?limit=5'])
+def test_matching_etag_answers_304_with_only_the_version_lookup(client, statements, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    with statements() as seen:
+        response = client.get(url, headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+    assert len(seen) == 1
+    assert 'data_versions' in seen[0]
+
+
+def test_write_changes_the_etag(client):
+    etag = client.get('/vehicle/1').headers['ETag']
+    client.post('/vehicle/edit/1', data={'make': 'Toyota', 'model': 'Camry', 'year': 2023, 'price': '25000',
+                                         'type': 'sedan', 'description': '', 'image_url': ''},
+                follow_redirects=True)
+    response = client.get('/vehicle/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_if_modified_since_alone_never_answers_304(client):
+    first = client.get('/vehicle/1')
+    # Even unchanged: HTTP dates cannot tell a write within the same second from none
+    assert client.get('/vehicle/1', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 200
+    client.post('/vehicle/edit/1', data={'make': 'Toyota', 'model': 'Camry', 'year': 2023, 'price': '25000',
+                                         'type': 'sedan', 'description': '', 'image_url': ''},
+                follow_redirects=True)
+    # Most likely still within the same second as the first response
+    response = client.get('/vehicle/1', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != first.headers['ETag']
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+import pytest
+from database import counts
+from database.counts import count_rows
+from models import db, Vehicle
+
+SEEDED = 15
+ADDED = 100
+
+
+@pytest.fixture
+def coupes(app):
+    """ADDED vehicles after the seeded ones, every fourth a coupe (the seed has none)"""
+    with app.app_context():
+        db.session.add_all(Vehicle(make='Mazda', model='MX-5', year=2024, price=30000,
+                                   type='coupe' if n % 4 == 0 else 'sedan') for n in range(ADDED))
+        db.session.commit()
+        db.session.remove()
+    return ADDED // 4
+
+
+def coupe_query():
+    return Vehicle.query.filter(Vehicle.type == 'coupe')
+
+
+def test_whole_table_reads_the_row_counter(app, coupes):
+    with app.app_context():
+        total = count_rows(Vehicle.query, Vehicle, whole_table=True)
+    assert (total, total.exact, total.method) == (SEEDED + ADDED, True, 'counter')
+
+
+def test_capped_count_under_the_threshold_is_exact(app, coupes):
+    with app.app_context():
+        total = count_rows(coupe_query(), Vehicle, threshold=coupes)
+    assert (total, total.exact, total.method) == (coupes, True, 'exact')
+
+
+def test_planner_estimate_past_the_threshold(app, coupes, monkeypatch):
+    postgres = SimpleNamespace(dialect=SimpleNamespace(name='postgresql'))
+    with app.app_context():
+        db.session.query(Vehicle.id).first()  # bind the session before get_engine is replaced
+        monkeypatch.setattr(db, 'get_engine', lambda *args, **kwargs: postgres)
+        monkeypatch.setattr(counts, 'planner_estimate', lambda query: 1234)
+        total = count_rows(coupe_query(), Vehicle, threshold=5)
+    # Estimates are rounded to two significant digits
+    assert (total, total.exact, total.method) == (1200, False, 'planner')
+
+
+def test_sample_estimate_past_the_threshold(app, coupes):
+    with app.app_context():
+        total = count_rows(coupe_query(), Vehicle, threshold=5)
+    # The first 6 coupes are ids 16, 20, ... 36: 6 matches in the first 36 of 115 rows
+    assert (total, total.exact, total.method) == (int((SEEDED + ADDED) * 6 / 36), False, 'sample')
@@ -0,0 +1,40 @@
+import pytest
+from benchmarks.explain_indexes import INDEXES, QUERIES, explain
+from database.migrations.index import run_migrations
+from models import db
+
+# The index each query in benchmarks/explain_indexes.py should be answered from
+EXPECTED = {
+    'sales of one vehicle': 'ix_sales_vehicle_id',
+    'sales of one customer': 'ix_sales_customer_id',
+    'sales per salesperson': 'ix_sales_salesperson_id',
+    # Either sale_date index serves the range; the covering (sale_date, vehicle_id) one is also fine
+    'sales in a date range': 'ix_sales_sale_date',
+    'vehicles of one type': 'ix_vehicles_type',
+}
+
+
+def plan(name):
+    return ' | '.join(explain(QUERIES[name]))
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED))
+def test_query_plan_uses_its_index(app, name):
+    with app.app_context():
+        assert EXPECTED[name] in plan(name)
+
+
+def test_migrations_add_the_indexes_the_plans_need(app):
+    with app.app_context():
+        for index in INDEXES + ('ix_sales_sale_date_vehicle_id',):
+            db.session.execute(db.text(f'DROP INDEX IF EXISTS {index}'))
+        db.session.execute(db.text('DROP TABLE IF EXISTS schema_migrations'))
+        db.session.commit()
+        before = {name: plan(name) for name in EXPECTED}
+        db.session.remove()
+
+        run_migrations(db.engine)
+
+        for name, index in EXPECTED.items():
+            assert index not in before[name]
+            assert index in plan(name)
@@ -0,0 +1,29 @@
+import re
+import pytest
+from web.instrumentation import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def reported_statements(response):
+    return int(re.search(r'db;desc="(\d+) queries"', response.headers['Server-Timing']).group(1))
+
+
+@pytest.mark.parametrize('mode', ['raise', 'off'])
+def test_request_metrics_count_each_statement_once(app, client, statements, mode):
+    app.config['QUERY_COUNT_MODE'] = mode
+    with statements() as seen:
+        first = client.get('/vehicle/1')
+        second = client.get('/api/vehicles?limit=3')
+    assert reported_statements(first) + reported_statements(second) == len(seen)
+
+    body = client.get('/metrics').data.decode()
+    route_totals = {route: int(count) for route, count in re.findall(
+        r'http_request_db_statements_total\{method="GET",route="([^"]+)"\} (\d+)', body)}
+    assert route_totals['/vehicle/<int:id>'] == reported_statements(first)
+    assert route_totals['/api/vehicles'] == reported_statements(second)
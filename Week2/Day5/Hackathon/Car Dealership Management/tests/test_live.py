@@ -0,0 +1,46 @@
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, text
+from models import db
+from web.live import live_feed
+
+
+def events(app):
+    return [frame.decode().split('\n')[1] for _, frame in app.extensions['live_feed']._events]
+
+
+@pytest.mark.parametrize('url, data', [
+    ('/vehicle/create', {'make': 'Kia', 'model': 'Soul', 'year': 2024, 'price': '20000', 'type': 'suv',
+                         'description': '', 'image_url': ''}),
+    ('/vehicle/edit/1', {'make': 'Toyota', 'model': 'Camry', 'year': 2023, 'price': '25000', 'type': 'suv',
+                         'description': '', 'image_url': ''}),
+    ('/customer/create', {'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com',
+                          'phone': '555-0199', 'address': '1 Engine Way'}),
+    ('/salesperson/create', {'first_name': 'Alan', 'last_name': 'Turing', 'email': 'alan@example.com',
+                             'phone': '555-0198', 'hire_date': date(2024, 1, 2).isoformat()}),
+])
+def test_dashboard_writes_publish_a_resync(app, client, url, data):
+    assert client.post(url, data=data).status_code == 302
+    assert events(app) == ['event: resync']
+
+
+def test_vehicle_import_publishes_a_resync(app, client):
+    csv = 'make,model,year,price,type\nKia,Soul,2024,20000,suv\n'
+    response = client.post('/api/vehicles/import', data=csv, content_type='text/csv')
+    assert response.get_json()['imported'] == 1
+    assert events(app) == ['event: resync']
+
+
+def test_poll_notices_writes_to_any_dashboard_table(app, tmp_path):
+    with app.app_context():
+        feed = live_feed()
+        feed.heartbeat = 0
+        feed.cursor()
+        # A customer added by another process: only the customers counter moves
+        other = create_engine(f'sqlite:///{tmp_path / "test.db"}')
+        with other.begin() as connection:
+            connection.execute(text("UPDATE data_versions SET version = version + 1 WHERE table_name = 'customers'"))
+        other.dispose()
+        feed._poll_version()
+        db.session.remove()
+    assert events(app) == ['event: resync']
@@ -0,0 +1,42 @@
+import os
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from database.migrations.index import MIGRATIONS_DIR, Migration, applied_migrations, apply_migration
+from database.pagination import keyset_paginate
+from models import db, Vehicle
+
+
+@pytest.mark.parametrize('sort', ['newest', 'price'])
+def test_keyset_pages_reach_every_vehicle_once(app, sort):
+    with app.app_context():
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(Vehicle.query, Vehicle, sort, cursor, per_page=4)
+            seen += [vehicle.id for vehicle in page.items]
+            if not page.next_cursor:
+                break
+            cursor = page.next_cursor
+        assert sorted(seen) == [vehicle_id for vehicle_id, in db.session.query(Vehicle.id).order_by(Vehicle.id)]
+
+
+def test_vehicle_without_created_at_is_rejected(app):
+    with app.app_context():
+        with pytest.raises(IntegrityError):
+            db.session.execute(Vehicle.__table__.insert().values(make='Kia', model='Soul', year=2024, price=20000,
+                                                                 type='suv', created_at=None))
+        db.session.rollback()
+
+
+def test_migration_dates_vehicles_without_created_at(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "old.db"}')
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE vehicles (id INTEGER PRIMARY KEY, created_at TIMESTAMP)'))
+        conn.execute(text("INSERT INTO vehicles (id, created_at) VALUES (1, NULL), (2, '2023-05-01 09:30:00'), "
+                          "(3, '2024-01-01 00:00:00'), (4, NULL)"))
+    applied_migrations(engine)
+    apply_migration(engine, Migration(os.path.join(MIGRATIONS_DIR, '0006_vehicles_created_at_not_null.sql')))
+    with engine.connect() as conn:
+        dates = dict(conn.execute(text('SELECT id, created_at FROM vehicles')).all())
+    engine.dispose()
+    assert dates[1] == dates[4] == '2023-05-01 09:30:00'
@@ -0,0 +1,69 @@
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine
+from database.pool import MeteredQueuePool, PoolTimeout
+
+TIMEOUT = 0.5
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "pool.db"}', poolclass=MeteredQueuePool, pool_size=1,
+                           max_overflow=0, pool_timeout=TIMEOUT, connect_args={'check_same_thread': False})
+    yield engine
+    engine.dispose()
+
+
+def timed_checkout(engine, results):
+    started = time.perf_counter()
+    try:
+        engine.connect().close()
+        results.append(('ok', time.perf_counter() - started))
+    except PoolTimeout:
+        results.append(('timeout', time.perf_counter() - started))
+
+
+def test_checkout_queued_behind_another_waiter_times_out_on_time(engine):
+    held = engine.connect()
+    results = []
+    try:
+        first = threading.Thread(target=timed_checkout, args=(engine, results))
+        first.start()
+        time.sleep(0.05)
+        # Queued at the gate behind `first`: its wait there counts against the same timeout
+        timed_checkout(engine, results)
+        first.join()
+    finally:
+        held.close()
+    assert [outcome for outcome, _ in results] == ['timeout', 'timeout']
+    assert all(elapsed < TIMEOUT * 1.4 for _, elapsed in results), results
+    # The shortened wait handed to QueuePool does not outlive the checkout
+    assert engine.pool.timeout() == TIMEOUT
+
+
+def test_disposed_pool_keeps_the_configured_timeout(engine):
+    held = engine.connect()
+    results = []
+    try:
+        waiter = threading.Thread(target=timed_checkout, args=(engine, results))
+        waiter.start()
+        time.sleep(0.1)
+        # Recreated while the waiter's QueuePool wait runs on what is left of its timeout
+        engine.dispose()
+        waiter.join()
+    finally:
+        held.close()
+    assert engine.pool.timeout() == TIMEOUT
+
+
+def test_returned_connection_is_handed_to_the_waiter(engine):
+    held = engine.connect()
+    results = []
+    waiter = threading.Thread(target=timed_checkout, args=(engine, results))
+    waiter.start()
+    time.sleep(0.1)
+    held.close()
+    waiter.join()
+    assert results[0][0] == 'ok'
+    assert results[0][1] < TIMEOUT
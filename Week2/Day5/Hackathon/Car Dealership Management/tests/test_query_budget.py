@@ -0,0 +1,73 @@
+from datetime import date, datetime, timedelta
+import pytest
+from flask import render_template
+from database.reports import REPORTS
+from models import db, Vehicle, Customer, Salesperson, Sale
+from routes import SALES_HISTORY_ROWS
+from web.query_counter import TooManyQueries
+
+SALES = 120
+
+
+@pytest.fixture
+def busy_vehicle(app):
+    """Vehicle 1 with SALES sales, each to a different customer by a different salesperson"""
+    with app.app_context():
+        for n in range(SALES):
+            customer = Customer(first_name='Buyer', last_name=str(n), email=f'buyer{n}@example.com',
+                                phone='555-0000', address='1 Test St')
+            person = Salesperson(first_name='Seller', last_name=str(n), email=f'seller{n}@example.com',
+                                 phone='555-0000', hire_date=date(2020, 1, 1))
+            db.session.add(Sale(vehicle_id=1, customer=customer, salesperson=person,
+                                sale_date=date(2024, 1, 1) + timedelta(days=n), sale_price=1000 + n))
+        db.session.commit()
+        db.session.remove()
+    return 1
+
+
+def test_vehicle_page_with_many_sales_stays_within_budget(app, client, statements, busy_vehicle):
+    # The app fixture runs in QUERY_COUNT_MODE=raise: one statement over QUERY_COUNT_LIMIT fails the request
+    with statements() as few:
+        assert client.get('/vehicle/2').status_code == 200
+    with statements() as many:
+        response = client.get(f'/vehicle/{busy_vehicle}')
+    assert response.status_code == 200
+    # Only the newest sales are listed, with a link to the full history
+    assert response.data.count(b'Buyer ') == SALES_HISTORY_ROWS
+    assert f'Buyer {SALES - 1}'.encode() in response.data and b'Buyer 0<' not in response.data
+    assert f'most recent of {SALES + 1} sales'.encode() in response.data
+    # Eager loading: the statement count does not grow with the number of sales
+    assert len(many) == len(few) <= app.config['QUERY_COUNT_LIMIT']
+    assert not [statement for statement in many if 'sales' in statement and 'LIMIT' not in statement
+                and 'rollup_sales_by_vehicle' not in statement]
+
+
+def test_lazy_loading_the_sales_history_fails_the_budget(app, client, statements, busy_vehicle):
+    # The same page without the route's joined loading issues a query per sale and is caught
+    with statements() as eager:
+        client.get(f'/vehicle/{busy_vehicle}')
+    app.config['QUERY_COUNT_LIMIT'] = len(eager)
+    with app.test_request_context(f'/vehicle/{busy_vehicle}'):
+        app.preprocess_request()
+        vehicle = db.session.get(Vehicle, busy_vehicle)
+        recent_sales = Sale.query.filter_by(vehicle_id=busy_vehicle).order_by(Sale.sale_date.desc(), Sale.id.desc()) \
+            .limit(SALES_HISTORY_ROWS).all()
+        with pytest.raises(TooManyQueries):
+            render_template('details.html', vehicle=vehicle, recent_sales=recent_sales, sale_count=SALES + 1,
+                            now=datetime.now())
+
+
+def test_full_history_report_covers_every_sale_of_the_vehicle(app, client, busy_vehicle):
+    response = client.post('/api/reports/salesperson-sales', data={'vehicle_id': busy_vehicle})
+    assert response.status_code == 202
+    with app.app_context():
+        report = REPORTS['salesperson-sales']
+        params = report.parse({'vehicle_id': busy_vehicle})
+        assert report.total(params) == SALES + 1
+        assert {row[4] for row in report.batch(params, {}, 1000)} == {busy_vehicle}
+
+
+def test_raise_mode_fails_a_request_over_the_limit(app, client):
+    app.config['QUERY_COUNT_LIMIT'] = 1
+    with pytest.raises(TooManyQueries):
+        client.get('/vehicle/1')
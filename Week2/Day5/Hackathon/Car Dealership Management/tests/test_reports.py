@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+import pytest
+from database import reports
+from database.reports import Report, enqueue_report, report_runner
+from models import db, ReportJob
+
+
+def test_report_missing_a_method_cannot_be_created():
+    class RowsOnly(Report):
+        name = 'rows-only'
+
+        def parse(self, args):
+            return {}
+
+        def batch(self, params, state, limit):
+            return []
+
+    with pytest.raises(TypeError, match='total'):
+        RowsOnly()
+
+
+def test_job_queued_during_a_dispatcher_pass_starts_after_it_was_created(app, monkeypatch):
+    pass_started = datetime(2026, 1, 1, 12, 0, 0)
+
+    class Clock(datetime):
+        """utcnow() moves on a second per call, from the start of the pass"""
+        calls = 0
+
+        @classmethod
+        def utcnow(cls):
+            cls.calls += 1
+            return pass_started + timedelta(seconds=cls.calls - 1)
+
+    with app.app_context():
+        job = enqueue_report('inventory-aging', {})
+        # Queued after the pass read the clock for its lease expiry
+        job.created_at = pass_started + timedelta(milliseconds=500)
+        db.session.commit()
+        monkeypatch.setattr(reports, 'datetime', Clock)
+        runner = report_runner()
+        runner.workers = 1
+        runner._claim()
+        db.session.expire_all()
+        job = db.session.get(ReportJob, job.id)
+        assert job.status == 'running'
+        assert job.created_at <= job.started_at == job.heartbeat_at
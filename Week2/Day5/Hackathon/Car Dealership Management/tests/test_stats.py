@@ -0,0 +1,79 @@
+import re
+from datetime import date
+from html import escape
+import pytest
+from database.rollups import rebuild_rollups
+from models import db, Vehicle, Sale, DailyVehicleSales, MonthlyVehicleSales
+
+
+def test_seeded_dashboard_charts_every_sale(client):
+    stats = client.get('/api/stats').get_json()
+    assert stats['range']['preset'] == 'all'
+    assert stats['range_total'] == stats['total_sales'] == 15
+    assert sum(count for label, count in stats['sales_series']) == 15
+    assert stats['top_vehicles'] and stats['sales_by_person']
+    assert sum(count for first, last, count in stats['sales_by_person']) == 15
+
+
+def test_seeded_stats_page_shows_the_charts(client):
+    stats = client.get('/api/stats').get_json()
+    page = client.get('/stats').get_data(as_text=True)
+    model = stats['top_vehicles'][0][1]
+    first, last = stats['sales_by_person'][0][:2]
+    assert escape(model) in page and escape(f'{first} {last}') in page
+
+
+@pytest.fixture
+def spread_sales(app):
+    """Sales of the first five vehicles spread over 2022-2024, vehicle n selling n times a month"""
+    with app.app_context():
+        sales = [Sale(vehicle_id=vehicle_id, customer_id=1, salesperson_id=1, sale_date=date(year, month, 1 + n * 5),
+                      sale_price=10000)
+                 for year in (2022, 2024) for month in range(1, 13)
+                 for vehicle_id in range(1, 6) for n in range(vehicle_id)]
+        db.session.add_all(sales)
+        db.session.commit()
+        db.session.remove()
+
+
+def sold_between(start, end):
+    rows = db.session.query(Vehicle.model, db.func.count(Sale.id)).join(Sale) \
+        .filter(Sale.sale_date.between(start, end)).group_by(Vehicle.id, Vehicle.model).all()
+    return sorted(rows, key=lambda row: (-row[1], row[0]))[:5]
+
+
+@pytest.mark.parametrize('start, end', [
+    (date(2022, 1, 1), date(2024, 12, 31)),
+    (date(2022, 3, 10), date(2024, 2, 20)),
+    (date(2024, 5, 3), date(2024, 5, 18)),
+    (date(2024, 5, 2), date(2024, 5, 30)),
+    (date(2022, 1, 20), date(2024, 12, 10)),
+    (date(2022, 2, 3), date(2024, 11, 27)),
+    (date(2022, 7, 1), date(2023, 6, 30)),
+])
+def test_top_vehicles_in_a_range_come_from_the_rollups(app, client, statements, spread_sales, start, end):
+    with statements() as seen:
+        stats = client.get(f'/api/stats?from={start}&to={end}').get_json()
+    assert not [statement for statement in seen if re.search(r'\bsales\b', statement)]
+    with app.app_context():
+        expected = sold_between(start, end)
+        # Ties may come back in any order
+        assert sorted(((model, count) for make, model, count in stats['top_vehicles']),
+                      key=lambda row: (-row[1], row[0])) == expected
+        # Rebuilding the rollups from the sales gives the same answer as maintaining them
+        rebuild_rollups()
+        assert client.get(f'/api/stats?from={start}&to={end}').get_json()['top_vehicles'] == stats['top_vehicles']
+
+
+def test_deleting_a_vehicle_clears_its_range_buckets(app, client, spread_sales):
+    with app.app_context():
+        vehicle = db.session.get(Vehicle, 5)
+        model = vehicle.model
+        db.session.delete(vehicle)
+        db.session.commit()
+        assert not DailyVehicleSales.query.filter_by(vehicle_id=5).count()
+        assert not MonthlyVehicleSales.query.filter_by(vehicle_id=5).count()
+        db.session.remove()
+    stats = client.get('/api/stats?from=2022-01-01&to=2022-12-31').get_json()
+    assert [row[2] for row in stats['top_vehicles']] == [48, 36, 24, 12]
+    assert model not in [row[1] for row in stats['top_vehicles']]
@@ -0,0 +1 @@
+# Web helpers package
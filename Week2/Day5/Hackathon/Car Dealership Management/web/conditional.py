@@ -0,0 +1,42 @@
+import hashlib
+from functools import wraps
+from flask import g, request, session, make_response
+from database.versions import read_versions
+
+
+def conditional(*table_names):
+    """Answer GET requests with 304 Not Modified when the tables a view reads are unchanged.
+
+    The strong ETag is a hash of the request path, query string and the
+    version counters of `table_names`, so checking it costs one primary-key
+    lookup on data_versions. When it matches, the view never runs: no ORM
+    query and no template rendering. Last-Modified is sent for information
+    only; If-Modified-Since alone never gets a 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are part of the page, so always render them
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            versions, last_modified = read_versions(table_names)
+            g.data_versions = versions
+            stamp = ','.join(f'{name}:{versions[name]}' for name in table_names)
+            etag = hashlib.sha1(f'{request.full_path}|{stamp}'.encode()).hexdigest()
+
+            # Only the ETag, which carries the version counters, can answer 304: If-Modified-Since
+            # has whole seconds, so a second write within the same second would go unnoticed
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
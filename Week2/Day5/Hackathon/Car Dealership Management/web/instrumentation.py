@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the per-route latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RouteStats:
+    """Latency histogram and SQL totals for one (method, route) pair"""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.db_time = 0.0
+        self.statements = 0
+        self.statuses = {}
+
+    def observe(self, status, duration, statements, db_time):
+        self.count += 1
+        self.duration += duration
+        self.db_time += db_time
+        self.statements += statements
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class RequestMetrics:
+    """Process-wide per-route request metrics in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, method, route, status, duration, statements, db_time):
+        with self._lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[(method, route)] = RouteStats()
+            stats.observe(status, duration, statements, db_time)
+
+    def reset(self):
+        with self._lock:
+            self.routes = {}
+
+    def render(self):
+        requests = ['# HELP http_requests_total Requests handled, by route and status.',
+                    '# TYPE http_requests_total counter']
+        latency = ['# HELP http_request_duration_seconds Time to build the response, by route.',
+                   '# TYPE http_request_duration_seconds histogram']
+        statements = ['# HELP http_request_db_statements_total SQL statements issued, by route.',
+                      '# TYPE http_request_db_statements_total counter']
+        db_time = ['# HELP http_request_db_seconds_total Time spent in SQL statements, by route.',
+                   '# TYPE http_request_db_seconds_total counter']
+        with self._lock:
+            for (method, route), stats in sorted(self.routes.items()):
+                labels = f'method="{method}",route="{route}"'
+                for status, count in sorted(stats.statuses.items()):
+                    requests.append(f'http_requests_total{{{labels},status="{status}"}} {count}')
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += count
+                    latency.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                latency += [
+                    f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}',
+                    f'http_request_duration_seconds_sum{{{labels}}} {stats.duration:.6f}',
+                    f'http_request_duration_seconds_count{{{labels}}} {stats.count}',
+                ]
+                statements.append(f'http_request_db_statements_total{{{labels}}} {stats.statements}')
+                db_time.append(f'http_request_db_seconds_total{{{labels}}} {stats.db_time:.6f}')
+        return '\n'.join(requests + latency + statements + db_time) + '\n'
+
+
+metrics = RequestMetrics()
+
+
+def init_instrumentation(app):
+    """Time every request and its SQL, log slow requests and feed the /metrics histograms.
+
+    Requests slower than SLOW_REQUEST_MS are logged with their statement
+    count, database time and slowest statement. Every response also gets
+    a Server-Timing header so the split is visible in browser dev tools.
+    The SQL figures are the ones web.query_counter keeps per request.
+    """
+    app.config.setdefault('SLOW_REQUEST_MS', 500)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if 'request_started' not in g:
+            return response
+        duration = time.perf_counter() - g.request_started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        statements, db_time = g.get('query_count', 0), g.get('query_time', 0.0)
+        metrics.observe(request.method, route, response.status_code, duration, statements, db_time)
+        response.headers['Server-Timing'] = (f'db;desc="{statements} queries";dur={db_time * 1000:.1f}, '
+                                             f'app;dur={duration * 1000:.1f}')
+        if duration * 1000 >= app.config['SLOW_REQUEST_MS']:
+            slowest, statement = g.get('query_slowest', (0.0, None))
+            logger.warning("Slow request: %s %s -> %s in %.0f ms (%d SQL statements, %.0f ms in the database; "
+                           "slowest %.0f ms: %s)", request.method, request.full_path, response.status_code,
+                           duration * 1000, statements, db_time * 1000, slowest * 1000,
+                           ' '.join((statement or '-').split())[:500])
+        return response
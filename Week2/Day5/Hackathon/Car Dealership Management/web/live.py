@@ -0,0 +1,229 @@
+import json
+import secrets
+import threading
+import time
+from collections import deque
+from itertools import islice
+from flask import current_app
+from database.index import db
+from database.date_ranges import BUCKETS, bucket_label, bucket_start
+from database.versions import read_versions
+from models import Vehicle, Salesperson
+
+# How long a disconnected browser waits before reconnecting (milliseconds)
+RETRY_MS = 3000
+
+# Tables whose writes change the dashboard's numbers
+DASHBOARD_TABLES = ('vehicles', 'sales', 'customers', 'salespeople')
+
+
+def dashboard_version():
+    """A number that grows with every write to the dashboard's tables: the sum of their change counters"""
+    versions, _ = read_versions(DASHBOARD_TABLES)
+    return sum(versions.values())
+
+
+class LiveFeed:
+    """Server-sent events for the dashboard, fanned out from one shared buffer.
+
+    Every event is encoded once and kept in a ring of the last
+    `buffer_size`; a subscriber holds only its position in that ring, so
+    an idle one costs the same whatever is published. A subscriber that
+    falls further behind than the ring (or reconnects with an id it no
+    longer holds) is sent `resync` and should reload the numbers instead.
+    Event ids carry a per-process token, so an id from another worker is
+    recognised as unknown.
+
+    Writes committed by other processes never pass through this feed:
+    while anyone is listening, the version of the dashboard's tables is
+    checked once per heartbeat and a change nobody published here becomes
+    a `resync`.
+    """
+
+    def __init__(self, buffer_size, heartbeat, max_subscribers):
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.token = secrets.token_hex(4)
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=buffer_size)  # (sequence, encoded frame)
+        self.sequence = 0
+        self.subscribers = 0
+        self.published = {'sale': 0, 'resync': 0}
+        self.dropped = 0
+        self.rejected = 0
+        self._version = None  # dashboard version the published events account for
+        self._polled_at = 0.0
+
+    def cursor(self):
+        """Position for a page whose numbers are computed now: it should receive the events after it"""
+        if self._version is None:
+            self._note_version(dashboard_version())
+        return f'{self.token}:{self.sequence}'
+
+    def publish(self, name, data, version=None):
+        payload = json.dumps(data, separators=(',', ':'))
+        with self._condition:
+            self.sequence += 1
+            self._events.append((self.sequence, self._frame(self.sequence, name, payload)))
+            self.published[name] = self.published.get(name, 0) + 1
+            if version is not None:
+                self._version = max(self._version or 0, version)
+            self._condition.notify_all()
+
+    def full(self):
+        if self.subscribers < self.max_subscribers:
+            return False
+        with self._condition:
+            self.rejected += 1
+        return True
+
+    def stream(self, after=None):
+        """Encoded SSE frames for one subscriber, starting after the event id `after`.
+
+        Without `after` the stream starts at the current position; an id
+        that is malformed, from another process or already overwritten
+        starts it with a `resync`.
+        """
+        with self._condition:
+            self.subscribers += 1
+            position = self.sequence if after is None else self._position(after)
+        try:
+            yield f'retry: {RETRY_MS}\n\n'.encode()
+            if position is None:
+                with self._condition:
+                    position = self.sequence
+                    self.dropped += 1
+                yield self._frame(position, 'resync', '{}')
+            while True:
+                with self._condition:
+                    if self.sequence == position:
+                        self._condition.wait(self.heartbeat)
+                    oldest = self._events[0][0] if self._events else self.sequence + 1
+                    if position + 1 < oldest:
+                        # Fell behind the ring: skip what was lost and start over from the current numbers
+                        frames = [self._frame(self.sequence, 'resync', '{}')]
+                        self.dropped += 1
+                    else:
+                        frames = [frame for sequence, frame in islice(self._events, position + 1 - oldest, None)]
+                    position = self.sequence
+                if frames:
+                    yield b''.join(frames)
+                else:
+                    self._poll_version()
+                    # Keeps proxies from closing the idle connection and notices a gone client
+                    yield b': keepalive\n\n'
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+    def _position(self, event_id):
+        token, _, sequence = event_id.partition(':')
+        if token != self.token or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        oldest = self._events[0][0] if self._events else self.sequence + 1
+        return sequence if oldest - 1 <= sequence <= self.sequence else None
+
+    def _frame(self, sequence, name, payload):
+        return f'id: {self.token}:{sequence}\nevent: {name}\ndata: {payload}\n\n'.encode()
+
+    def _note_version(self, version):
+        with self._condition:
+            self._version = max(self._version or 0, version)
+
+    def _poll_version(self):
+        # One subscriber per heartbeat looks for writes by other processes
+        with self._condition:
+            now = time.monotonic()
+            if now - self._polled_at < self.heartbeat:
+                return
+            self._polled_at = now
+        try:
+            version = dashboard_version()
+        finally:
+            # An idle subscriber must not keep a pooled connection checked out
+            db.session.remove()
+        if self._version is not None and version > self._version:
+            self.publish('resync', {}, version)
+        else:
+            self._note_version(version)
+
+    def render_metrics(self):
+        lines = [
+            '# HELP live_subscribers Open dashboard event streams.',
+            '# TYPE live_subscribers gauge',
+            f'live_subscribers {self.subscribers}',
+            '# HELP live_events_total Dashboard events published, by event.',
+            '# TYPE live_events_total counter',
+        ]
+        lines += [f'live_events_total{{event="{name}"}} {count}' for name, count in sorted(self.published.items())]
+        lines += [
+            '# HELP live_resyncs_sent_total Subscribers sent a resync because they fell behind or reconnected too late.',
+            '# TYPE live_resyncs_sent_total counter',
+            f'live_resyncs_sent_total {self.dropped}',
+            '# HELP live_rejected_total Event stream requests refused at LIVE_MAX_SUBSCRIBERS.',
+            '# TYPE live_rejected_total counter',
+            f'live_rejected_total {self.rejected}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+def live_feed():
+    return current_app.extensions['live_feed']
+
+
+def sale_event(sale):
+    """The `sale` event: every dashboard count the sale falls into goes up by one.
+
+    `buckets` gives the chart label of its day, week, month and year, so
+    the page can find the bar to bump whatever bucket it shows.
+    """
+    vehicle = db.session.query(Vehicle.make, Vehicle.model).filter(Vehicle.id == sale.vehicle_id).one()
+    person = db.session.query(Salesperson.first_name, Salesperson.last_name) \
+        .filter(Salesperson.id == sale.salesperson_id).one()
+    return {
+        'id': sale.id,
+        'sale_date': sale.sale_date.isoformat(),
+        'sale_price': str(sale.sale_price),
+        'buckets': {bucket: bucket_label(bucket_start(sale.sale_date, bucket), bucket) for bucket in BUCKETS},
+        'vehicle': {'id': sale.vehicle_id, 'make': vehicle.make, 'model': vehicle.model},
+        'salesperson': {'id': sale.salesperson_id, 'first_name': person.first_name, 'last_name': person.last_name},
+    }
+
+
+def publish_sale(sale):
+    """Send a committed sale to every open dashboard"""
+    live_feed().publish('sale', sale_event(sale), dashboard_version())
+
+
+def publish_resync():
+    """Tell open dashboards to reload their numbers, after a write not described as deltas"""
+    live_feed().publish('resync', {}, dashboard_version())
+
+
+def dashboard_state(data):
+    """The /stats numbers as JSON: what the page patches in place and what a resync reloads"""
+    date_range = data['range']
+    return {
+        'total_vehicles': data['total_vehicles'],
+        'total_sales': data['total_sales'],
+        'total_customers': data['total_customers'],
+        'total_salespeople': data['total_salespeople'],
+        'vehicle_types': [list(row) for row in data['vehicle_types']],
+        'range': {'start': date_range.start.isoformat(), 'end': date_range.end.isoformat(),
+                  'bucket': date_range.bucket, 'preset': date_range.preset},
+        'range_total': data['range_total'],
+        'sales_series': [list(row) for row in data['sales_series']],
+        'top_vehicles': [list(row) for row in data['top_vehicles']],
+        'sales_by_person': [list(row) for row in data['sales_by_person']],
+        'live_cursor': data['live_cursor'],
+    }
+
+
+def init_live_feed(app):
+    """Set up the dashboard event feed from LIVE_BUFFER_EVENTS, LIVE_HEARTBEAT_SECONDS and LIVE_MAX_SUBSCRIBERS"""
+    app.config.setdefault('LIVE_BUFFER_EVENTS', 256)
+    app.config.setdefault('LIVE_HEARTBEAT_SECONDS', 15.0)
+    app.config.setdefault('LIVE_MAX_SUBSCRIBERS', 500)
+    app.extensions['live_feed'] = LiveFeed(app.config['LIVE_BUFFER_EVENTS'], app.config['LIVE_HEARTBEAT_SECONDS'],
+                                           app.config['LIVE_MAX_SUBSCRIBERS'])
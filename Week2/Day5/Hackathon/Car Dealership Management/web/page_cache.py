@@ -0,0 +1,215 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, request, session, make_response
+from database.versions import read_versions
+
+
+class MemoryBackend:
+    """In-process LRU bounded by total bytes, evicting the least recently used pages first"""
+
+    shared = False
+
+    def __init__(self, max_bytes, max_entry_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (body, tags, expires)
+        self.bytes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, body, tags):
+        size = len(key) + len(body)
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (body, tags, time.monotonic() + self.ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tag):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if tag in entry[1]]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        body, tags, expires = self._entries.pop(key)
+        self.bytes -= len(key) + len(body)
+
+
+class RedisBackend:
+    """Cache shared by every worker, e.g. PAGE_CACHE_BACKEND=redis://localhost:6379/0.
+
+    Requires the `redis` package. Entries expire after the TTL; keys
+    embed the data versions, so pages from before a write are simply
+    never asked for again and need no explicit delete.
+    """
+
+    shared = True
+
+    def __init__(self, url, max_entry_bytes, ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PAGE_CACHE_BACKEND is a redis:// URL but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        return self.client.get('page:' + key)
+
+    def set(self, key, body, tags):
+        if len(key) + len(body) <= self.max_entry_bytes:
+            self.client.set('page:' + key, body, ex=max(1, int(self.ttl)))
+
+    def invalidate(self, tag):
+        pass
+
+    def clear(self):
+        for key in self.client.scan_iter('page:*'):
+            self.client.delete(key)
+
+    def __len__(self):
+        return 0
+
+
+class PageCache:
+    """Rendered pages keyed on endpoint, query arguments and table versions"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        body = self.backend.get(key)
+        self._count(body is not None)
+        return body
+
+    def set(self, key, body, tags):
+        self.backend.set(key, body, tags)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.invalidate(tag)
+
+    def render_metrics(self):
+        return '\n'.join([
+            '# HELP page_cache_hits_total Pages served from the page cache.',
+            '# TYPE page_cache_hits_total counter',
+            f'page_cache_hits_total {self.hits}',
+            '# HELP page_cache_misses_total Pages rendered because they were not cached.',
+            '# TYPE page_cache_misses_total counter',
+            f'page_cache_misses_total {self.misses}',
+            '# HELP page_cache_evictions_total Pages evicted to stay under PAGE_CACHE_MAX_BYTES.',
+            '# TYPE page_cache_evictions_total counter',
+            f'page_cache_evictions_total {self.backend.evictions}',
+            '# HELP page_cache_bytes Bytes held by the in-process page cache.',
+            '# TYPE page_cache_bytes gauge',
+            f'page_cache_bytes {self.backend.bytes}',
+            '# HELP page_cache_entries Pages held by the in-process page cache.',
+            '# TYPE page_cache_entries gauge',
+            f'page_cache_entries {len(self.backend)}',
+        ]) + '\n'
+
+
+def page_cache():
+    """The app's PageCache, or None when PAGE_CACHE_BACKEND is 'none'"""
+    return current_app.extensions.get('page_cache')
+
+
+def invalidate_pages(*tags):
+    """Drop cached pages that read any of the tables `tags`; call after committing a write"""
+    cache = page_cache()
+    if cache is not None:
+        cache.invalidate(*tags)
+
+
+def cached_page(*table_names):
+    """Serve a GET view's rendered HTML from the page cache.
+
+    The key holds the endpoint, its view arguments, the sorted query
+    string (page, search term, sort, cursor) and the current versions of
+    `table_names`, so a write anywhere makes the old pages unreachable in
+    every worker. Pages are not cached or served while flash messages are
+    pending, since those are specific to one visitor.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = page_cache()
+            if cache is None or request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            # web.conditional has usually read the versions already in this request
+            versions = g.get('data_versions') or {}
+            if not all(name in versions for name in table_names):
+                versions = read_versions(table_names)[0]
+            stamp = ','.join(f'{name}:{versions[name]}' for name in table_names)
+            query = '&'.join(f'{name}={value}' for name, value in sorted(request.args.items(multi=True)))
+            raw = f'{request.endpoint}|{sorted(request.view_args.items())}|{query}|{stamp}'
+            key = hashlib.sha1(raw.encode()).hexdigest()
+
+            body = cache.get(key)
+            if body is not None:
+                return make_response(body)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == 'text/html' and not response.is_streamed:
+                cache.set(key, response.get_data(), frozenset(table_names))
+            return response
+        return wrapper
+    return decorator
+
+
+def init_page_cache(app):
+    """Set up the backend named by PAGE_CACHE_BACKEND: 'memory' (default), 'none' or a redis:// URL"""
+    app.config.setdefault('PAGE_CACHE_BACKEND', 'memory')
+    app.config.setdefault('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+    app.config.setdefault('PAGE_CACHE_MAX_ENTRY_BYTES', 1024 * 1024)
+    app.config.setdefault('PAGE_CACHE_TTL', 300)
+    backend = app.config['PAGE_CACHE_BACKEND']
+    if backend == 'none':
+        return
+    if backend.startswith('redis://') or backend.startswith('rediss://'):
+        backend = RedisBackend(backend, app.config['PAGE_CACHE_MAX_ENTRY_BYTES'], app.config['PAGE_CACHE_TTL'])
+    else:
+        backend = MemoryBackend(app.config['PAGE_CACHE_MAX_BYTES'], app.config['PAGE_CACHE_MAX_ENTRY_BYTES'],
+                                app.config['PAGE_CACHE_TTL'])
+    app.extensions['page_cache'] = PageCache(backend)
@@ -0,0 +1,72 @@
+import logging
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class TooManyQueries(Exception):
+    """Raised in 'raise' mode when one request issues more statements than allowed"""
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_count' in g:
+        g.query_count += 1
+        if g.query_mode == 'raise' and g.query_count > g.query_limit:
+            raise TooManyQueries(
+                f"{request.method} {request.path} issued more than {g.query_limit} SQL statements "
+                f"(possible N+1 query). Statement #{g.query_count}: {statement}"
+            )
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    if not has_request_context() or 'query_count' not in g:
+        return
+    elapsed = time.perf_counter() - started
+    g.query_time += elapsed
+    if elapsed > g.query_slowest[0]:
+        g.query_slowest = (elapsed, statement)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def init_query_counter(app):
+    """Count and time the SQL statements of each request, and flag requests above QUERY_COUNT_LIMIT.
+
+    The per-request totals (g.query_count, g.query_time and g.query_slowest)
+    also feed the request metrics in web.instrumentation. QUERY_COUNT_MODE
+    is 'log' (warn once per offending request), 'raise' (fail on the first
+    statement over the limit, for tests and CI) or 'off' (count only).
+    """
+    app.config.setdefault('QUERY_COUNT_LIMIT', 30)
+    app.config.setdefault('QUERY_COUNT_MODE', 'log')
+
+    for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                           ('after_cursor_execute', _after_cursor_execute),
+                           ('handle_error', _handle_error)):
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+
+    @app.before_request
+    def start_query_count():
+        g.query_count = 0
+        g.query_time = 0.0
+        g.query_slowest = (0.0, None)
+        g.query_limit = app.config['QUERY_COUNT_LIMIT']
+        g.query_mode = app.config['QUERY_COUNT_MODE']
+
+    @app.after_request
+    def report_query_count(response):
+        if 'query_count' in g and g.query_mode != 'off' and g.query_count > g.query_limit:
+            logger.warning("%s %s issued %d SQL statements (limit %d)",
+                           request.method, request.path, g.query_count, g.query_limit)
+        return response
@@ -0,0 +1,38 @@
+import time
+from functools import wraps
+from flask import current_app, g, session
+from database.index import db
+from database.routing import ReplicaMonitor
+
+
+def replica_reads(view):
+    """Serve the SELECTs of a read-only view from a replica within REPLICA_MAX_LAG.
+
+    Falls back to the primary when no replica is configured, when every
+    replica is too far behind or unreachable, and for REPLICA_STICKY_SECONDS
+    after the client's own last write, so users always see what they just saved.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        monitor = current_app.extensions.get('replica_monitor')
+        if monitor is not None and session.get('primary_until', 0) <= time.time():
+            g.db_replica = monitor.choose(db, current_app._get_current_object(),
+                                          current_app.config['REPLICA_MAX_LAG'])
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_replicas(app):
+    """Enable replica routing when SQLALCHEMY_BINDS has replica entries"""
+    app.config.setdefault('REPLICA_MAX_LAG', 10.0)
+    app.config.setdefault('REPLICA_LAG_CHECK_SECONDS', 5.0)
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 10.0)
+    if not app.config.get('SQLALCHEMY_BINDS'):
+        return
+    app.extensions['replica_monitor'] = ReplicaMonitor(app.config['REPLICA_LAG_CHECK_SECONDS'])
+
+    @app.after_request
+    def stick_to_primary(response):
+        if g.get('db_wrote'):
+            session['primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+        return response
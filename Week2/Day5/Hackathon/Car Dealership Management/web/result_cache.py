@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, session
+from database.versions import read_versions
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One computation in progress, waited on by every request that wants its result"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """Single-flight, stale-while-revalidate cache for expensive view results.
+
+    Concurrent requests for the same key share one computation: the first
+    computes, the rest wait for its result (or its exception). A result is
+    fresh for `ttl` seconds while the data versions it was computed from
+    are current. Once it is older, or the data changed, it is still served
+    for up to `stale_ttl` more seconds while a single background thread
+    recomputes it. Only past that does a request wait for a new result.
+    At most `max_entries` results are kept, least recently used evicted first.
+    """
+
+    def __init__(self, ttl, stale_ttl, max_entries=128):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, versions, computed_at)
+        self._flights = {}
+        self._refreshing = set()
+        self.hits = 0
+        self.stale = 0
+        self.coalesced = 0
+        self.computations = 0
+        self.refreshes = 0
+
+    def get(self, key, versions, compute, allow_stale=True):
+        """The result for `key`, computing it with compute() only when no usable one exists"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            value, entry_versions, computed_at = entry
+            age = time.monotonic() - computed_at
+            if entry_versions == versions and age < self.ttl:
+                with self._lock:
+                    self.hits += 1
+                return value
+            if allow_stale and age < self.ttl + self.stale_ttl:
+                with self._lock:
+                    self.stale += 1
+                self._refresh(key, versions, compute)
+                return value
+        return self._compute(key, versions, compute)
+
+    def _compute(self, key, versions, compute):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            self._store(key, (flight.value, versions, time.monotonic()))
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                self.computations += 1
+            flight.done.set()
+        return flight.value
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, versions, compute):
+        # One background recomputation per key; its requests keep getting the stale result meanwhile
+        with self._lock:
+            if key in self._refreshing or key in self._flights:
+                return
+            self._refreshing.add(key)
+            self.refreshes += 1
+        app = current_app._get_current_object()
+
+        def run():
+            try:
+                with app.app_context():
+                    self._compute(key, versions, compute)
+            except Exception:
+                logger.exception('Background refresh of %r failed', key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name='result-cache-refresh', daemon=True).start()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def render_metrics(self):
+        return '\n'.join([
+            '# HELP result_cache_hits_total View results served fresh from the result cache.',
+            '# TYPE result_cache_hits_total counter',
+            f'result_cache_hits_total {self.hits}',
+            '# HELP result_cache_stale_total View results served stale while being recomputed.',
+            '# TYPE result_cache_stale_total counter',
+            f'result_cache_stale_total {self.stale}',
+            '# HELP result_cache_coalesced_total Requests that waited for a computation already in flight.',
+            '# TYPE result_cache_coalesced_total counter',
+            f'result_cache_coalesced_total {self.coalesced}',
+            '# HELP result_cache_computations_total View results computed.',
+            '# TYPE result_cache_computations_total counter',
+            f'result_cache_computations_total {self.computations}',
+            '# HELP result_cache_refreshes_total Background recomputations started for stale results.',
+            '# TYPE result_cache_refreshes_total counter',
+            f'result_cache_refreshes_total {self.refreshes}',
+            '# HELP result_cache_entries Results held by the result cache.',
+            '# TYPE result_cache_entries gauge',
+            f'result_cache_entries {len(self._entries)}',
+        ]) + '\n'
+
+
+def result_cache():
+    return current_app.extensions['result_cache']
+
+
+def shared_result(key, table_names, compute, allow_stale=True):
+    """compute() for `key`, shared between concurrent requests and cached while `table_names` allow.
+
+    A request with pending flash messages, such as the redirect after a
+    write, waits for a result that includes its change instead of being
+    given a stale one.
+    """
+    versions = read_versions(table_names)[0]
+    return result_cache().get(key, versions, compute, allow_stale=allow_stale and not session.get('_flashes'))
+
+
+def init_result_cache(app):
+    """Set up the single-flight result cache from RESULT_CACHE_TTL and RESULT_CACHE_STALE_TTL"""
+    app.config.setdefault('RESULT_CACHE_TTL', 30.0)
+    app.config.setdefault('RESULT_CACHE_STALE_TTL', 300.0)
+    app.extensions['result_cache'] = ResultCache(app.config['RESULT_CACHE_TTL'],
+                                                 app.config['RESULT_CACHE_STALE_TTL'])
@@ -0,0 +1,155 @@
+# instrumentation.py
+"""Per-request SQL and timing instrumentation for the restaurant app.
+
+- InstrumentedConnection: pass it as psycopg2's connection_factory; every
+  cursor it creates (including RealDictCursor) times its statements.
+- init_instrumentation(app): per-request statement count, DB time and
+  slowest statement, a slow-request log and a Prometheus /metrics endpoint.
+"""
+import logging
+import os
+import threading
+import time
+from flask import Response, g, has_request_context, request
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the per-route latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def record_statement(statement, elapsed):
+    """Add one statement to the current request's totals (no-op outside a request)"""
+    if not has_request_context() or "db_statements" not in g:
+        return
+    g.db_statements += 1
+    g.db_time += elapsed
+    if elapsed > g.db_slowest[0]:
+        g.db_slowest = (elapsed, statement)
+
+
+_timed_cursor_classes = {}
+
+
+def timed_cursor_class(base):
+    """Subclass of the cursor class `base` whose execute/executemany are timed"""
+    timed = _timed_cursor_classes.get(base)
+    if timed is None:
+        class TimedCursor(base):
+            def execute(self, query, vars=None):
+                started = time.perf_counter()
+                try:
+                    return super().execute(query, vars)
+                finally:
+                    record_statement(query, time.perf_counter() - started)
+
+            def executemany(self, query, vars_list):
+                started = time.perf_counter()
+                try:
+                    return super().executemany(query, vars_list)
+                finally:
+                    record_statement(query, time.perf_counter() - started)
+
+        TimedCursor.__name__ = TimedCursor.__qualname__ = "Timed" + base.__name__
+        timed = _timed_cursor_classes[base] = TimedCursor
+    return timed
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose cursors report their statements to the current request"""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = timed_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+class RequestMetrics:
+    """Per-route latency histograms and SQL totals, rendered as Prometheus text"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, method, route, status, duration, statements, db_time):
+        with self._lock:
+            stats = self.routes.setdefault((method, route), {
+                "buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "duration": 0.0,
+                "statements": 0, "db_time": 0.0, "statuses": {},
+            })
+            stats["count"] += 1
+            stats["duration"] += duration
+            stats["statements"] += statements
+            stats["db_time"] += db_time
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    stats["buckets"][i] += 1
+                    break
+
+    def render(self):
+        requests = ["# HELP http_requests_total Requests handled, by route and status.",
+                    "# TYPE http_requests_total counter"]
+        latency = ["# HELP http_request_duration_seconds Time to build the response, by route.",
+                   "# TYPE http_request_duration_seconds histogram"]
+        statements = ["# HELP http_request_db_statements_total SQL statements issued, by route.",
+                      "# TYPE http_request_db_statements_total counter"]
+        db_time = ["# HELP http_request_db_seconds_total Time spent in SQL statements, by route.",
+                   "# TYPE http_request_db_seconds_total counter"]
+        with self._lock:
+            for (method, route), stats in sorted(self.routes.items()):
+                labels = f'method="{method}",route="{route}"'
+                for status, count in sorted(stats["statuses"].items()):
+                    requests.append(f'http_requests_total{{{labels},status="{status}"}} {count}')
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats["buckets"]):
+                    cumulative += count
+                    latency.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                latency += [
+                    f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}',
+                    f'http_request_duration_seconds_sum{{{labels}}} {stats["duration"]:.6f}',
+                    f'http_request_duration_seconds_count{{{labels}}} {stats["count"]}',
+                ]
+                statements.append(f'http_request_db_statements_total{{{labels}}} {stats["statements"]}')
+                db_time.append(f'http_request_db_seconds_total{{{labels}}} {stats["db_time"]:.6f}')
+        return "\n".join(requests + latency + statements + db_time) + "\n"
+
+
+metrics = RequestMetrics()
+
+
+def init_instrumentation(app):
+    """Time requests, log the slow ones (SLOW_REQUEST_MS, default 500) and serve /metrics."""
+    slow_ms = int(os.getenv("SLOW_REQUEST_MS", "500"))
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        g.db_statements = 0
+        g.db_time = 0.0
+        g.db_slowest = (0.0, None)
+
+    @app.after_request
+    def record_request(response):
+        if "request_started" not in g:
+            return response
+        duration = time.perf_counter() - g.request_started
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe(request.method, route, response.status_code, duration, g.db_statements, g.db_time)
+        response.headers["Server-Timing"] = (f'db;desc="{g.db_statements} queries";dur={g.db_time * 1000:.1f}, '
+                                             f"app;dur={duration * 1000:.1f}")
+        if duration * 1000 >= slow_ms:
+            slowest, statement = g.db_slowest
+            if isinstance(statement, bytes):
+                statement = statement.decode(errors="replace")
+            logger.warning("Slow request: %s %s -> %s in %.0f ms (%d SQL statements, %.0f ms in the database; "
+                           "slowest %.0f ms: %s)", request.method, request.full_path, response.status_code,
+                           duration * 1000, g.db_statements, g.db_time * 1000, slowest * 1000,
+                           " ".join(str(statement or "-").split())[:500])
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        """Prometheus scrape target."""
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")